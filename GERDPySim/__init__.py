@@ -1,31 +1,35 @@
-import os
-import platform
-import importlib
-
-use_cython = False
-module_names = ['R_th', '_main', 'boreholes', 'gfunction', 'heat_transfer', 'heating_element', 'heating_element_utils', 'heatpipes', 'load_aggregation', 'load_generator', 'load_generator_utils', 'utilities', 'weather_data']
-
-if use_cython:
-  from .compile_cython import *
-  compile_cython_files_in_directory(".")
-
-  for name in module_names:
-    # Determine the correct extension based on the operating system
-    extension = ".pyd" if platform.system() == "Windows" else ".so"
-    cython_module_path = os.path.join(os.path.dirname(__file__), name + extension)
-
-    # Check if the Cython compiled module exists
-    if os.path.exists(cython_module_path):
-      try:
-        __import__(f'{name}.pyx', fromlist=['*'])
-      except ImportError:
-        print(f"Failed to import Cython module {name}, falling back to Python version.")
-        __import__(f'{name}.py', fromlist=['*'])
-    else:
-      print(f"Cython module {name} not found, using Python version.")
-      __import__(f'{name}.py', fromlist=['*'])
-else:
-  # Import the regular Python module
-  #__import__(f'{name}', fromlist=['*'])
-  for module_name in module_names:
-    globals()[module_name] = importlib.import_module('.' + module_name, package=__name__)
+import os
+import platform
+import importlib
+
+use_cython = False
+module_names = ['R_th', '_main', 'boreholes', 'gfunction', 'heat_transfer', 'heating_element', 'heating_element_utils', 'heatpipes', 'load_aggregation', 'load_generator', 'load_generator_utils', 'utilities', 'weather_data']
+
+if use_cython:
+  from .compile_cython import *
+  compile_cython_files_in_directory(".")
+
+  for name in module_names:
+    # Determine the correct extension based on the operating system
+    extension = ".pyd" if platform.system() == "Windows" else ".so"
+    cython_module_path = os.path.join(os.path.dirname(__file__), name + extension)
+
+    # Check if the Cython compiled module exists
+    if os.path.exists(cython_module_path):
+      try:
+        __import__(f'{name}.pyx', fromlist=['*'])
+      except ImportError:
+        print(f"Failed to import Cython module {name}, falling back to Python version.")
+        __import__(f'{name}.py', fromlist=['*'])
+    else:
+      print(f"Cython module {name} not found, using Python version.")
+      __import__(f'{name}.py', fromlist=['*'])
+else:
+  # Import the regular Python modules lazily on first access (e.g. 'GERDPySim.heat_transfer'),
+  # so that importing a single module does not pull in '_main' with Qt and matplotlib
+  def __getattr__(name):
+    if name in module_names:
+      module = importlib.import_module('.' + name, package=__name__)
+      globals()[name] = module
+      return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -12,21 +12,14 @@
     Authors: Yannick Apfel, Meike Martin
 """
 # import python libraries
-#import sys
-import matplotlib
-matplotlib.use('Qt5Agg')
-import matplotlib.pyplot as plt
-#import matplotlib.backends.backend_qtagg
 import time as tim
 import numpy as np
-import pandas as pd
-from matplotlib.ticker import AutoMinorLocator
-from matplotlib.ticker import MaxNLocator
 from scipy.constants import pi
 
-# import GUI libraries
-from progress.vismain import SplashScreen    #in local dir!
-from PySide2.QtWidgets import *   # Pyside2 for Qt5
+''' The GUI libraries (PySide2, progress), matplotlib and pandas are imported inside
+    'main' and 'evaluate', so that the simulation core can be imported without them
+    (e.g. headless runs and worker processes).
+'''
 
 # import GERDPySim modules
 import GERDPySim.boreholes as boreholes
@@ -35,12 +28,120 @@ import GERDPySim.heating_element as heating_element
 import GERDPySim.gfunction as gfunction
 import GERDPySim.load_aggregation as load_aggregation
 import GERDPySim.utilities as utilities
+from GERDPySim.kpis import RunningKPIs
+from GERDPySim.plotting import ResultMonitor
 from GERDPySim.load_generator import *
 from GERDPySim.R_th import *
-from GERDPySim.weather_data import get_weather_data
+from GERDPySim.results import CHUNK_SIZE, ResultFile, ResultWriter
+from GERDPySim.weather_data import weather_stream
 
 
 def main(self):
+    # import GUI libraries
+    import matplotlib
+    matplotlib.use('Qt5Agg')
+    from PySide2.QtWidgets import QApplication  # Pyside2 for Qt5
+    from progress.vismain import SplashScreen  # in local dir!
+
+    # Open GUI-progress window
+    progapp = QApplication.instance()
+    progwindow = SplashScreen()
+    progwindow.show()
+
+    def progress(status=None, value=None):
+        if status is not None:
+            progwindow.ui.running.setText(status)
+        if value is not None:
+            progwindow.progress.set_value(value)
+        progapp.processEvents()
+
+    # Live plot of the results below the GUI-console
+    if getattr(self, 'live_plot', None) is None:
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+        from matplotlib.figure import Figure
+        from GERDPySim.plotting import LivePlot
+
+        canvas = FigureCanvasQTAgg(Figure(figsize=(8, 3)))
+        canvas.setMinimumSize(200, 250)
+        self.ui.verticalLayout_8.addWidget(canvas)
+        self.live_plot = LivePlot(canvas.figure)
+    self.live_plot.clear()
+
+    # Sections 1.) - 5.)
+    sim = simulate(self, progress=progress, monitor=self.live_plot.update,
+                   borefield=getattr(self, 'boreField', None))  # validated by 'USEFunctions.errorhandling'
+    self.sim = sim  # all result vectors (binary export, see 'results.save_results')
+
+    progwindow.close()
+
+    return evaluate(self, sim)
+
+
+def simulate(self, progress=None, visualize=None, gfunction_options=None, results_file=None,
+             chunk_size=CHUNK_SIZE, monitor=None, borefield=None, boundary_condition='UBWT',
+             gfunction_times=None):
+    """
+    Runs the simulation (sections 1.) - 5.)) without any result plots.
+
+    Parameters
+    ----------
+    self : object
+        GUI main window (or GERDPySim.headless.HeadlessSession), which provides
+        the simulation parameters via self.ui.
+    progress : callable, optional
+        progress(status=None, value=None) is called with a status text and the
+        progress in [%] (e.g. to update the GUI-progress window).
+        Default is None (the progress is printed to the console in steps of
+        10 %).
+    visualize : bool, optional
+        Set to True to plot the borefield and heatpipe layouts.
+        Default is None (True, except for headless sessions).
+    gfunction_options : dict, optional
+        Additional keyword arguments for the g-function (see
+        'gfunction.uniform_temperature' / 'gfunction.uniform_heat_flux').
+        With {'nSegments': 'adaptive'}, the number of segments per borehole is
+        selected by 'gfunction.adaptive_segments' for both boundary conditions
+        (options thereof in 'segmentation_options'). Default is None.
+    results_file : str, optional
+        Path to a result file (.zip or .parquet, see 'results.ResultWriter'). If
+        given, the result vectors are held in a window of chunk_size time steps
+        only and flushed to the result file chunk-wise; they are not returned
+        then, but read lazily from the file (sim['results_file'], see
+        'results.ResultFile' and 'evaluate').
+        Default is None (result vectors in memory).
+    chunk_size : int, optional
+        Number of time steps per chunk of the result file.
+        Default is CHUNK_SIZE.
+    monitor : callable, optional
+        Receiver of decimated blocks of the completed time steps during the
+        simulation (see 'plotting.ResultMonitor', e.g. 'plotting.LivePlot.update').
+        Default is None.
+    borefield : Borefield, optional
+        Bore field, which has already been read (and validated). Default is
+        None (read from the borefield geometry file self.ui.line_borefield_file).
+    boundary_condition : str, optional
+        Boundary condition of the g-function (key of 'gfunction.BOUNDARY_CONDITIONS'):
+        'UBWT' (uniform borehole wall temperature) or 'UHF' (uniform heat flux,
+        faster, but overestimates the long-term g-function; for design screening).
+        Default is 'UBWT'.
+    gfunction_times : int, optional
+        Number of log-spaced time values at which the g-function is evaluated;
+        it is interpolated to the times of the load aggregation cells (see
+        'gfunction.sparse_time_gfunction'). Default is None (evaluated at all
+        times of the load aggregation cells).
+
+    Returns
+    -------
+    sim : dict
+        Result vectors (Q, Q_N, Q_V, Theta_b, Theta_surf, m_w, m_s,
+        start_sb_vector, sb_active, sim_mod), weather data (u_inf, Theta_inf,
+        S_r, dates, fos) and the parameters needed for post-processing
+        (A_he, Theta_g, Nt) and the energy performance indicators (kpis,
+        see 'kpis.RunningKPIs.summary'). With a result file, the result
+        vectors and weather data are replaced by the path to the result
+        file (results_file).
+
+    """
     # -------------------------------------------------------------------------
     # 1.) Parametrization of the simulation (geometries, physical params, etc.)
     # -------------------------------------------------------------------------
@@ -54,13 +155,8 @@ def main(self):
     self.ui.text_console.insertPlainText('Initializing simulation...\n')
     self.ui.text_console.insertPlainText(60 * '-' + '\n')
 
-    # Open GUI-progress window
-    progapp = QApplication.instance()
-    progwindow = SplashScreen()
-    progwindow.show()
-
-    progwindow.ui.running.setText("Initialization...")
-    progapp.processEvents()
+    if progress is not None:
+        progress(status="Initialization...")
 
     # 1.0) Location
     z_asl = self.ui.sb_h_NHN.value()  # elevation (above sea-level) [m]
@@ -73,13 +169,19 @@ def main(self):
     # 1.2) Borehole heat exchanger layout
 
     # Geometry-Import (.txt) & object generation
-    boreField = boreholes.field_from_file(self, self.ui.line_borefield_file.text())  # './data/custom_field_5.txt'
+    if borefield is None:
+        boreField = boreholes.field_from_file(self, self.ui.line_borefield_file.text())  # './data/custom_field_5.txt'
+    else:
+        boreField = borefield
 
     # Total depth of geothermal borefield (sum of all boreholes)
     H_total = boreholes.length_field(boreField)
 
     # Borefield layout plot
-    boreholes.visualize_field(boreField)
+    if visualize is None:
+        visualize = not getattr(self, 'headless', False)
+    if visualize:
+        boreholes.visualize_field(boreField)
 
     # 1.3) Borehole
 
@@ -101,7 +203,8 @@ def main(self):
                              lambda_iso, lambda_p)
 
     # Heatpipe configuration layout plot
-    hp.visualize_hp_config()
+    if visualize:
+        hp.visualize_hp_config()
 
     # 1.4) Connection borehole-to-heating element
 
@@ -181,8 +284,21 @@ def main(self):
     time_req = LoadAgg.get_times_for_simulation()
 
     # G-Function calculation using 'gfunction.py'
-    gFunc = gfunction.uniform_temperature(boreField, time_req, a_g, self,
-                                          nSegments=12)
+    gfunction_options = dict(gfunction_options or {})
+    if boundary_condition == 'UBWT':
+        gfunction_options.setdefault('nSegments', 12)
+    if gfunction_options.get('nSegments') == 'adaptive':
+        del gfunction_options['nSegments']
+        segmentation_options = gfunction_options.pop('segmentation_options', {})
+        gfunction_options.update(gfunction.adaptive_segments(boreField, time_req, a_g, self,
+                                                             boundary_condition=boundary_condition,
+                                                             **segmentation_options, **gfunction_options))
+    if gfunction_times is None:
+        gFunc = gfunction.BOUNDARY_CONDITIONS[boundary_condition](boreField, time_req, a_g, self,
+                                                                  **gfunction_options)
+    else:
+        gFunc = gfunction.sparse_time_gfunction(boundary_condition, boreField, time_req, a_g, self,
+                                                nTimes=gfunction_times, **gfunction_options)
 
     # Simulation initialization using 'load_aggregation.py'
     LoadAgg.initialize(gFunc / (2 * pi * lambda_g))
@@ -191,15 +307,20 @@ def main(self):
     # 4.) Weather data import
     # -------------------------------------------------------------------------
 
-    # Import weather data from 'weather_data.py'
-    u_inf, Theta_inf, S_r, B, Phi, RR, dates, fos = get_weather_data(Nt, self)
-    ''' u_inf       - ambient wind speed [m/s]
+    # Result file (created before the weather data stream is opened, which is closed by the iteration loop only)
+    writer = None if results_file is None else ResultWriter(results_file)
+
+    # Open the weather data stream from 'weather_data.py' (read block-wise during the iteration loop)
+    weather = weather_stream(Nt, self)
+    fos = weather.fos  # index of first 1st of September (multi-year simulation)
+    ''' weather.step(i) returns the weather data of timestep i:
+        u_inf       - ambient wind speed [m/s]
         Theta_inf   - ambient temperature [°C]
         S_r         - snowfall rate [mm/h]
         B           - cloudiness [octal units/8]
         Phi         - relative air humidity [-]
         RR          - precipitation (total) [mm/h]
-        dates       - dates array of strings [mm-dd-hh]
+        date        - date [datetime64]
     '''
 
     # -------------------------------------------------------------------------
@@ -211,6 +332,12 @@ def main(self):
     start_sb = False  # start snow balancing variable
 
     # Initialization of result vectors
+    ''' With a result file, the vectors only hold a window of time steps (index k = i - k_0),
+        which is flushed to the result file once it is full.
+    '''
+    window = Nt if results_file is None else min(Nt, chunk_size + 1)
+    k_0 = 0  # time step of the first entry of the window
+
     ''' Vectors: (i - current timestep)
         - thermal powers [W]:
             - Q[i]              - thermal extraction power (the total power extracted from the ground)
@@ -225,97 +352,145 @@ def main(self):
     '''
 
     # Initialization of power vectors [W]
-    Q = np.zeros(Nt)  # total extracted thermal power
-    Q_N = np.zeros(Nt)  # net used power
-    Q_V = np.zeros(Nt)  # losses
+    Q = np.zeros(window)  # total extracted thermal power
+    Q_N = np.zeros(window)  # net used power
+    Q_V = np.zeros(window)  # losses
 
     # Initialization of temperature vectors [°C]
-    Theta_b = np.zeros(Nt)  # borehole wall temperature
-    Theta_surf = np.zeros(Nt)  # heating element surface temperature
+    Theta_b = np.zeros(window)  # borehole wall temperature
+    Theta_surf = np.zeros(window)  # heating element surface temperature
 
     # Initialization of water mass balancing vector [kg]
-    m_w = np.zeros(Nt)
+    m_w = np.zeros(window)
 
     # Initialization of snow mass balancing vector [kg]
-    m_s = np.zeros(Nt)
+    m_s = np.zeros(window)
+
+    # Weather data of the timesteps (for evaluation)
+    u_inf = np.zeros(window)
+    Theta_inf = np.zeros(window)
+    S_r = np.zeros(window)
+    dates = np.empty(window, dtype='M8[h]')
 
     # Auxiliary variables
-    start_sb_vector = np.zeros(Nt)
-    sb_active = np.zeros(Nt)
-    sim_mod = np.zeros(Nt)
+    start_sb_vector = np.zeros(window)
+    sb_active = np.zeros(window)
+    sim_mod = np.zeros(window)
+
+    vectors = {'Q': Q, 'Q_N': Q_N, 'Q_V': Q_V, 'Theta_b': Theta_b, 'Theta_surf': Theta_surf,
+               'm_w': m_w, 'm_s': m_s, 'start_sb_vector': start_sb_vector, 'sb_active': sb_active,
+               'sim_mod': sim_mod, 'u_inf': u_inf, 'Theta_inf': Theta_inf, 'S_r': S_r, 'dates': dates}
+
+    # Energy performance indicators (updated per timestep)
+    kpis = RunningKPIs(dt)
+
+    # Live monitoring of the results (throttled, decimated blocks)
+    result_monitor = None if monitor is None else ResultMonitor(monitor)
 
     R_f = self.ui.sb_rf.value()  # Snow free area ration (default: 0.2)
 
     print('------Simulation running------\n')
     self.ui.text_console.insertPlainText('------Simulation running------\n')  # GUI-console output
 
-    progwindow.ui.running.setText("Simulation running...")
-
-    while time < tmax:  # iteration loop for each timestep
-
-        # increment timestep by 1
-        if start_sb == False:  # timestep not incremented in case snow balancing starts
-            time += dt
-            i += 1
-
-        LoadAgg.next_time_step(time)
-
-        # Timestep 1
-        ''' Assumptions: 
-            - Theta_b = Theta_surf = Theta_g (undisturbed ground temperature for all temperature objects)
-            - heating element surface dry and free of snow
-        '''
-        if i == 0:
-            Q[i], Q_N[i], Q_V[i], calc_T, Theta_surf[i], m_w[i], m_s[i], sb_active[i], sim_mod[i] = \
-                load(z_asl, u_inf[i], Theta_inf[i], S_r[i], he, Theta_g,
-                     R_th, R_th_ghp, Theta_g, B[i], Phi[i], RR[i], 0, 0, start_sb,
-                     l_conn * N, lambda_p, lambda_iso, r_iso_conn, r_pa, r_pi, R_f)
-
-        # Timesteps 2, 3, ..., Nt
-        if i > 0:
-            Q[i], Q_N[i], Q_V[i], calc_T, Theta_surf[i], m_w[i], m_s[i], sb_active[i], sim_mod[i] = \
-                load(z_asl, u_inf[i], Theta_inf[i], S_r[i], he, Theta_b[i - 1],
-                     R_th, R_th_ghp, Theta_surf[i - 1], B[i], Phi[i], RR[i], m_w[i - 1], m_s[i - 1], start_sb,
-                     l_conn * N, lambda_p, lambda_iso, r_iso_conn, r_pa, r_pi, R_f)
-
-        # Determined extraction power is incremented by the connection losses (An) and losses of the heating element underside (he)
-        Q[i] += Q_V[i]
-
-        start_sb = False  # reset snow balancing variable
-
-        # Load extraction power of current time step into the ground model using 'load_aggregation.py'
-        LoadAgg.set_current_load(Q[i] / H_total)
-
-        # Calculate "new" borehole wall temperature after heat extraction [°C]
-        deltaTheta_b = LoadAgg.temporal_superposition()
-        Theta_b[i] = Theta_g - deltaTheta_b
-
-        # Calculate "new" surface temperature after heat extraction [°C]
-        ''' Theta_surf is only calculated here, if Q. >= 0 (positive heat extraction from ground),
-            otherwise it is calculated in 'load_generator.py', using the simplified power balance F_T = 0.
-        '''
-        if calc_T is False:
-            Theta_surf[i] = Theta_b[i] - Q[i] * R_th  # heating element surface temperature
-
-        # Start snow balancing
-        ''' The time step i will be repeated once in snow balancing mode if the following conditions 
-            for the formation of a snow layer are met:
-            - Theta_surf[i] < 0 AND
-            - S_r[i] > 0 AND
-            - m_s[i] == 0 (no remaining snow on surface)
-        '''
-        if (Theta_surf[i] < 0 and S_r[i] > 0 and m_s[i] == 0):
-            start_sb = True
-            start_sb_vector[i] = 1
-
-        # Current timestep: output to console
-        print(f'Zeitschritt {i + 1} von {Nt}')
-
-        # Update GUI-progress window
-        progwindow.progress.set_value(int(i / Nt * 100))
-        progapp.processEvents()
-
-    progwindow.close()
+    if progress is not None:
+        progress(status="Simulation running...")
+
+    # the weather data stream and the result file are closed even if a time step fails
+    try:
+        while time < tmax:  # iteration loop for each timestep
+
+            # increment timestep by 1
+            if start_sb == False:  # timestep not incremented in case snow balancing starts
+                time += dt
+                i += 1
+
+            LoadAgg.next_time_step(time)
+
+            # window full: flush all time steps but the previous one to the result file
+            k = i - k_0
+            if k == window:
+                if result_monitor is not None:
+                    result_monitor.send(vectors, window)
+                    result_monitor.shift(window - 1)
+                writer.write({name: vector[:-1] for name, vector in vectors.items()})
+                for vector in vectors.values():
+                    vector[0] = vector[-1]
+                    vector[1:] = 0
+                k_0 += window - 1
+                k = 1
+
+            # weather data of the timestep
+            u_inf[k], Theta_inf[k], S_r[k], B, Phi, RR, dates[k] = weather.step(i)
+
+            # Timestep 1
+            ''' Assumptions: 
+                - Theta_b = Theta_surf = Theta_g (undisturbed ground temperature for all temperature objects)
+                - heating element surface dry and free of snow
+            '''
+            if i == 0:
+                Q[k], Q_N[k], Q_V[k], calc_T, Theta_surf[k], m_w[k], m_s[k], sb_active[k], sim_mod[k], Q_lat, Q_sen = \
+                    load(z_asl, u_inf[k], Theta_inf[k], S_r[k], he, Theta_g,
+                         R_th, R_th_ghp, Theta_g, B, Phi, RR, 0, 0, start_sb,
+                         l_conn * N, lambda_p, lambda_iso, r_iso_conn, r_pa, r_pi, R_f)
+
+            # Timesteps 2, 3, ..., Nt
+            if i > 0:
+                Q[k], Q_N[k], Q_V[k], calc_T, Theta_surf[k], m_w[k], m_s[k], sb_active[k], sim_mod[k], Q_lat, Q_sen = \
+                    load(z_asl, u_inf[k], Theta_inf[k], S_r[k], he, Theta_b[k - 1],
+                         R_th, R_th_ghp, Theta_surf[k - 1], B, Phi, RR, m_w[k - 1], m_s[k - 1], start_sb,
+                         l_conn * N, lambda_p, lambda_iso, r_iso_conn, r_pa, r_pi, R_f)
+
+            # Determined extraction power is incremented by the connection losses (An) and losses of the heating element underside (he)
+            Q[k] += Q_V[k]
+
+            start_sb = False  # reset snow balancing variable
+
+            # Load extraction power of current time step into the ground model using 'load_aggregation.py'
+            LoadAgg.set_current_load(Q[k] / H_total)
+
+            # Calculate "new" borehole wall temperature after heat extraction [°C]
+            deltaTheta_b = LoadAgg.temporal_superposition()
+            Theta_b[k] = Theta_g - deltaTheta_b
+
+            # Calculate "new" surface temperature after heat extraction [°C]
+            ''' Theta_surf is only calculated here, if Q. >= 0 (positive heat extraction from ground),
+                otherwise it is calculated in 'load_generator.py', using the simplified power balance F_T = 0.
+            '''
+            if calc_T is False:
+                Theta_surf[k] = Theta_b[k] - Q[k] * R_th  # heating element surface temperature
+
+            # Start snow balancing
+            ''' The time step i will be repeated once in snow balancing mode if the following conditions 
+                for the formation of a snow layer are met:
+                - Theta_surf[k] < 0 AND
+                - S_r[k] > 0 AND
+                - m_s[k] == 0 (no remaining snow on surface)
+            '''
+            if (Theta_surf[k] < 0 and S_r[k] > 0 and m_s[k] == 0):
+                start_sb = True
+                start_sb_vector[k] = 1
+
+            # Update energy performance indicators (once the timestep is not repeated)
+            if start_sb is False:
+                kpis.update(Q[k], Q_N[k], Q_V[k], Theta_b[k], m_s[k], dates[k], Q_lat=Q_lat, Q_sen=Q_sen)
+                if result_monitor is not None:
+                    result_monitor.step(vectors, k)
+
+            # Update GUI-progress window (headless: output of every 10th percent to console)
+            if progress is not None:
+                progress(value=int(i / Nt * 100))
+            elif start_sb is False and (i + 1) % max(Nt // 10, 1) == 0:
+                print(f'Zeitschritt {i + 1} von {Nt}')
+
+        if result_monitor is not None:
+            result_monitor.send(vectors, k + 1)
+
+        if writer is not None:
+            writer.write({name: vector[:k + 1] for name, vector in vectors.items()})
+    finally:
+        weather.close()
+        if writer is not None:
+            writer.close()
 
     toc = tim.time()  # time stamp (end simulation)
     print('Total simulation time: {} sec'.format(toc - tic))
@@ -323,6 +498,51 @@ def main(self):
     self.ui.text_console.insertPlainText('Total simulation time: {} sec\n'.format(toc - tic))
     self.ui.text_console.insertPlainText(60 * '-' + '\n')
 
+    if writer is None:
+        sim = {name: vectors[name] for name in ('Q', 'Q_N', 'Q_V', 'Theta_b', 'Theta_surf', 'm_w', 'm_s',
+                                                'start_sb_vector', 'sb_active', 'sim_mod', 'u_inf',
+                                                'Theta_inf', 'S_r', 'dates')}
+    else:  # result vectors are read lazily from the result file
+        sim = {'results_file': results_file}
+    sim.update({'fos': fos, 'A_he': A_he, 'Theta_g': Theta_g, 'Nt': Nt, 'kpis': kpis.summary()})
+
+    return sim
+
+
+def evaluate(self, sim, show=True):
+    """
+    Energy performance indicators, result plots and results dataframe
+    (sections 6.) - 8.)) of a simulation run by 'simulate'.
+
+    Parameters
+    ----------
+    self : object
+        GUI main window (or GERDPySim.headless.HeadlessSession).
+    sim : dict
+        Return value of 'simulate'.
+    show : bool, optional
+        Set to False to keep the figures open without showing them (e.g. to
+        save them as files, see 'render.py').
+        Default is True.
+
+    Returns
+    -------
+    results : DataFrame
+        Results dataframe (for 'USEFunctions.save_results'). None for results
+        in a result file (sim['results_file']), which are plotted chunk by
+        chunk (see _result_curves) instead of being loaded completely.
+
+    """
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    from matplotlib.dates import DateFormatter
+    from matplotlib.ticker import AutoMinorLocator
+    from matplotlib.ticker import MaxNLocator
+
+    from GERDPySim.plotting import plot_decimated
+
+    fos, A_he, Theta_g, Nt = sim['fos'], sim['A_he'], sim['Theta_g'], sim['Nt']
+
     # -------------------------------------------------------------------------
     # 6.) Energy performance indicators
     # -------------------------------------------------------------------------
@@ -330,32 +550,36 @@ def main(self):
         E                   - total extracted thermal energy [MWh]
         f_N [%] = E_N / E   - net energy usage factor [%]
             E_N             - net used energy (latent & sensible energy for melting of snow and ice)
+                E_lat, E_sen    - latent (melting) and sensible (heating of the snow to the melting point) part
             E - E_N         - net energy "lost" through convection, radiation and evaporation (surface losses)
     '''
 
-    # 24h-moving-average total extracted thermal power [W]
-    Q_ma = utilities.Q_moving_average(Q)
-
     # Total extracted thermal energy [MWh]
-    E = (np.sum(Q) / len(Q)) * Nt * 1e-6
+    E = sim['kpis']['E']
 
     print('------Simulation finished------')
 
     print(f'Energy extracted from the ground: {round(E, 4)} MWh')
     self.ui.text_console.insertPlainText(60 * '-' + '\n')
     self.ui.text_console.insertPlainText(f'Energy extracted from the ground: {round(E, 4)} MWh\n')
-    self.ui.text_console.insertPlainText(60 * '-' + '\n')
 
     # Net energy usage factor [%]
-    # f_N = (np.sum(Q_N) / len(Q_N)) / (np.sum(Q) / len(Q)) * 100
-    # print(f'{round(f_N, 2)} % of that energy went into melting snow and ice.'
-    #       f'The rest are surface losses in the form of convection, radiation and evaporation and \n'
-    #       f'thermal losses at the heating element underside and borehole-to-heating element connections.')
-    # print(50*'-')
-    # self.ui.text_console.insertPlainText(
-    #     f'{round(f_N, 2)} % of that energy went into melting snow and ice.'
-    #     f'The rest are surface losses in the form of convection, radiation and evaporation and \n'
-    #     f'thermal losses at the heating element underside and borehole-to-heating element connections.')
+    f_N = sim['kpis']['f_N']
+    print(f'{round(f_N, 2)} % of that energy went into melting snow and ice. '
+          f'The rest are surface losses in the form of convection, radiation and evaporation and \n'
+          f'thermal losses at the heating element underside and borehole-to-heating element connections.')
+    self.ui.text_console.insertPlainText(
+        f'{round(f_N, 2)} % of that energy went into melting snow and ice.\n')
+
+    # Latent & sensible part of the net used energy [MWh] (not in results saved before the split)
+    if 'E_lat' in sim['kpis']:
+        E_lat, E_sen = sim['kpis']['E_lat'], sim['kpis']['E_sen']
+        print(f'Net used energy: {round(E_lat, 4)} MWh latent (melting), '
+              f'{round(E_sen, 4)} MWh sensible (heating of the snow to the melting point)')
+        self.ui.text_console.insertPlainText(
+            f'Net used energy: {round(E_lat, 4)} MWh latent, {round(E_sen, 4)} MWh sensible\n')
+    print(50*'-')
+    self.ui.text_console.insertPlainText(60 * '-' + '\n')
 
     # -------------------------------------------------------------------------
     # 7.) Result Plots
@@ -365,8 +589,12 @@ def main(self):
     # 7.1) Figure 1
     # -------------------------------------------------------------------------
 
-    # x-Axis (simulation hours) [h]
-    hours = dates
+    # Curves {name: (dates of the simulation hours [datetime64], values)}, incl. the
+    # 24h-moving-average total extracted thermal power Q_ma [W]
+    curves, annual, Theta_b_fos = _result_curves(self, sim)
+    ''' The hourly curves are drawn min/max-decimated to the pixel columns of the axes
+        (decimated again on zooming, see 'plotting.py').
+    '''
 
     plt.rc('figure')
     fig1 = plt.figure()
@@ -379,16 +607,17 @@ def main(self):
     # fig1
     ax1 = fig1.add_subplot(411)
     ax1.set_ylabel(r'$q$ [W/m2]')
-    ax1.plot(hours, Q / A_he, 'k-', lw=1.2)  # total extracted thermal power [W]
-    ax1.plot(hours, Q_ma / A_he, 'r--', lw=1.2)  # total extracted thermal power (24h-moving-average) [W]
-    ax1.plot(hours, Q_V / A_he, 'g-', lw=1.2)  # thermal losses (underside heating element & connection) [W]
+    plot_decimated(ax1, curves['Q'][0], curves['Q'][1] / A_he, 'k-', lw=1.2)  # total extracted thermal power [W]
+    plot_decimated(ax1, curves['Q_ma'][0], curves['Q_ma'][1] / A_he, 'r--',
+                   lw=1.2)  # total extracted thermal power (24h-moving-average) [W]
+    plot_decimated(ax1, curves['Q_V'][0], curves['Q_V'][1] / A_he, 'g-',
+                   lw=1.2)  # thermal losses (underside heating element & connection) [W]
     ax1.legend(['Extracted thermal power', 'Extracted thermal power (24h-moving-average)',
                 'Thermal losses (underside heating element & connection)'],
                prop={'size': font['size']}, loc='best')
     ax1.grid('major')
     ax1.xaxis.set_minor_locator(AutoMinorLocator())
     ax1.yaxis.set_minor_locator(AutoMinorLocator())
-    ax1.set_xticks(np.arange(0, len(hours), len(hours) / 24))
     labels1 = ax1.get_xticklabels()
     plt.setp(labels1, rotation=45, horizontalalignment='right')
 
@@ -396,14 +625,14 @@ def main(self):
     # fig1
     ax2 = fig1.add_subplot(412)
     ax2.set_ylabel('Snowfall rate [mm/h] \n Snow height on heating element [H2O-mm]')
-    ax2.plot(hours, S_r, 'b-', lw=0.8)  # snowfall rate [mm/h]
-    ax2.plot(hours, m_s / (A_he * (997 / 1000)), 'g-', lw=0.8)  # snow height on heating element [mm]
+    plot_decimated(ax2, *curves['S_r'], 'b-', lw=0.8)  # snowfall rate [mm/h]
+    plot_decimated(ax2, curves['m_s'][0], curves['m_s'][1] / (A_he * (997 / 1000)), 'g-',
+                   lw=0.8)  # snow height on heating element [mm]
     ax2.legend(['Snowfall rate', 'Snow height on heating element'],
                prop={'size': font['size']}, loc='best')
     ax2.grid('major')
     ax2.xaxis.set_minor_locator(AutoMinorLocator())
     ax2.yaxis.set_minor_locator(AutoMinorLocator())
-    ax2.set_xticks(np.arange(0, len(hours), len(hours) / 24))
     labels2 = ax2.get_xticklabels()
     plt.setp(labels2, rotation=45, horizontalalignment='right')
 
@@ -411,30 +640,28 @@ def main(self):
     # fig1
     ax3 = fig1.add_subplot(413)
     ax3.set_ylabel('$T$ [degC] \n Ambient wind speed [m/s]')
-    ax3.plot(hours, Theta_inf, 'k-', lw=0.8)  # ambient temperature [°C]
-    ax3.plot(hours, u_inf, 'm--', lw=0.8)  # ambient wind speed [m/s]
+    plot_decimated(ax3, *curves['Theta_inf'], 'k-', lw=0.8)  # ambient temperature [°C]
+    plot_decimated(ax3, *curves['u_inf'], 'm--', lw=0.8)  # ambient wind speed [m/s]
     ax3.legend(['Ambient temperature', 'Ambient wind speed'],
                prop={'size': font['size']}, loc='best')
     ax3.grid('major')
     ax3.xaxis.set_minor_locator(AutoMinorLocator())
     ax3.yaxis.set_minor_locator(AutoMinorLocator())
-    ax3.set_xticks(np.arange(0, len(hours), len(hours) / 24))
     labels3 = ax3.get_xticklabels()
     plt.setp(labels3, rotation=45, horizontalalignment='right')
 
     # Temperature curves
     # fig1
     ax4 = fig1.add_subplot(414)
-    ax4.set_xlabel(r'$date$ [y-mm-dd-hh]')
+    ax4.set_xlabel(r'$date$ [y-mm-dd]')
     ax4.set_ylabel(r'$T$ [degC]')
-    ax4.plot(hours, Theta_b, 'r-', lw=1.2)  # borehole wall temperature [°C]
-    ax4.plot(hours, Theta_surf, 'c-', lw=0.6)  # heating element surface temperature [°C]
+    plot_decimated(ax4, *curves['Theta_b'], 'r-', lw=1.2)  # borehole wall temperature [°C]
+    plot_decimated(ax4, *curves['Theta_surf'], 'c-', lw=0.6)  # heating element surface temperature [°C]
     ax4.legend(['T_borehole-wall', 'T_surface'],
                prop={'size': font['size']}, loc='best')
     ax4.grid('major')
     ax4.xaxis.set_minor_locator(AutoMinorLocator())
     ax4.yaxis.set_minor_locator(AutoMinorLocator())
-    ax4.set_xticks(np.arange(0, len(hours), len(hours) / 24))
     labels4 = ax4.get_xticklabels()
     plt.setp(labels4, rotation=45, horizontalalignment='right')
 
@@ -445,25 +672,21 @@ def main(self):
     # Borehole wall temperature annual stacked curves
     # fig2
     if self.ui.rb_multiyearsim.isChecked():
-        single_year = np.empty(8760, dtype=object)
-        for i in range(0, len(single_year)):
-            single_year[i] = hours[i][2:]
-
         ax5 = fig2.add_subplot(211)
-        ax5.set_xlabel(r'$date$ [mm-dd-hh]')
+        ax5.set_xlabel(r'$date$ [mm-dd]')
         ax5.set_ylabel(r'$T$ [degC]')
+        ax5.xaxis.set_major_formatter(DateFormatter('%m-%d'))
         colour_map = iter(plt.cm.gist_rainbow(np.linspace(0, 1, self.ui.sb_simtime.value())))
         for j in range(self.ui.sb_simtime.value()):
-            ax5.plot(single_year, Theta_b[(0 + j * 8760):(8760 + j * 8760)], c=next(colour_map),
-                     lw=0.7, label=f'Borehole wall temperature - Year {j + 1}')
-        ax5.set_xticks(np.arange(0, len(single_year), len(single_year) / 24))
+            plot_decimated(ax5, *annual[j], c=next(colour_map),  # (dates of the first year)
+                           lw=0.7, label=f'Borehole wall temperature - Year {j + 1}')
         labels5 = ax5.get_xticklabels()
     else:
         ax5 = fig2.add_subplot(111)
-        ax5.set_xlabel(r'$date$ [mm-dd-hh]')
+        ax5.set_xlabel(r'$date$ [mm-dd]')
         ax5.set_ylabel(r'$T$ [degC]')
-        ax5.plot(hours, Theta_b, 'r-', lw=1.2, label='Borehole wall temperature - Year 1')
-        ax5.set_xticks(np.arange(0, len(hours), len(hours) / 24))
+        ax5.xaxis.set_major_formatter(DateFormatter('%m-%d'))
+        plot_decimated(ax5, *curves['Theta_b'], 'r-', lw=1.2, label='Borehole wall temperature - Year 1')
         labels5 = ax5.get_xticklabels()
     ax5.legend(prop={'size': font['size'] - 2}, loc='best')
     ax5.grid('major')
@@ -479,10 +702,10 @@ def main(self):
         ax6.set_ylabel(r'$T$ [degC]')
         ax6_x = np.arange(0, self.ui.sb_simtime.value() + 1, 1, dtype=int)
         # straight connecting lines:
-        ax6.plot([ax6_x[0], ax6_x[1]], [Theta_g, Theta_b[fos]], 'b', linewidth=1)
+        ax6.plot([ax6_x[0], ax6_x[1]], [Theta_g, Theta_b_fos[0]], 'b', linewidth=1)
         for j in range(self.ui.sb_simtime.value()):
             if j < (self.ui.sb_simtime.value() - 1):
-                ax6.plot([ax6_x[j + 1], ax6_x[j + 2]], [Theta_b[fos + j * 8760], Theta_b[fos + (j + 1) * 8760]], 'b',
+                ax6.plot([ax6_x[j + 1], ax6_x[j + 2]], [Theta_b_fos[j], Theta_b_fos[j + 1]], 'b',
                          linewidth=1, label='_nolegend_')
             else:
                 break
@@ -490,9 +713,9 @@ def main(self):
         ax6.plot(ax6_x[0], Theta_g, marker='x', markersize=10, markeredgecolor='green',
                  label='Undisturbed ground temperature')
         for j in range(self.ui.sb_simtime.value()):
-            ax6.plot(ax6_x[j + 1], Theta_b[fos + j * 8760], color='red', marker='o', markersize=10, markeredgewidth=0.0)
+            ax6.plot(ax6_x[j + 1], Theta_b_fos[j], color='red', marker='o', markersize=10, markeredgewidth=0.0)
             if j == 0:
-                ax6.plot(ax6_x[j + 1], Theta_b[fos + j * 8760], color='red', marker='o', markersize=10,
+                ax6.plot(ax6_x[j + 1], Theta_b_fos[j], color='red', marker='o', markersize=10,
                          markeredgewidth=0.0,
                          label='Borehole wall temperature at the beginning of the heating period (01.09.)')
         ax6.legend(prop={'size': font['size'] - 2}, loc='best')
@@ -503,19 +726,105 @@ def main(self):
 
     # plt.tight_layout()
     fig1.subplots_adjust(hspace=0.7)
-    plt.show()
+    if show:
+        plt.show()
 
     # -------------------------------------------------------------------------
     # 8.) Results dataframe
     # -------------------------------------------------------------------------
 
-    results = pd.DataFrame({'timestep': hours, 'Q_extracted [W]': Q / A_he, 'Q_losses [W]': Q_V / A_he,
-                            'T_borehole-wall [°C]': Theta_b, 'T_surface [°C]': Theta_surf, 'T_ambient [°C]': Theta_inf,
-                            'u_wind [m/s]': u_inf, 'Snowfall rate [mm/h]': S_r,
-                            'Snow heigth [mm]': m_s / (A_he * (997 / 1000))})
+    if 'results_file' in sim:
+        return None
+    results = pd.DataFrame({'timestep': sim['dates'], 'Q_extracted [W]': sim['Q'] / A_he,
+                            'Q_losses [W]': sim['Q_V'] / A_he, 'T_borehole-wall [°C]': sim['Theta_b'],
+                            'T_surface [°C]': sim['Theta_surf'], 'T_ambient [°C]': sim['Theta_inf'],
+                            'u_wind [m/s]': sim['u_inf'], 'Snowfall rate [mm/h]': sim['S_r'],
+                            'Snow heigth [mm]': sim['m_s'] / (A_he * (997 / 1000))})
 
     return results
 
+
+def _result_curves(self, sim, n_bins=2000):
+    """
+    Curves of the result plots of a simulation run (see evaluate).
+
+    Results in a result file (sim['results_file']) are read chunk by chunk
+    and min/max-decimated (see 'plotting.minmax_decimate'), the n_bins bins
+    of a curve being shared by the chunks in proportion to their length, so
+    that the memory does not depend on the simulation period; result vectors
+    in memory are returned as they are.
+
+    Returns
+    -------
+    curves : dict
+        {name: (dates, values)} of Q, Q_ma (24h-moving-average of Q), Q_V,
+        Theta_b, Theta_surf, m_s, u_inf, Theta_inf and S_r.
+    annual : list
+        (dates of the first year, Theta_b) of each year of a multi-year simulation.
+    Theta_b_fos : list
+        Borehole wall temperature at the beginning of each heating period
+        (multi-year simulation).
+
+    """
+    from GERDPySim.plotting import minmax_decimate
+
+    names = ('Q', 'Q_V', 'Theta_b', 'Theta_surf', 'm_s', 'u_inf', 'Theta_inf', 'S_r')
+    if 'results_file' in sim:
+        result_file = ResultFile(sim['results_file'])
+        chunks = (dict(zip(('dates',) + names, chunk))
+                  for chunk in zip(*[result_file.chunks(name) for name in ('dates',) + names]))
+
+        def decimate(x, y, n_total=len(result_file)):
+            return minmax_decimate(x, y, max(1, int(np.ceil(n_bins * len(y) / n_total))))
+    else:
+        result_file = None
+        chunks = [{name: np.asarray(sim[name]) for name in ('dates',) + names}]
+
+        def decimate(x, y, n_total=None):
+            return x, y
+    n_years = self.ui.sb_simtime.value() if self.ui.rb_multiyearsim.isChecked() else 0
+    fos = sim['fos']
+
+    pieces = {name: [] for name in names + ('Q_ma',)}
+    annual = [[] for _ in range(n_years)]
+    first_year = np.empty(0, dtype='M8[h]')  # dates of the first year
+    Theta_b_fos = [np.nan] * n_years
+    moving_average = utilities.RunningMovingAverage()
+    pending = np.empty(0, dtype='M8[h]')  # dates of the moving average values not available yet
+    offset = 0  # time step of the first entry of the chunk
+    try:
+        for chunk in chunks:
+            dates = np.asarray(chunk['dates']).astype('M8[h]')
+            n = len(dates)
+            for name in names:
+                pieces[name].append(decimate(dates, chunk[name]))
+            pending = np.concatenate((pending, dates))
+            Q_ma = moving_average.push(chunk['Q'])
+            pieces['Q_ma'].append(decimate(pending[:len(Q_ma)], Q_ma))
+            pending = pending[len(Q_ma):]
+
+            # annual curves and values at the beginning of the heating periods
+            if offset < 8760:
+                first_year = np.concatenate((first_year, dates[:8760 - offset]))
+            for j in range(offset // 8760, min((offset + n - 1) // 8760 + 1, n_years)):
+                lo, hi = max(j * 8760, offset), min((j + 1) * 8760, offset + n)
+                annual[j].append(decimate(first_year[lo - j * 8760:hi - j * 8760],
+                                          chunk['Theta_b'][lo - offset:hi - offset], n_total=8760))
+            for j in range(n_years):
+                if offset <= fos + j * 8760 < offset + n:
+                    Theta_b_fos[j] = chunk['Theta_b'][fos + j * 8760 - offset]
+            offset += n
+        pieces['Q_ma'].append((pending, moving_average.finish()))
+    finally:
+        if result_file is not None:
+            result_file.close()
+
+    def join(parts):
+        return tuple(np.concatenate(values) for values in zip(*parts))
+
+    return {name: join(parts) for name, parts in pieces.items()}, [join(parts) for parts in annual], Theta_b_fos
+
+
 #
 # # Main function
 # if __name__ == '__main__':
@@ -108,9 +108,256 @@ class Borehole(object):
         return pos
 
 
+class Borefield(object):
+    """
+    Contains the dimensions and positions of all boreholes of a bore field.
+
+    The parameters are stored as contiguous arrays (one entry per borehole),
+    so that the geometry of large bore fields is evaluated vectorized. For
+    compatibility with lists of boreholes, indexing with an integer and
+    iteration return Borehole objects.
+
+    Attributes
+    ----------
+    H:              array
+                    borehole depths [m]
+    D:              array
+                    borehole buried depths [m]
+    r_b:            array
+                    borehole radii [m]
+    x:              array
+                    positions of the heads of the boreholes along the x-axis [m]
+    y:              array
+                    positions of the heads of the boreholes along the y-axis [m]
+    tilt:           array
+                    angles from vertical of the axes of the boreholes [radians]
+    orientation:    array
+                    directions of the tilt of the boreholes [radians]
+
+    Examples
+    --------
+    >>> field = Borefield(H=100., D=2.5, r_b=0.075, x=[0., 5., 0.], y=[0., 0., 5.])
+    >>> field.length()
+    300.0
+    >>> field[1]
+    Borehole(H=100.0, D=2.5, r_b=0.075, x=5.0, y=0.0, tilt=0.0, orientation=0.0)
+
+    """
+
+    _fields = ('H', 'D', 'r_b', 'x', 'y', 'tilt', 'orientation')
+
+    def __init__(self, H, D, r_b, x, y, tilt=0., orientation=0.):
+        # scalar parameters apply to all boreholes
+        arrays = np.broadcast_arrays(*[np.asarray(value, dtype=np.float64).ravel() if np.ndim(value)
+                                       else np.float64(value)
+                                       for value in (H, D, r_b, x, y, tilt, orientation)])
+        for name, value in zip(self._fields, arrays):
+            setattr(self, name, np.ascontiguousarray(value))
+
+    @classmethod
+    def from_boreholes(cls, boreholes):
+        """
+        Builds a bore field from a list of Borehole objects (a Borefield is returned unchanged).
+        """
+        if isinstance(boreholes, Borefield):
+            return boreholes
+        return cls(*[[getattr(b, name) for b in boreholes] for name in cls._fields])
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return Borehole(*[getattr(self, name)[key] for name in self._fields])
+        # slices and index arrays return a bore field
+        return Borefield(*[getattr(self, name)[key] for name in self._fields])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return 'Borefield({} boreholes, H={}, x=[{}, {}], y=[{}, {}])'.format(
+            len(self), self.length(), *self.bounding_box())
+
+    def to_list(self):
+        """
+        Returns the bore field as list of Borehole objects.
+        """
+        return list(self)
+
+    def distances(self, rows=None):
+        """
+        Evaluate the distances between all pairs of boreholes.
+
+        Parameters
+        ----------
+        rows : int, slice or array, optional
+            Boreholes for which the distances to all boreholes are evaluated.
+            Default is None (all boreholes).
+
+        Returns
+        -------
+        dis : array
+            Distances (in meters), dis[i, j] is the distance between borehole i
+            (of rows) and borehole j (1d array if rows is an integer).
+
+        .. Note::
+           As for Borehole.distance, the smallest distance returned is equal
+           to the borehole radius (of borehole i).
+
+        """
+        rows = slice(None) if rows is None else rows
+        x = np.expand_dims(self.x[rows], -1)
+        y = np.expand_dims(self.y[rows], -1)
+        r_b = np.expand_dims(self.r_b[rows], -1)
+        dis = np.maximum(r_b, np.sqrt((x - self.x)**2 + (y - self.y)**2))
+        return dis
+
+    def overlapping_pairs(self):
+        """
+        Find pairs of boreholes with overlapping borehole walls.
+
+        The candidate pairs are found with a spatial index (scipy cKDTree,
+        radius query), so that large bore fields are checked without
+        evaluating all pairwise distances.
+
+        Returns
+        -------
+        pairs : array
+            (n, 2)-array of the borehole indices (i < j) of all pairs with a
+            distance below 2 * r_b (r_b of borehole i), sorted by i and j.
+
+        """
+        from scipy.spatial import cKDTree
+
+        tree = cKDTree(np.column_stack((self.x, self.y)))
+        pairs = tree.query_pairs(2 * np.max(self.r_b), output_type='ndarray')
+        pairs = pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+        i, j = pairs[:, 0], pairs[:, 1]
+        dis = np.maximum(self.r_b[i], np.sqrt((self.x[i] - self.x[j])**2 + (self.y[i] - self.y[j])**2))
+        return pairs[np.abs(dis - self.r_b[i]) < self.r_b[i]]
+
+    def symmetries(self, tol=1.0e-6):
+        """
+        Find the geometric symmetries of the bore field.
+
+        The reflections and rotations of the square (about the centroid of the
+        borehole heads) are checked; a transformation is a symmetry if it maps
+        every borehole onto a borehole of equal dimensions. Only fields of
+        vertical boreholes are checked.
+
+        Parameters
+        ----------
+        tol : float, optional
+            Tolerance on the positions (relative to the extent of the field).
+            Default is 1.0e-6.
+
+        Returns
+        -------
+        permutations : list of arrays
+            For each symmetry (except the identity), the index of the borehole
+            onto which each borehole is mapped.
+
+        """
+        from scipy.spatial import cKDTree
+
+        if len(self) < 2 or np.any(self.tilt != 0.):
+            return []
+        u = self.x - np.mean(self.x)
+        v = self.y - np.mean(self.y)
+        atol = tol * max(np.ptp(self.x), np.ptp(self.y))
+        tree = cKDTree(np.column_stack((u, v)))
+        dimensions = np.column_stack((self.H, self.D, self.r_b))
+
+        permutations = []
+        for (u_s, v_s) in ((-u, v), (u, -v), (-u, -v), (v, u), (-v, -u), (-v, u), (v, -u)):
+            dis, perm = tree.query(np.column_stack((u_s, v_s)), distance_upper_bound=atol)
+            if (np.all(np.isfinite(dis)) and len(np.unique(perm)) == len(self)
+                    and np.array_equal(dimensions[perm], dimensions)):
+                permutations.append(perm)
+        return permutations
+
+    def symmetry_classes(self, tol=1.0e-6):
+        """
+        Group the boreholes into classes of boreholes, which are mapped onto
+        each other by the symmetries of the bore field (see symmetries).
+
+        Parameters
+        ----------
+        tol : float, optional
+            Tolerance on the positions (relative to the extent of the field).
+            Default is 1.0e-6.
+
+        Returns
+        -------
+        labels : array
+            Class index of each borehole.
+        representatives : array
+            Index of the first borehole of each class.
+
+        """
+        permutations = self.symmetries(tol=tol)
+        # smallest borehole index of each class
+        labels = np.arange(len(self))
+        while True:
+            previous = labels
+            for perm in permutations:
+                labels = np.minimum(labels, labels[perm])
+            if np.array_equal(labels, previous):
+                break
+        (representatives, labels) = np.unique(labels, return_inverse=True)
+        return labels.ravel(), representatives
+
+    def length(self):
+        """
+        Returns the total borehole length of the bore field [m].
+        """
+        return float(np.sum(self.H))
+
+    def bounding_box(self):
+        """
+        Returns the bounding box (x_min, x_max, y_min, y_max) of the borehole heads [m].
+        """
+        return (float(np.min(self.x)), float(np.max(self.x)),
+                float(np.min(self.y)), float(np.max(self.y)))
+
+    def segments(self, nSegments, segment_ratios=None):
+        """
+        Split the boreholes into segments.
+
+        Parameters
+        ----------
+        nSegments : int
+            Number of line segments per borehole.
+        segment_ratios : array, optional
+            Segment lengths relative to the borehole length, from the top
+            to the bottom (see 'utilities.segment_ratios').
+            Default is None (segments of equal length).
+
+        Returns
+        -------
+        boreSegments : Borefield
+            Borehole segments (the segments of borehole i are at the
+            indices i*nSegments, ..., (i+1)*nSegments-1).
+
+        """
+        i = np.tile(np.arange(nSegments), len(self))
+        H = np.repeat(self.H, nSegments)
+        others = [np.repeat(getattr(self, name), nSegments) for name in ('r_b', 'x', 'y', 'tilt', 'orientation')]
+        if segment_ratios is None:
+            # buried depth of the i-th segment
+            D = np.repeat(self.D, nSegments) + i * H / nSegments
+            return Borefield(H / nSegments, D, *others)
+        ratios = np.asarray(segment_ratios, dtype=float)
+        # relative depth of the top of the i-th segment
+        tops = np.concatenate(([0.], np.cumsum(ratios)[:-1]))
+        return Borefield(H * ratios[i], np.repeat(self.D, nSegments) + H * tops[i], *others)
+
+
 def field_from_file(self, filename):
     """
-    Build a list of boreholes given coordinates and dimensions provided in a
+    Build a bore field given coordinates and dimensions provided in a
     text file.
 
     Parameters
@@ -120,8 +367,8 @@ def field_from_file(self, filename):
 
     Returns
     -------
-    boreField : list of Borehole objects
-        List of boreholes in the bore field.
+    boreField : Borefield
+        Boreholes of the bore field.
 
     Notes
     -----
@@ -136,70 +383,53 @@ def field_from_file(self, filename):
 
     """
 
-    # Load data from file
-    data = np.loadtxt(filename)
+    # Load data from file (one row per borehole, also for a single borehole)
+    data = np.atleast_2d(np.loadtxt(filename))
+    x = data[:, 0]
+    y = data[:, 1]
+    r_b = self.ui.sb_r_borehole.value()
     # Build the bore field
-    borefield = []
-    if not self.ui.rb_depth.isChecked(): # equal borehole depth
-        if np.size(data, 1) == 4:
-            try:
-                for line in data:
-                    x = line[0]
-                    y = line[1]
-                    D = line[3]
-                    H = self.ui.sb_depth_boreholes.value()
-                    r_b = self.ui.sb_r_borehole.value()
-                    borefield.append(Borehole(H, D, r_b, x=x, y=y))
-            except IndexError:  # raises exception if only one borehole
-                x = data[0]
-                y = data[1]
-                D = data[3]
-                H = self.ui.sb_depth_boreholes.value()
-                r_b = self.ui.sb_r_borehole.value()
-                borefield.append(Borehole(H, D, r_b, x=x, y=y))
-        else:
-            try:
-                for line in data:
-                    x = line[0]
-                    y = line[1]
-                    D = line[2]
-                    H = self.ui.sb_depth_boreholes.value()
-                    r_b = self.ui.sb_r_borehole.value()
-                    borefield.append(Borehole(H, D, r_b, x=x, y=y))
-            except IndexError:  # raises exception if only one borehole
-                x = data[0]
-                y = data[1]
-                D = data[2]
-                H = self.ui.sb_depth_boreholes.value()
-                r_b = self.ui.sb_r_borehole.value()
-                borefield.append(Borehole(H, D, r_b, x=x, y=y))
-    else: # varying depth
-        try:
-            for line in data:
-                x = line[0]
-                y = line[1]
-                H = line[2]
-                D = line[3]
-                r_b = self.ui.sb_r_borehole.value()
-                borefield.append(Borehole(H, D, r_b, x=x, y=y))
-        except IndexError:  # raises exception if only one borehole
-            x = data[0]
-            y = data[1]
-            H = data[2]
-            D = data[3]
-            r_b = self.ui.sb_r_borehole.value()
-            borefield.append(Borehole(H, D, r_b, x=x, y=y))
-    return borefield
-
-
-def visualize_field(borefield):
+    if not self.ui.rb_depth.isChecked():  # equal borehole depth
+        H = self.ui.sb_depth_boreholes.value()
+        D = data[:, 3] if np.size(data, 1) == 4 else data[:, 2]
+    else:  # varying depth
+        H = data[:, 2]
+        D = data[:, 3]
+    return Borefield(H, D, r_b, x, y)
+
+
+def field_to_file(borefield, filename):
+    """
+    Write a bore field to a text file (format of field_from_file).
+
+    Parameters
+    ----------
+    borefield : Borefield or list of Borehole objects
+        Boreholes of the bore field.
+    filename : str
+        Path to the text file.
+
+    """
+    borefield = Borefield.from_boreholes(borefield)
+    np.savetxt(filename, np.column_stack((borefield.x, borefield.y, borefield.H, borefield.D, borefield.r_b)),
+               fmt='%.12g', delimiter='\t', header='x\ty\tH\tD\tr_b')
+
+
+def visualize_field(borefield, max_labels=100):
     """
     Plot the top view and 3D view of borehole positions.
 
+    The boreholes are drawn as collections (one artist per view), the
+    borehole numbers are only drawn if at most max_labels boreholes are
+    visible in the top view (e.g. after zooming in).
+
     Parameters
     ----------
-    borefield : list
-        List of boreholes in the bore field.
+    borefield : Borefield or list of Borehole objects
+        Boreholes of the bore field.
+    max_labels : int, optional
+        Maximum number of visible boreholes for which the borehole numbers
+        are drawn. Default is 100.
 
     Returns
     -------
@@ -210,12 +440,12 @@ def visualize_field(borefield):
     import matplotlib.pyplot as plt
     from matplotlib.ticker import AutoMinorLocator
     from mpl_toolkits.mplot3d import Axes3D
+    from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
+    borefield = Borefield.from_boreholes(borefield)
     # -------------------------------------------------------------------------
     # Initialize figure
     # -------------------------------------------------------------------------
-    LW = 1.5    # Line width
-    bbox_props = dict(boxstyle="circle,pad=0.3", fc="white", ec="b", lw=LW)
-
     plt.rc('figure', figsize=(160.0/25.4, 80.0*4.0/4.0/25.4))
     fig = plt.figure()
     fig.suptitle('Boreholes')
@@ -223,15 +453,8 @@ def visualize_field(borefield):
     # -------------------------------------------------------------------------
     # Top view
     # -------------------------------------------------------------------------
-    i = 0   # Initialize borehole index
     ax0 = fig.add_subplot(121)
-
-    for borehole in borefield:
-        i += 1  # Increment borehole index
-        (x, y) = borehole.position()    # Extract borehole position
-        # Add current borehole to the figure
-        ax0.plot(x, y, 'k.')
-        ax0.text(x, y, i, ha="center", va="center", size=9, bbox=bbox_props)
+    ax0.scatter(borefield.x, borefield.y, s=4., c='k', marker='.')
 
     # Configure figure axes
     ax0.set_xlabel('x (m)')
@@ -241,26 +464,25 @@ def visualize_field(borefield):
     ax0.xaxis.set_minor_locator(AutoMinorLocator())
     ax0.yaxis.set_minor_locator(AutoMinorLocator())
 
+    # Borehole numbers of the visible boreholes (updated on zooming and panning)
+    labels = _FieldLabels(ax0, borefield.x, borefield.y, max_labels)
+    ax0._field_labels = labels  # keep the callbacks alive as long as the axes
+
     # -------------------------------------------------------------------------
     # 3D view
     # -------------------------------------------------------------------------
-    i = 0   # Initialize borehole index
     ax1 = fig.add_subplot(122, projection='3d')
 
-    for borehole in borefield:
-        i += 1  # Increment borehole index
-        # Position of head of borehole
-        (x, y) = borehole.position()
-        # Position of bottom of borehole
-        x_H = x + borehole.H*np.sin(borehole.tilt)*np.cos(borehole.orientation)
-        y_H = y + borehole.H*np.sin(borehole.tilt)*np.sin(borehole.orientation)
-        z_H = borehole.D + borehole.H*np.cos(borehole.tilt)
-        # Add current borehole to the figure
-        ax1.plot(np.atleast_1d(x), np.atleast_1d(y), np.atleast_1d(borehole.D),
-                 'ko')
-        ax1.plot(np.array([x, x_H]),
-                 np.array([y, y_H]),
-                 -np.array([borehole.D, z_H]), 'k-')
+    # Position of bottom of boreholes
+    x_H = borefield.x + borefield.H*np.sin(borefield.tilt)*np.cos(borefield.orientation)
+    y_H = borefield.y + borefield.H*np.sin(borefield.tilt)*np.sin(borefield.orientation)
+    z_H = borefield.D + borefield.H*np.cos(borefield.tilt)
+    # Heads and axes of all boreholes
+    ax1.scatter(borefield.x, borefield.y, -borefield.D, c='k', marker='o', depthshade=False)
+    lines = np.stack((np.column_stack((borefield.x, borefield.y, -borefield.D)),
+                      np.column_stack((x_H, y_H, -z_H))), axis=1)
+    ax1.add_collection3d(Line3DCollection(lines, colors='k'))
+    ax1.auto_scale_xyz(lines[:, :, 0], lines[:, :, 1], lines[:, :, 2])
 
     # Configure figure axes
     ax1.set_xlabel('x (m)')
@@ -276,17 +498,47 @@ def visualize_field(borefield):
     return fig
 
 
+class _FieldLabels(object):
+    # Borehole numbers in the top view of visualize_field: the labels are
+    # created on demand and shown only if at most max_labels boreholes are
+    # within the axis limits
+
+    def __init__(self, ax, x, y, max_labels):
+        self.ax = ax
+        self.x = x
+        self.y = y
+        self.max_labels = max_labels
+        self.texts = {}
+        self.bbox_props = dict(boxstyle="circle,pad=0.3", fc="white", ec="b", lw=1.5)
+
+        self.update()
+        ax.callbacks.connect('xlim_changed', self.update)
+        ax.callbacks.connect('ylim_changed', self.update)
+
+    def update(self, ax=None):
+        x_min, x_max = sorted(self.ax.get_xlim())
+        y_min, y_max = sorted(self.ax.get_ylim())
+        visible = np.flatnonzero((self.x >= x_min) & (self.x <= x_max) &
+                                 (self.y >= y_min) & (self.y <= y_max))
+        if len(visible) > self.max_labels:
+            visible = []
+        for text in self.texts.values():
+            text.set_visible(False)
+        for i in visible:
+            if i not in self.texts:
+                self.texts[i] = self.ax.text(self.x[i], self.y[i], i + 1, ha="center", va="center", size=9,
+                                             bbox=self.bbox_props, clip_on=True)
+            self.texts[i].set_visible(True)
+
+
 def length_field(borefield):
     '''
     Parameters
     ----------
-    borefield: argument of class Borefield.
+    borefield: Borefield or list of Borehole objects.
 
     Returns: total borehole metres of borefield.
     -------
 
     '''
-    H_field = 0
-    for i in range(len(borefield)):
-        H_field += borefield[i].H
-    return H_field
+    return Borefield.from_boreholes(borefield).length()
@@ -1,25 +1,32 @@
 # -*- coding: utf-8 -*-
 """ GERDPySim - 'gfunction.py'
     
-    Functions to determine the g-function (Dirichlet temperature boundary condition)
+    Functions to determine the g-function (Dirichlet temperature boundary condition,
+    or uniform heat flux for design screening)
     
     based on: Pygfunction by Massimo Cimmino
 
     Authors: Massimo Cimmino
 """
+import os
+import shutil
+import tempfile
 import time as tim
 
 import numpy as np
 from scipy.constants import pi
 from scipy.interpolate import interp1d as interp1d
 
-from .boreholes import Borehole
-from .heat_transfer import thermal_response_factors
+from .boreholes import Borefield
+from .heat_transfer import (equivalent_response_factors, finite_line_source_steady, thermal_response_factors,
+                            update_response_factors)
 
 
 def uniform_temperature(boreholes, time, alpha, self, nSegments=12, method='linear',
                         use_similarities=True, disTol=0.01, tol=1.0e-6,
-                        processes=None, disp=True):
+                        processes=None, disp=True, scratch_dir=None,
+                        use_equivalent_boreholes=False, clusterTol=0.01,
+                        use_symmetries=False, segment_ratios=None):
     """
     Evaluate the g-function with uniform borehole wall temperature.
 
@@ -62,6 +69,34 @@ def uniform_temperature(boreholes, time, alpha, self, nSegments=12, method='line
     disp : bool, optional
         Set to true to print progression messages.
         Default is False.
+    scratch_dir : str, optional
+        Directory for memory-mapped files of the dense response factor
+        matrices at all times (for bore fields, which exceed the memory
+        otherwise). Default is None (matrices are assembled in memory, one
+        time value at a time).
+    use_equivalent_boreholes : bool, optional
+        Set to True to cluster boreholes with similar thermal behaviour into
+        equivalent boreholes (see equivalent_boreholes) and to solve the
+        system of the cluster representatives only (for large bore fields).
+        Default is False.
+    clusterTol : float, optional
+        Relative tolerance on the steady-state response of the boreholes of
+        a cluster (see equivalent_boreholes).
+        Default is 0.01.
+    use_symmetries : bool, optional
+        Set to True to detect the geometric symmetries of the bore field
+        (see 'boreholes.Borefield.symmetry_classes'). Boreholes, which are
+        mapped onto each other by a symmetry, have equal heat extraction
+        rates, so that the system is solved for one borehole of each
+        symmetry class only. The response factors of the classes are grouped
+        by distance with the tolerance disTol (see
+        'heat_transfer.equivalent_response_factors'), so that the g-function
+        deviates slightly from the full solution.
+        Default is False.
+    segment_ratios : array, optional
+        Segment lengths relative to the borehole length (see
+        'utilities.segment_ratios' and adaptive_segments).
+        Default is None (segments of equal length).
 
     Returns
     -------
@@ -96,79 +131,54 @@ def uniform_temperature(boreholes, time, alpha, self, nSegments=12, method='line
 
     # Initialize chrono
     tic = tim.time()
-    # Number of boreholes
-    nBoreholes = len(boreholes)
-    # Total number of line sources
-    nSources = nSegments*nBoreholes
-    # Number of time values
-    nt = len(np.atleast_1d(time))
-    # Initialize g-function
-    gFunction = np.zeros(nt)
-    # Initialize segment heat extraction rates
-    Q = np.zeros((nSources, nt))
-
-    # Split boreholes into segments
-    boreSegments = _borehole_segments(boreholes, nSegments)
     # Vector of time values
     t = np.atleast_1d(time).flatten()
-    # Calculate segment to segment thermal response factors
-    h_ij = thermal_response_factors(
-        boreSegments, t, alpha, self, use_similarities=use_similarities,
-        splitRealAndImage=True, disTol=disTol, tol=tol, processes=processes,
-        disp=disp)
+    labels = None
+    if use_equivalent_boreholes:
+        # Clusters of boreholes with similar thermal behaviour
+        (labels, representatives) = equivalent_boreholes(boreholes, clusterTol=clusterTol)
+        if disp:
+            print('{} equivalent boreholes'.format(len(representatives)))
+            self.ui.text_console.insertPlainText('{} equivalent boreholes\n'.format(len(representatives)))
+    elif use_symmetries:
+        # Classes of symmetric boreholes (if the bore field has symmetries)
+        (labels, representatives) = Borefield.from_boreholes(boreholes).symmetry_classes()
+        if len(representatives) == len(boreholes):
+            labels = None
+        elif disp:
+            print('{} classes of symmetric boreholes'.format(len(representatives)))
+            self.ui.text_console.insertPlainText(
+                '{} classes of symmetric boreholes\n'.format(len(representatives)))
+    if labels is not None:
+        # Segments of the representative boreholes
+        boreSegments = _borehole_segments(Borefield.from_boreholes(boreholes)[representatives], nSegments,
+                                          segment_ratios)
+        # Calculate segment to segment thermal response factors of the representatives
+        h_ij = equivalent_response_factors(
+            boreholes, labels, representatives, nSegments, t, alpha, self,
+            disTol=disTol, processes=processes, disp=disp, segment_ratios=segment_ratios)
+        # Number of boreholes of each cluster
+        multiplicity = np.repeat(np.bincount(labels), nSegments)
+    else:
+        # Split boreholes into segments
+        boreSegments = _borehole_segments(boreholes, nSegments, segment_ratios)
+        # Calculate segment to segment thermal response factors
+        h_ij = thermal_response_factors(
+            boreSegments, t, alpha, self, use_similarities=use_similarities,
+            splitRealAndImage=True, disTol=disTol, tol=tol, processes=processes,
+            disp=disp, compressed=True)
+        multiplicity = None
     toc1 = tim.time()
 
     if disp:
         print('Building and solving system of equations ...')
         self.ui.text_console.insertPlainText('Building and solving system of equations ...\n')
-    # -------------------------------------------------------------------------
-    # Build a system of equation [A]*[X] = [B] for the evaluation of the
-    # g-function. [A] is a coefficient matrix, [X] = [Qb,Tb] is a state
-    # space vector of the borehole heat extraction rates and borehole wall
-    # temperature (equal for all segments), [B] is a coefficient vector.
-    # -------------------------------------------------------------------------
-
     # Segment lengths
-    Hb = np.array([b.H for b in boreSegments])
-    # Vector of time steps
-    dt = np.hstack((t[0], t[1:] - t[:-1]))
-    if not np.isscalar(time) and len(time) > 1:
-        # Spline object for thermal response factors
-        h_dt = interp1d(np.hstack((0., t)),
-                        np.dstack((np.zeros((nSources,nSources)), h_ij)),
-                        kind=method, axis=2)
-        # Thermal response factors evaluated at t=dt
-        h_dt = h_dt(dt)
-    else:
-        h_dt = h_ij
-    # Thermal response factor increments
-    dh_ij = np.concatenate((h_ij[:,:,0:1], h_ij[:,:,1:]-h_ij[:,:,:-1]), axis=2)
-
-    # Energy conservation: sum([Qb*Hb]) = sum([Hb])
-    A_eq2 = np.hstack((Hb, 0.))
-    B_eq2 = np.atleast_1d(np.sum(Hb))
-
-    # Build and solve the system of equations at all times
-    for p in range(nt):
-        # Current thermal response factor matrix
-        h_ij_dt = h_dt[:,:,p]
-        # Reconstructed load history
-        Q_reconstructed = load_history_reconstruction(t[0:p+1], Q[:,0:p+1])
-        # Borehole wall temperature for zero heat extraction at current step
-        Tb_0 = _temporal_superposition(dh_ij, Q_reconstructed)
-        # Spatial superposition: [Tb] = [Tb0] + [h_ij_dt]*[Qb]
-        A_eq1 = np.hstack((h_ij_dt, -np.ones((nSources, 1))))
-        B_eq1 = -Tb_0
-        # Assemble equations
-        A = np.vstack((A_eq1, A_eq2))
-        B = np.hstack((B_eq1, B_eq2))
-        # Solve the system of equations
-        X = np.linalg.solve(A, B)
-        # Store calculated heat extraction rates
-        Q[:,p] = X[0:nSources]
-        # The borehole wall temperatures are equal for all segments
-        Tb = X[-1]
-        gFunction[p] = Tb
+    Hb = boreSegments.H
+    if multiplicity is not None:
+        # (summed over all boreholes of each cluster)
+        Hb = Hb * multiplicity
+    gFunction = _solve_uniform_temperature(h_ij, Hb, t, method=method, scratch_dir=scratch_dir)
 
     toc2 = tim.time()
     if disp:
@@ -182,11 +192,372 @@ def uniform_temperature(boreholes, time, alpha, self, nSegments=12, method='line
 
     # Return float if time is a scalar
     if np.isscalar(time):
-        gFunction = np.asscalar(gFunction)
+        gFunction = gFunction.item()
+
+    return gFunction
+
+
+def uniform_heat_flux(boreholes, time, alpha, self, nSegments=1,
+                      use_similarities=True, disTol=0.01, tol=1.0e-6,
+                      processes=None, disp=True, use_symmetries=False, segment_ratios=None):
+    """
+    Evaluate the g-function with uniform heat extraction rate along the boreholes.
+
+    All boreholes extract the same (uniform) heat rate per unit length; the
+    g-function is the mean borehole wall temperature, i.e. the length-weighted
+    sum of the segment-to-segment thermal response factors. No system of
+    equations is solved, which makes the evaluation suitable for screening
+    many bore field layouts.
+
+    Accuracy: the uniform heat flux boundary condition neglects the
+    redistribution of the heat extraction towards the boreholes at the
+    edges of the field. The g-function is identical to the one with uniform
+    borehole wall temperature (uniform_temperature) at short times, but
+    overestimates it at long times, the more so the denser and the larger
+    the bore field (typically a few percent for small fields, >10 % for
+    large, dense fields). Use uniform_temperature for the final design.
+
+    Parameters
+    ----------
+    boreholes : list of Borehole objects
+        List of boreholes included in the bore field.
+    time : float or array
+        Values of time (in seconds) for which the g-function is evaluated.
+    alpha : float
+        Soil thermal diffusivity (in m2/s).
+    nSegments : int, optional
+        Number of line segments used per borehole. As the heat extraction
+        rate is uniform, the mean borehole wall temperature does not depend
+        on the number of segments.
+        Default is 1.
+    use_similarities : bool, optional
+        True if similarities are used to limit the number of FLS evaluations.
+        Default is True.
+    disTol : float, optional
+        Relative tolerance on radial distance (see uniform_temperature).
+        Default is 0.01.
+    tol : float, optional
+        Relative tolerance on length and depth (see uniform_temperature).
+        Default is 1.0e-6.
+    processes : int, optional
+        Number of processors to use in calculations. If the value is set to
+        None, a number of processors equal to cpu_count() is used.
+        Default is None.
+    disp : bool, optional
+        Set to true to print progression messages.
+        Default is True.
+    use_symmetries : bool, optional
+        Set to True to evaluate the response factors of one borehole of each
+        symmetry class only (see uniform_temperature).
+        Default is False.
+    segment_ratios : array, optional
+        Segment lengths relative to the borehole length.
+        Default is None (segments of equal length).
+
+    Returns
+    -------
+    gFunction : float or array
+        Values of the g-function
+
+    """
+    if disp:
+        print(80*'-')
+        print('Calculating g-function for uniform heat extraction rate')
+        print(80*'-')
+        self.ui.text_console.insertPlainText(60 * '-' + '\n')
+        self.ui.text_console.insertPlainText('Calculating g-function for uniform heat extraction rate\n')
+        self.ui.text_console.insertPlainText(60 * '-' + '\n')
+
+    # Initialize chrono
+    tic = tim.time()
+    # Vector of time values
+    t = np.atleast_1d(time).flatten()
+    labels = None
+    if use_symmetries:
+        # Classes of symmetric boreholes (if the bore field has symmetries)
+        (labels, representatives) = Borefield.from_boreholes(boreholes).symmetry_classes()
+        if len(representatives) == len(boreholes):
+            labels = None
+    if labels is not None:
+        # Segments of the representative boreholes
+        boreSegments = _borehole_segments(Borefield.from_boreholes(boreholes)[representatives], nSegments,
+                                          segment_ratios)
+        h_ij = equivalent_response_factors(
+            boreholes, labels, representatives, nSegments, t, alpha, self,
+            disTol=disTol, processes=processes, disp=disp, segment_ratios=segment_ratios)
+        # Segment lengths (summed over all boreholes of each class)
+        Hb = boreSegments.H * np.repeat(np.bincount(labels), nSegments)
+    else:
+        boreSegments = _borehole_segments(boreholes, nSegments, segment_ratios)
+        h_ij = thermal_response_factors(
+            boreSegments, t, alpha, self, use_similarities=use_similarities,
+            splitRealAndImage=True, disTol=disTol, tol=tol, processes=processes,
+            disp=disp, compressed=True)
+        Hb = boreSegments.H
+
+    # Spatial superposition for [Qb] = 1: [Tb] = [h_ij]*[1], averaged over
+    # the borehole length
+    gFunction = h_ij.weighted_sum(Hb) / np.sum(Hb)
+
+    toc = tim.time()
+    if disp:
+        print('Total time for g-function evaluation: {} sec'.format(toc - tic))
+        print(60*'-')
+        self.ui.text_console.insertPlainText('Total time for g-function evaluation: {} sec\n'.format(toc - tic))
+        self.ui.text_console.insertPlainText(60 * '-' + '\n')
+
+    # Return float if time is a scalar
+    if np.isscalar(time):
+        gFunction = gFunction.item()
 
     return gFunction
 
 
+def adaptive_segments(boreholes, time, alpha, self, segTol=0.01, candidates=(4, 8, 16, 32),
+                      end_refinement=False, nTimes=8, disp=True, boundary_condition='UBWT', **kwargs):
+    """
+    Select the number of segments per borehole for the g-function.
+
+    The segmentation is refined (number of segments of candidates, doubled
+    from one candidate to the next) until the estimated error of the
+    g-function is below segTol (relative); the coarser of two consecutive
+    candidates is selected. As the g-function converges about linearly
+    with the segment length, the error of the coarser candidate is
+    estimated as twice the change of the g-function between both
+    (Richardson). With fewer than 4 segments, the convergence is not yet
+    monotonous. The g-function is evaluated at nTimes log-spaced time
+    values only.
+
+    Parameters
+    ----------
+    boreholes : list of Borehole objects
+        List of boreholes included in the bore field.
+    time : float or array
+        Values of time (in seconds) for which the g-function is required.
+    alpha : float
+        Soil thermal diffusivity (in m2/s).
+    segTol : float, optional
+        Relative tolerance on the estimated error of the g-function.
+        Default is 0.01.
+    candidates : tuple of int, optional
+        Numbers of segments per borehole (ascending, doubled from one
+        candidate to the next). The largest candidate is selected if the
+        g-function does not converge.
+        Default is (4, 8, 16, 32).
+    end_refinement : bool, optional
+        Set to True for shorter segments near the top and the bottom of the
+        boreholes (see 'utilities.segment_ratios'). Converges with fewer
+        segments, but segments of different lengths have fewer similarities,
+        so that each segment is more expensive.
+        Default is False.
+    nTimes : int, optional
+        Number of time values for the comparison.
+        Default is 8.
+    disp : bool, optional
+        Set to true to print the selected discretization.
+        Default is True.
+    boundary_condition : str, optional
+        Boundary condition of the g-function (key of BOUNDARY_CONDITIONS).
+        Default is 'UBWT'.
+    **kwargs
+        Keyword arguments of the g-function (see uniform_temperature and
+        uniform_heat_flux).
+
+    Returns
+    -------
+    options : dict
+        Selected discretization as keyword arguments of the g-function
+        (nSegments, segment_ratios).
+
+    """
+    from .utilities import segment_ratios
+
+    gfunc = BOUNDARY_CONDITIONS[boundary_condition]
+    t = np.atleast_1d(time).flatten()
+    tCheck = np.geomspace(np.min(t), np.max(t), num=nTimes) if len(t) > nTimes else t
+    options = None
+    gPrevious = None
+    error = np.inf
+    for nSegments in candidates:
+        candidate = {'nSegments': nSegments,
+                     'segment_ratios': segment_ratios(nSegments, end_refinement) if end_refinement else None}
+        g = gfunc(boreholes, tCheck, alpha, self, disp=False, **dict(kwargs, **candidate))
+        if gPrevious is not None:
+            error = 2. * np.max(np.abs(g - gPrevious) / np.abs(g))
+            if error < segTol:
+                break
+        (options, gPrevious) = (candidate, g)
+    else:
+        options = candidate
+
+    if disp:
+        message = 'Borehole segmentation: {} segments per borehole ({}, est. rel. error {:.2e})'.format(
+            options['nSegments'], 'refined at the ends' if options['segment_ratios'] is not None else 'uniform',
+            error)
+        print(message)
+        self.ui.text_console.insertPlainText(message + '\n')
+
+    return options
+
+
+class IncrementalGFunction(object):
+    """
+    g-function with uniform borehole wall temperature for a sequence of
+    modified layouts of a bore field (e.g. interactive layout design).
+
+    The segment-to-segment response factors of the previous layout are kept;
+    for a modified layout, only the response factors of the added or moved
+    boreholes are evaluated (see 'heat_transfer.update_response_factors')
+    before the system of equations is solved again.
+
+    Attributes
+    ----------
+    boreSegments :  Borefield
+                    borehole segments of the last evaluated layout
+    h_ij :          ResponseFactors
+                    response factors of boreSegments
+
+    Examples
+    --------
+    >>> gfunc = IncrementalGFunction(time, alpha, self)
+    >>> g = gfunc.evaluate(boreField)
+    >>> g_moved = gfunc.evaluate(boreField_moved)  # one borehole moved
+
+    """
+
+    def __init__(self, time, alpha, gui, nSegments=12, method='linear', use_similarities=True,
+                 disTol=0.01, tol=1.0e-6, processes=None, disp=True):
+        self.time = time
+        self.alpha = alpha
+        self.gui = gui  # GUI main window (or 'headless.HeadlessSession')
+        self.nSegments = nSegments
+        self.method = method
+        self.use_similarities = use_similarities
+        self.disTol = disTol
+        self.tol = tol
+        self.processes = processes
+        self.disp = disp
+        self.boreSegments = None
+        self.h_ij = None
+
+    def evaluate(self, boreholes):
+        """
+        Returns the g-function of a layout of the bore field (see uniform_temperature).
+
+        Parameters
+        ----------
+        boreholes : Borefield or list of Borehole objects
+            Boreholes of the (modified) bore field.
+
+        Returns
+        -------
+        gFunction : array
+            Values of the g-function.
+
+        """
+        t = np.atleast_1d(self.time).flatten()
+        boreSegments = _borehole_segments(boreholes, self.nSegments)
+        if self.h_ij is None:
+            h_ij = thermal_response_factors(
+                boreSegments, t, self.alpha, self.gui, use_similarities=self.use_similarities,
+                splitRealAndImage=True, disTol=self.disTol, tol=self.tol, processes=self.processes,
+                disp=self.disp, compressed=True)
+        else:
+            h_ij = update_response_factors(
+                self.h_ij, self.boreSegments, boreSegments, t, self.alpha, self.gui,
+                processes=self.processes, disp=self.disp)
+        (self.boreSegments, self.h_ij) = (boreSegments, h_ij)
+
+        return _solve_uniform_temperature(h_ij, boreSegments.H, t, method=self.method)
+
+
+# g-functions by boundary condition at the borehole wall (see '_main.simulate')
+BOUNDARY_CONDITIONS = {
+    # uniform borehole wall temperature
+    'UBWT': uniform_temperature,
+    # uniform heat flux (no system of equations, for design screening)
+    'UHF': uniform_heat_flux,
+}
+
+
+def sparse_time_gfunction(boundary_condition, boreholes, time, alpha, self, nTimes=40, **kwargs):
+    """
+    Evaluate the g-function on a sparse logarithmic time grid and interpolate
+    it to the requested time values.
+
+    The g-function is smooth in ln(t): it is evaluated (FLS integrals and
+    system of equations) at nTimes log-spaced time values between the
+    smallest and the largest requested time value only, and interpolated by
+    a cubic spline in ln(t). Requested time vectors of at most nTimes values
+    are evaluated directly. The interpolation error can be checked with
+    sparse_time_error.
+
+    Parameters
+    ----------
+    boundary_condition : str
+        Boundary condition (key of BOUNDARY_CONDITIONS).
+    boreholes : list of Borehole objects
+        List of boreholes included in the bore field.
+    time : array
+        Values of time (in seconds) for which the g-function is required,
+        e.g. the times of the load aggregation cells.
+    alpha : float
+        Soil thermal diffusivity (in m2/s).
+    nTimes : int, optional
+        Number of time values of the logarithmic grid.
+        Default is 40.
+    **kwargs
+        Keyword arguments of the g-function (see uniform_temperature and
+        uniform_heat_flux).
+
+    Returns
+    -------
+    gFunction : array
+        Values of the g-function at the requested time values.
+
+    """
+    from scipy.interpolate import CubicSpline
+
+    t = np.atleast_1d(time).flatten()
+    gfunc = BOUNDARY_CONDITIONS[boundary_condition]
+    if len(t) <= nTimes:
+        return gfunc(boreholes, t, alpha, self, **kwargs)
+    tGrid = np.geomspace(np.min(t), np.max(t), num=nTimes)
+    gGrid = gfunc(boreholes, tGrid, alpha, self, **kwargs)
+    return CubicSpline(np.log(tGrid), gGrid)(np.log(t))
+
+
+def sparse_time_error(boundary_condition, boreholes, time, alpha, self, nTimes=40, **kwargs):
+    """
+    Compare the g-function interpolated from a sparse logarithmic time grid
+    (see sparse_time_gfunction) with the full evaluation at all time values.
+
+    Parameters
+    ----------
+    boundary_condition, boreholes, time, alpha, nTimes, **kwargs
+        See sparse_time_gfunction.
+
+    Returns
+    -------
+    report : dict
+        Number of time values (nt, nTimes), maximum absolute and relative
+        error of the interpolated g-function (max_abs_error, max_rel_error)
+        and the runtimes of both evaluations [s] (time_full, time_sparse).
+
+    """
+    tic = tim.time()
+    g_full = np.atleast_1d(BOUNDARY_CONDITIONS[boundary_condition](
+        boreholes, time, alpha, self, **kwargs))
+    toc = tim.time()
+    g_sparse = sparse_time_gfunction(boundary_condition, boreholes, time, alpha, self, nTimes=nTimes, **kwargs)
+    toc2 = tim.time()
+
+    error = np.abs(g_sparse - g_full)
+    return {'nt': len(g_full), 'nTimes': min(nTimes, len(g_full)),
+            'max_abs_error': float(np.max(error)), 'max_rel_error': float(np.max(error / np.abs(g_full))),
+            'time_full': toc - tic, 'time_sparse': toc2 - toc}
+
+
 def load_history_reconstruction(time, Q):
     """
     Reconstructs the load history.
@@ -229,49 +600,203 @@ def load_history_reconstruction(time, Q):
     return Q_reconstructed
 
 
-def _borehole_segments(boreholes, nSegments):
+def equivalent_boreholes(boreholes, clusterTol=0.01):
+    """
+    Cluster the boreholes of a bore field into equivalent boreholes.
+
+    The boreholes are clustered by their steady-state borehole wall
+    temperature for equal heat extraction rates per length in all boreholes
+    (steady-state FLS solution, see
+    'heat_transfer.finite_line_source_steady'). Only boreholes of equal
+    dimensions are clustered. Within a cluster, the steady-state responses
+    differ by at most clusterTol (relative to the smallest response of the
+    cluster), e.g. interior, edge and corner boreholes of a regular field form
+    separate clusters.
+
+    Parameters
+    ----------
+    boreholes : Borefield or list of Borehole objects
+        Boreholes in the bore field.
+    clusterTol : float, optional
+        Relative tolerance on the steady-state response of the boreholes of
+        a cluster.
+        Default is 0.01.
+
+    Returns
+    -------
+    labels : array
+        Cluster index of each borehole.
+    representatives : array
+        Index of the representative borehole of each cluster (the borehole
+        with the response closest to the mean response of the cluster).
+
+    """
+    boreholes = Borefield.from_boreholes(boreholes)
+
+    # Steady-state borehole wall temperatures (receiver i: rows, source j: columns)
+    h = finite_line_source_steady(boreholes.distances(),
+                                  boreholes.H[np.newaxis, :], boreholes.D[np.newaxis, :],
+                                  boreholes.H[:, np.newaxis], boreholes.D[:, np.newaxis])
+    T = h.sum(axis=1)
+
+    labels = np.empty(len(boreholes), dtype=int)
+    representatives = []
+    # Boreholes of equal dimensions
+    dimensions = np.column_stack((boreholes.H, boreholes.D, boreholes.r_b, boreholes.tilt))
+    (_, group) = np.unique(dimensions, axis=0, return_inverse=True)
+    for g in range(group.max() + 1):
+        members = np.flatnonzero(group.ravel() == g)
+        members = members[np.argsort(T[members], kind='stable')]
+        # Clusters of consecutive responses (sorted) within the tolerance
+        # (at least 1e-9, so that symmetric boreholes are clustered despite rounding errors)
+        rTol = max(clusterTol, 1.0e-9)
+        start = 0
+        for k in range(1, len(members) + 1):
+            if k == len(members) or T[members[k]] - T[members[start]] > rTol * abs(T[members[start]]):
+                cluster = members[start:k]
+                labels[cluster] = len(representatives)
+                representatives.append(cluster[np.argmin(np.abs(T[cluster] - T[cluster].mean()))])
+                start = k
+
+    return labels, np.array(representatives)
+
+
+def _solve_uniform_temperature(h_ij, Hb, t, method='linear', scratch_dir=None):
+    """
+    Solve the g-function with uniform borehole wall temperature for given
+    segment-to-segment thermal response factors.
+
+    Parameters
+    ----------
+    h_ij : ResponseFactors
+        Segment-to-segment thermal response factors at the time values t.
+    Hb : array
+        Segment lengths (summed over all boreholes represented by a segment).
+    t : array
+        Values of time (in seconds).
+    method : string, optional
+        Interpolation method used for segment-to-segment thermal response
+        factors (see uniform_temperature).
+        Default is linear.
+    scratch_dir : str, optional
+        Directory for memory-mapped files of the dense response factor
+        matrices (see uniform_temperature). Default is None.
+
+    Returns
+    -------
+    gFunction : array
+        Values of the g-function at the time values t.
+
+    """
+    # Total number of line sources
+    nSources = len(Hb)
+    # Number of time values
+    nt = len(t)
+    # Initialize g-function
+    gFunction = np.zeros(nt)
+    # Initialize segment heat extraction rates
+    Q = np.zeros((nSources, nt))
+    # -------------------------------------------------------------------------
+    # Build a system of equation [A]*[X] = [B] for the evaluation of the
+    # g-function. [A] is a coefficient matrix, [X] = [Qb,Tb] is a state
+    # space vector of the borehole heat extraction rates and borehole wall
+    # temperature (equal for all segments), [B] is a coefficient vector.
+    # -------------------------------------------------------------------------
+
+    # Vector of time steps
+    dt = np.hstack((t[0], t[1:] - t[:-1]))
+    if len(t) > 1:
+        # Thermal response factors evaluated at t=dt (interpolated)
+        h_dt = h_ij.interpolate(t, dt, kind=method)
+    else:
+        h_dt = h_ij
+    # Thermal response factor increments
+    dh_ij = h_ij.increments()
+    scratch = None
+    try:
+        if scratch_dir is not None:
+            # Dense matrices of all times in memory-mapped scratch files
+            scratch = tempfile.mkdtemp(prefix='gfunction-', dir=scratch_dir)
+            h_dt = h_dt.to_memmap(os.path.join(scratch, 'h_dt.dat'))
+            dh_ij = dh_ij.to_memmap(os.path.join(scratch, 'dh_ij.dat'))
+
+        # Energy conservation: sum([Qb*Hb]) = sum([Hb])
+        # (equations and solution buffers are allocated once for all times)
+        A = np.zeros((nSources + 1, nSources + 1))
+        B = np.zeros(nSources + 1)
+        A[:nSources, nSources] = -1.
+        A[nSources, :nSources] = Hb
+        B[nSources] = np.sum(Hb)
+        dh_buffer = np.zeros((nSources, nSources))
+
+        # Build and solve the system of equations at all times
+        for p in range(nt):
+            # Reconstructed load history
+            Q_reconstructed = load_history_reconstruction(t[0:p+1], Q[:,0:p+1])
+            # Borehole wall temperature for zero heat extraction at current step
+            Tb_0 = _temporal_superposition(dh_ij, Q_reconstructed, buffer=dh_buffer)
+            # Spatial superposition: [Tb] = [Tb0] + [h_ij_dt]*[Qb]
+            # (current thermal response factor matrix)
+            h_dt.at(p, out=A[:nSources, :nSources])
+            B[:nSources] = -Tb_0
+            # Solve the system of equations
+            X = np.linalg.solve(A, B)
+            # Store calculated heat extraction rates
+            Q[:,p] = X[0:nSources]
+            # The borehole wall temperatures are equal for all segments
+            Tb = X[-1]
+            gFunction[p] = Tb
+    finally:
+        if scratch is not None:
+            # The memory maps are released before the scratch files are
+            # removed (open mappings can not be deleted on Windows)
+            for h in (h_dt, dh_ij):
+                if hasattr(h, 'close'):
+                    h.close()
+            del h, h_dt, dh_ij
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    return gFunction
+
+
+def _borehole_segments(boreholes, nSegments, segment_ratios=None):
     """
     Split boreholes into segments.
 
-    This function goes through the list of boreholes and builds a new list,
-    with each borehole split into nSegments.
+    This function splits each borehole of the bore field into nSegments
+    (see Borefield.segments).
 
     Parameters
     ----------
-    boreholes : list of Borehole objects
-        List of boreholes included in the bore field.
+    boreholes : Borefield or list of Borehole objects
+        Boreholes included in the bore field.
     nSegments : int
         Number of line segments used per borehole.
+    segment_ratios : array, optional
+        Relative segment lengths. Default is None (segments of equal length).
 
     Returns
     -------
-    boreSegments : list
-        List of borehole segments.
+    boreSegments : Borefield
+        Borehole segments.
 
     """
-    boreSegments = []
-    for b in boreholes:
-        for i in range(nSegments):
-            # Divide borehole into segments of equal length
-            H = b.H / nSegments
-            # Buried depth of the i-th segment
-            D = b.D + i * b.H / nSegments
-            # Add to list of segments
-            boreSegments.append(Borehole(H, D, b.r_b, b.x, b.y))
-    return boreSegments
-
-
-def _temporal_superposition(dh_ij, Q):
+    return Borefield.from_boreholes(boreholes).segments(nSegments, segment_ratios)
+
+
+def _temporal_superposition(dh_ij, Q, buffer=None):
     """
     Temporal superposition for inequal time steps.
 
     Parameters
     ----------
-    dh_ij : array
-        Values of the segment-to-segment thermal response factor increments at
-        the given time step.
+    dh_ij : ResponseFactors or MappedResponseFactors
+        Segment-to-segment thermal response factor increments.
     Q : array
         Heat extraction rates of all segments at all times.
+    buffer : array, optional
+        (nSources, nSources) array for the response factor increments of
+        one time value. Default is None (allocated at each time value).
 
     Returns
     -------
@@ -288,5 +813,5 @@ def _temporal_superposition(dh_ij, Q):
     Tb_0 = np.zeros(nSources)
     # Spatial and temporal superpositions
     for it in range(nt):
-        Tb_0 += dh_ij[:,:,it].dot(Q[:,nt-it-1])
+        Tb_0 += dh_ij.at(it, out=buffer).dot(Q[:,nt-it-1])
     return Tb_0
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+""" GERDPySim - 'headless.py'
+
+    Stand-in for the GUI main window, so that the simulation can be run
+    without Qt (batch runs, regression tests, parameter sweeps)
+
+    The simulation modules read their parameters from the GUI via
+    'self.ui.<widget>.value()', '.text()', '.isChecked()' and '.currentData()'
+    and write messages to 'self.ui.text_console'. HeadlessSession provides the
+    same interface, with the parameters given as keyword arguments named after
+    the GUI widgets (defaults are the defaults of the GUI).
+
+    Authors: Yannick Apfel, Meike Martin
+"""
+
+# GUI default values (see 'modules/ui_main.py')
+DEFAULTS = {
+    # Weather data
+    'line_weather_file': '',
+    'sb_h_NHN': 520,  # elevation (above sea-level) [m]
+    'sb_day': 1,  # start day
+    'cb_month': 1,  # start month
+    # Ground
+    'sb_therm_diffu': 1.0,  # thermal diffusivity [1e-6 m2/s]
+    'sb_therm_cond': 2.0,  # thermal conductivity [W/mK]
+    'sb_undis_soil_temp': 10.0,  # undisturbed ground temperature [°C]
+    # Borefield
+    'line_borefield_file': '',
+    'rb_depth': False,  # varying borehole depth (read from file)
+    'sb_depth_boreholes': 50,  # borehole depth [m]
+    'sb_r_borehole': 0.15,  # borehole radius [m]
+    # Heatpipes
+    'sb_number_heatpipes': 6,  # no. of heatpipes per borehole [-]
+    'sb_radius_w': 0.12,  # radius of heatpipe-centres [m]
+    'sb_radius_iso': 0.016,  # outer radius of heatpipe insulation [m]
+    'sb_radius_pa': 0.016,  # outer radius of heatpipes [m]
+    'sb_radius_pi': 0.015,  # inner radius of heatpipes [m]
+    'sb_lambda_b': 2.0,  # ~ of borehole backfill [W/mK]
+    'sb_lambda_iso': 0.3,  # ~ of insulation layer [W/mK]
+    'sb_lambda_p': 14.0,  # ~ of heatpipe material [W/mK]
+    # Connection borehole-to-heating element
+    'sb_D_iso_an': 0.005,  # thickness of the insulation layer [m]
+    'sb_l_An': 5,  # total length of connections [m]
+    # Heating element
+    'sb_A_he': 35,  # surface area [m2]
+    'sb_x_min': 0.025,  # minimum vertical pipe-to-surface distance [m]
+    'sb_lambda_Bet': 2.1,  # thermal conductivity [W/mK]
+    'sb_s_R': 0.050,  # centre-distance between heatpipes [m]
+    'sb_l_R': 1000,  # total heatpipe length inside heating element [m]
+    'sb_D_he': 0.25,  # vertical thickness of heating element [m]
+    'sb_D_iso_he': 0.03,  # vertical thickness of insulation layer [m]
+    # Simulation
+    'rb_multiyearsim': False,  # multi-year simulation (sb_simtime in years)
+    'sb_simtime': 730,  # simulation time [h] (or [years])
+    'sb_rf': 0.2,  # snow free area ratio [-]
+}
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December']
+
+
+class _SpinBox(object):
+    def __init__(self, value):
+        self._value = value
+
+    def value(self):
+        return self._value
+
+
+class _LineEdit(object):
+    def __init__(self, text):
+        self._text = str(text)
+
+    def text(self):
+        return self._text
+
+
+class _RadioButton(object):
+    def __init__(self, checked):
+        self._checked = bool(checked)
+
+    def isChecked(self):
+        return self._checked
+
+
+class _ComboBox(object):
+    def __init__(self, data):
+        self._data = data
+
+    def currentData(self):
+        return self._data
+
+    def currentText(self):
+        return MONTHS[int(self._data) - 1]
+
+
+class _Console(object):
+    """
+    Collects the text written to the GUI-console.
+    """
+
+    def __init__(self, echo=False):
+        self.echo = echo
+        self.lines = []
+
+    def insertPlainText(self, text):
+        self.lines.append(text)
+        if self.echo:
+            print(text, end='')
+
+    def toPlainText(self):
+        return ''.join(self.lines)
+
+    def clear(self):
+        self.lines = []
+
+
+class _HeadlessUI(object):
+    pass
+
+
+class HeadlessSession(object):
+    """
+    Contains the simulation parameters in place of the GUI main window.
+
+    Attributes
+    ----------
+    ui:     object
+            widget stand-ins named after the GUI widgets
+            (e.g. ui.sb_simtime.value(), ui.line_weather_file.text())
+    headless: bool
+            True (no layout plots during the simulation, see '_main.simulate')
+
+    Examples
+    --------
+    >>> session = HeadlessSession(line_borefield_file='./example_data/custom_field_5.txt',
+    ...                           line_weather_file='./example_data/Wetterdaten_Hamburg_h.xlsx',
+    ...                           sb_simtime=730)
+    >>> sim = GERDPySim._main.simulate(session, visualize=False)
+
+    """
+
+    headless = True
+
+    def __init__(self, echo=False, **params):
+        unknown = set(params) - set(DEFAULTS)
+        if unknown:
+            raise KeyError('Unknown simulation parameter(s): {}'.format(', '.join(sorted(unknown))))
+        self.params = dict(DEFAULTS, **params)
+
+        self.ui = _HeadlessUI()
+        for name, value in self.params.items():
+            if name.startswith('sb_'):
+                widget = _SpinBox(value)
+            elif name.startswith('line_'):
+                widget = _LineEdit(value)
+            elif name.startswith('rb_'):
+                widget = _RadioButton(value)
+            else:
+                widget = _ComboBox(value)
+            setattr(self.ui, name, widget)
+        self.ui.text_console = _Console(echo=echo)
+
+    def __repr__(self):
+        s = 'HeadlessSession({})'.format(', '.join(
+            '{}={!r}'.format(k, v) for k, v in self.params.items() if DEFAULTS[k] != v))
+        return s
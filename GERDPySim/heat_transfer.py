@@ -16,6 +16,9 @@ import numpy as np
 from scipy.integrate import quad
 from scipy.special import erf
 
+# size of the blocks of time values written to memory-mapped response factors [bytes]
+MEMMAP_BLOCK_BYTES = 2**26
+
 
 def finite_line_source(
         time, alpha, borehole1, borehole2, reaSource=True, imgSource=True):
@@ -125,10 +128,265 @@ def finite_line_source(
     return h
 
 
+def finite_line_source_vectorized(
+        time, alpha, dis, H1, D1, H2, D2, reaSource=True, imgSource=True):
+    """
+    Evaluate the Finite Line Source (FLS) solution for arrays of borehole pairs.
+
+    Same solution as finite_line_source, but the integral is evaluated for
+    all pairs at once with a vector-valued adaptive quadrature
+    (scipy.integrate.quad_vec), instead of one quadrature per pair.
+
+    Parameters
+    ----------
+    time : float
+        Value of time (in seconds) for which the FLS solution is evaluated.
+    alpha : float
+        Soil thermal diffusivity (in m2/s).
+    dis : array
+        Distances between the boreholes (in meters).
+    H1, D1 : array
+        Lengths and buried depths of the boreholes extracting heat (in meters).
+    H2, D2 : array
+        Lengths and buried depths of the boreholes for which the FLS is
+        evaluated (in meters).
+    reaSource : boolean, defaults to True
+        True if the real part of the FLS solution is to be included.
+    imgSource : boolean, defaults to True
+        True if the image part of the FLS solution is to be included.
+
+    Returns
+    -------
+    h : array
+        Values of the FLS solution.
+
+    """
+    from scipy.integrate import quad_vec
+
+    def _erfint(x):
+        # Integral of error function
+        return x * erf(x) - 1.0/np.sqrt(np.pi) * (1.0-np.exp(-x**2))
+
+    def _Ils(s):
+        func = 0.
+        if reaSource:
+            # Real part of the FLS solution
+            func = func + _erfint((D2 - D1 + H2)*s) - _erfint((D2 - D1)*s) \
+                + _erfint((D2 - D1 - H1)*s) - _erfint((D2 - D1 + H2 - H1)*s)
+        if imgSource:
+            # Image part of the FLS solution
+            func = func + _erfint((D2 + D1 + H2)*s) - _erfint((D2 + D1)*s) \
+                + _erfint((D2 + D1 + H1)*s) - _erfint((D2 + D1 + H2 + H1)*s)
+        return 0.5 / (H2*s**2) * func * np.exp(-dis**2*s**2)
+
+    # Lower bound of integration
+    a = 1.0 / np.sqrt(4.0*alpha*time)
+    # (tolerances of finite_line_source, for each pair)
+    h, err = quad_vec(_Ils, a, np.inf, epsabs=1.49e-8, epsrel=1.49e-8, norm='max')
+    return h
+
+
+def finite_line_source_steady(dis, H1, D1, H2, D2):
+    """
+    Evaluate the steady-state (t -> infinity) Finite Line Source solution.
+
+    The double integral of the FLS solution over the lengths of both
+    boreholes has a closed form for t -> infinity, so that the solution is
+    evaluated vectorized for arrays of borehole pairs:
+
+        .. math::
+            h_{1\\rightarrow2} &= \\frac{1}{2H_2}
+            (I_{real} - I_{imag})
+
+            I_{real} &= F(D_2-D_1+H_2) - F(D_2-D_1)
+
+            &+ F(D_2-D_1-H_1) - F(D_2-D_1+H_2-H_1)
+
+            I_{imag} &= F(D_2+D_1+H_2+H_1) - F(D_2+D_1+H_1)
+
+            &+ F(D_2+D_1) - F(D_2+D_1+H_2)
+
+            F(z) &= z \\sinh^{-1}(z/d_{12}) - \\sqrt{z^2 + d_{12}^2}
+
+    Parameters
+    ----------
+    dis : float or array
+        Distances between the boreholes (in meters).
+    H1, D1 : float or array
+        Lengths and buried depths of the boreholes extracting heat (in meters).
+    H2, D2 : float or array
+        Lengths and buried depths of the boreholes for which the FLS is
+        evaluated (in meters).
+
+    Returns
+    -------
+    h : float or array
+        Value of the steady-state FLS solution (same normalization as
+        finite_line_source).
+
+    """
+    def F(z):
+        return z * np.arcsinh(z / dis) - np.sqrt(z**2 + dis**2)
+
+    I_real = F(D2 - D1 + H2) - F(D2 - D1) + F(D2 - D1 - H1) - F(D2 - D1 + H2 - H1)
+    I_imag = F(D2 + D1 + H2 + H1) - F(D2 + D1 + H1) + F(D2 + D1) - F(D2 + D1 + H2)
+    return 0.5 / H2 * (I_real - I_imag)
+
+
+class ResponseFactors(object):
+    """
+    Segment-to-segment thermal response factors, stored per similarity.
+
+    Instead of the dense (nSources, nSources, nt) array, only the distinct
+    curves (one per similarity class) are stored, with a class index and a
+    scale factor (ratio of the segment lengths) per pair of segments:
+
+        h_ij[i, j, :] = scale[i, j] * curves[index[i, j], :]
+
+    The memory thus scales with the number of similarity classes; dense
+    matrices are assembled for one time value at a time (see at).
+
+    Attributes
+    ----------
+    curves :    array
+                (nClasses, nt) response factors of the similarity classes
+    index :     array
+                (nSources, nSources) class index (int32) of the segment pairs
+    scale :     array
+                (nSources, nSources) scale factors of the segment pairs
+
+    """
+
+    def __init__(self, curves, index, scale):
+        self.curves = curves
+        self.index = index
+        self.scale = scale
+
+    @property
+    def shape(self):
+        return self.index.shape + self.curves.shape[1:]
+
+    def at(self, it, out=None):
+        """
+        Returns the (nSources, nSources) response factors at the time value it (index).
+        """
+        return np.multiply(self.scale, self.curves[:, it][self.index], out=out)
+
+    def toarray(self):
+        """
+        Returns the dense (nSources, nSources, nt) array of response factors.
+        """
+        return self.scale[:, :, np.newaxis] * self.curves[self.index]
+
+    def increments(self):
+        """
+        Returns the increments of the response factors between consecutive time values.
+        """
+        dcurves = np.concatenate((self.curves[:, 0:1], self.curves[:, 1:] - self.curves[:, :-1]), axis=1)
+        return ResponseFactors(dcurves, self.index, self.scale)
+
+    def interpolate(self, time, time_new, kind='linear'):
+        """
+        Interpolates the response factors from time to time_new (h = 0 at t = 0).
+        """
+        from scipy.interpolate import interp1d
+
+        curves = interp1d(np.hstack((0., time)),
+                          np.hstack((np.zeros((len(self.curves), 1)), self.curves)),
+                          kind=kind, axis=1)(time_new)
+        return ResponseFactors(curves, self.index, self.scale)
+
+    def weighted_sum(self, weights):
+        """
+        Returns sum_ij(weights[i] * h_ij) at all time values (array of length nt).
+
+        The weighted response factors of each similarity class are summed
+        first, so that no dense matrix is assembled.
+        """
+        classWeights = np.bincount(self.index.ravel(),
+                                   weights=(np.asarray(weights)[:, np.newaxis] * self.scale).ravel(),
+                                   minlength=len(self.curves))
+        return classWeights.dot(self.curves)
+
+    def to_memmap(self, filename, block_size=None):
+        """
+        Writes the dense response factors to a memory-mapped file.
+
+        The file is filled in blocks of time values, so that only one block
+        of (nSources, nSources) matrices is held in memory.
+
+        Parameters
+        ----------
+        filename : str
+            Path to the (scratch) file.
+        block_size : int, optional
+            Number of time values per block. Default is None (blocks of
+            about MEMMAP_BLOCK_BYTES).
+
+        Returns
+        -------
+        h_ij : MappedResponseFactors
+            Memory-mapped response factors.
+
+        """
+        (nSources, _, nt) = self.shape
+        if block_size is None:
+            block_size = max(1, MEMMAP_BLOCK_BYTES // (8 * nSources**2))
+        array = np.memmap(filename, dtype=np.float64, mode='w+', shape=(nt, nSources, nSources))
+        for it in range(0, nt, block_size):
+            curves = self.curves[:, it:it + block_size]
+            array[it:it + block_size] = self.scale * np.moveaxis(curves[self.index], -1, 0)
+        array.flush()
+        return MappedResponseFactors(array)
+
+
+class MappedResponseFactors(object):
+    """
+    Dense segment-to-segment thermal response factors in a memory-mapped file.
+
+    The matrices are stored time-major ((nt, nSources, nSources)), so that
+    the (nSources, nSources) matrix of one time value is read contiguously.
+
+    Attributes
+    ----------
+    array :     memmap
+                (nt, nSources, nSources) response factors
+
+    """
+
+    def __init__(self, array):
+        self.array = array
+
+    @property
+    def shape(self):
+        return self.array.shape[1:] + self.array.shape[:1]
+
+    def at(self, it, out=None):
+        """
+        Returns the (nSources, nSources) response factors at the time value it (index).
+        """
+        if out is None:
+            return self.array[it]
+        out[...] = self.array[it]
+        return out
+
+    def toarray(self):
+        """
+        Returns the dense (nSources, nSources, nt) array of response factors.
+        """
+        return np.moveaxis(np.asarray(self.array), 0, -1)
+
+    def close(self):
+        """
+        Releases the memory-mapped file (the file itself is not removed).
+        """
+        self.array = None
+
+
 def thermal_response_factors(
         boreSegments, time, alpha, self, use_similarities=True,
         splitRealAndImage=True, disTol=0.01, tol=1.0e-6, processes=None,
-        disp=True):
+        disp=True, compressed=False):
     """
     Evaluate segment-to-segment thermal response factors.
 
@@ -137,8 +395,8 @@ def thermal_response_factors(
 
     Parameters
     ----------
-    boreSegments : list of Borehole objects
-        List of borehole segments.
+    boreSegments : Borefield or list of Borehole objects
+        Borehole segments.
     time : float or array
         Values of time (in seconds) for which the g-function is evaluated.
     alpha : float
@@ -167,10 +425,14 @@ def thermal_response_factors(
     disp : bool, optional
         Set to true to print progression messages.
         Default is False.
+    compressed : bool, optional
+        Set to True to return the response factors as ResponseFactors
+        (curves of the similarity classes) instead of a dense array.
+        Default is False.
 
     Returns
     -------
-    h_ij : array
+    h_ij : array or ResponseFactors
         Segment-to-segment thermal response factors.
 
     """
@@ -183,8 +445,9 @@ def thermal_response_factors(
     # Initialize chrono
     tic = tim.time()
 
-    # Initialize segment-to-segment response factors
-    h_ij = np.zeros((nSources, nSources, nt))
+    # Class indices and scale factors of the segment-to-segment response factors
+    index = np.zeros((nSources, nSources), dtype=np.int64)
+    scale = np.ones((nSources, nSources))
     # Calculation is based on the choice of use_similarities
     if use_similarities:
         # Calculations with similarities
@@ -207,6 +470,7 @@ def thermal_response_factors(
             self.ui.text_console.insertPlainText('Calculating segment to segment response factors ...\n')
 
         # Similarities for real sources
+        hPos = np.zeros((nSimPos, nt))
         for s in range(nSimPos):
             n1 = simPos[s][0][0]
             n2 = simPos[s][0][1]
@@ -223,14 +487,18 @@ def thermal_response_factors(
                                alpha=alpha, borehole1=b1, borehole2=b2,
                                reaSource=True, imgSource=True)
             # Evaluate the FLS solution at all times in parallel
-            hPos = np.array(pool.map(func, np.atleast_1d(time)))
-            # Assign thermal response factors to similar segment pairs
-            for (i, j) in simPos[s]:
-                h_ij[j, i, :] = hPos
-                h_ij[i, j, :] = b2.H/b1.H * hPos
+            hPos[s] = np.array(pool.map(func, np.atleast_1d(time)))
+            # Assign thermal response factors to similar segment pairs:
+            # h_ij[j, i] = hPos, h_ij[i, j] = b2.H/b1.H * hPos
+            (i, j) = np.array(simPos[s]).T
+            index[j, i] = s
+            index[i, j] = s
+            scale[i, j] = b2.H/b1.H
 
         # Similarities for image sources (only if splitRealAndImage=True)
         if splitRealAndImage:
+            indexNeg = np.zeros((nSources, nSources), dtype=np.int64)
+            hNeg = np.zeros((nSimNeg, nt))
             for s in range(nSimNeg):
                 n1 = simNeg[s][0][0]
                 n2 = simNeg[s][0][1]
@@ -241,17 +509,26 @@ def thermal_response_factors(
                                alpha=alpha, borehole1=b1, borehole2=b2,
                                reaSource=False, imgSource=True)
                 # Evaluate the FLS solution at all times in parallel
-                hNeg = np.array(pool.map(func, time))
-                # Assign thermal response factors to similar segment pairs
-                for (i, j) in simNeg[s]:
-                    h_ij[j, i, :] = h_ij[j, i, :] + hNeg
-                    h_ij[i, j, :] = b2.H/b1.H * h_ij[j, i, :]
+                hNeg[s] = np.array(pool.map(func, time))
+                # Assign thermal response factors to similar segment pairs:
+                # h_ij[j, i] = hPos + hNeg, h_ij[i, j] = b2.H/b1.H * h_ij[j, i]
+                (i, j) = np.array(simNeg[s]).T
+                indexNeg[j, i] = s
+                indexNeg[i, j] = s
+                scale[i, j] = b2.H/b1.H
+            # Classes of the combined real and image sources
+            (classes, index) = np.unique(index * nSimNeg + indexNeg, return_inverse=True)
+            curves = hPos[classes // nSimNeg] + hNeg[classes % nSimNeg]
+        else:
+            curves = hPos
 
     else:
         # Calculations without similarities
         if disp:
             print('Calculating segment to segment response factors ...')
             self.ui.text_console.insertPlainText('Calculating segment to segment response factors ...\n')
+        curves = np.zeros((nSources * (nSources + 1) // 2, nt))
+        s = 0
         for i in range(nSources):
             # Segment to same-segment thermal response factor
             # FLS solution for combined real and image sources
@@ -259,8 +536,9 @@ def thermal_response_factors(
             func = partial(finite_line_source,
                            alpha=alpha, borehole1=b2, borehole2=b2)
             # Evaluate the FLS solution at all times in parallel
-            h = np.array(pool.map(func, time))
-            h_ij[i, i, :] = h
+            curves[s] = np.array(pool.map(func, time))
+            index[i, i] = s
+            s += 1
 
             # Segment to other segments thermal response factor
             for j in range(i+1, nSources):
@@ -268,9 +546,14 @@ def thermal_response_factors(
                 # Evaluate the FLS solution at all times in parallel
                 func = partial(finite_line_source,
                                alpha=alpha, borehole1=b1, borehole2=b2)
-                h = np.array(pool.map(func, time))
-                h_ij[i, j, :] = h
-                h_ij[j, i, :] = b2.H / b1.H * h_ij[i, j, :]
+                curves[s] = np.array(pool.map(func, time))
+                # h_ij[i, j] = h, h_ij[j, i] = b2.H / b1.H * h
+                index[i, j] = s
+                index[j, i] = s
+                scale[j, i] = b2.H / b1.H
+                s += 1
+
+    h_ij = ResponseFactors(curves, index.reshape(nSources, nSources).astype(np.int32), scale)
 
     toc2 = tim.time()
     if disp:
@@ -281,13 +564,269 @@ def thermal_response_factors(
     pool.close()
     pool.join()
 
-    # Return 2d array if time is a scalar
-    if np.isscalar(time):
-        h_ij = h_ij[:,:,0]
+    if not compressed:
+        h_ij = h_ij.toarray()
+        # Return 2d array if time is a scalar
+        if np.isscalar(time):
+            h_ij = h_ij[:,:,0]
 
     return h_ij
 
 
+def update_response_factors(h_ij, boreSegments, newSegments, time, alpha, self, processes=None, disp=True):
+    """
+    Update segment-to-segment thermal response factors for a modified bore field.
+
+    The segments of newSegments, which are identical to a segment of
+    boreSegments, keep their response factors from h_ij; only the pairs of
+    segments involving at least one new (added or moved) segment are
+    evaluated. Segments of removed boreholes are dropped. The FLS solution
+    is evaluated once for identical configurations (distance, lengths and
+    buried depths), vectorized over all configurations (see
+    finite_line_source_vectorized).
+
+    The result equals a new evaluation with use_similarities=False; the
+    response factors kept from h_ij are those of its evaluation (e.g. with
+    similarities).
+
+    Parameters
+    ----------
+    h_ij : ResponseFactors
+        Response factors of boreSegments (see thermal_response_factors with
+        compressed=True), evaluated at the same time values.
+    boreSegments : Borefield
+        Borehole segments of h_ij.
+    newSegments : Borefield
+        Borehole segments of the modified bore field.
+    time : float or array
+        Values of time (in seconds) of h_ij.
+    alpha : float
+        Soil thermal diffusivity (in m2/s).
+    processes : int, optional
+        Number of processors to use in calculations. If the value is set to
+        None, a number of processors equal to cpu_count() is used.
+        Default is None.
+    disp : bool, optional
+        Set to true to print progression messages.
+        Default is True.
+
+    Returns
+    -------
+    h_ij : ResponseFactors
+        Response factors of newSegments.
+
+    """
+    from .boreholes import Borefield
+
+    newSegments = Borefield.from_boreholes(newSegments)
+    nSources = len(newSegments)
+    nt = len(np.atleast_1d(time))
+    tic = tim.time()
+
+    # 1.) Segments kept from the previous bore field (index into boreSegments, -1 if new)
+    fields = np.column_stack([getattr(boreSegments, name) for name in Borefield._fields])
+    previous = {tuple(row): i for (i, row) in enumerate(fields)}
+    kept = np.array([previous.get(tuple(row), -1) for row in
+                     np.column_stack([getattr(newSegments, name) for name in Borefield._fields])], dtype=int)
+    new = np.flatnonzero(kept < 0)
+    old = np.flatnonzero(kept >= 0)
+    if disp:
+        message = 'Updating response factors of {} of {} segments ...'.format(len(new), nSources)
+        print(message)
+        self.ui.text_console.insertPlainText(message + '\n')
+
+    # Response factors of the kept segments (unused curves are dropped)
+    index = np.zeros((nSources, nSources), dtype=np.int64)
+    scale = np.ones((nSources, nSources))
+    (used, keptIndex) = np.unique(h_ij.index[np.ix_(kept[old], kept[old])], return_inverse=True)
+    index[np.ix_(old, old)] = keptIndex.reshape(len(old), len(old))
+    scale[np.ix_(old, old)] = h_ij.scale[np.ix_(kept[old], kept[old])]
+    curves = [h_ij.curves[used]]
+
+    if len(new) > 0:
+        # 2.) Pairs of segments involving a new segment: receiver i = new segment,
+        #     source j = any segment (h_ij[i, j]), and h_ij[j, i] = H_i/H_j * h_ij[i, j]
+        i = np.repeat(new, nSources)
+        j = np.tile(np.arange(nSources), len(new))
+        # each pair of two new segments only once
+        pairs = (kept[j] >= 0) | (j >= i)
+        (i, j) = (i[pairs], j[pairs])
+        dis = np.maximum(newSegments.r_b[j], np.hypot(newSegments.x[i] - newSegments.x[j],
+                                                      newSegments.y[i] - newSegments.y[j]))
+        configurations = np.column_stack((dis, newSegments.H[j], newSegments.D[j],
+                                          newSegments.H[i], newSegments.D[i]))
+        (configurations, inverse) = np.unique(np.round(configurations, 9), axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+
+        # 3.) FLS solutions of the distinct configurations (vectorized over all
+        #     configurations, times in parallel)
+        pool = Pool(processes=processes)
+        newCurves = np.zeros((len(configurations), nt))
+        for (reaSource, imgSource) in ((True, False), (False, True)):
+            func = partial(finite_line_source_vectorized, alpha=alpha,
+                           dis=configurations[:, 0], H1=configurations[:, 1], D1=configurations[:, 2],
+                           H2=configurations[:, 3], D2=configurations[:, 4],
+                           reaSource=reaSource, imgSource=imgSource)
+            newCurves += np.array(pool.map(func, np.atleast_1d(time))).T
+        pool.close()
+        pool.join()
+
+        index[i, j] = len(used) + inverse
+        index[j, i] = len(used) + inverse
+        scale[i, j] = 1.
+        scale[j, i] = newSegments.H[i] / newSegments.H[j]
+        curves.append(newCurves)
+
+    toc = tim.time()
+    if disp:
+        print('{} sec'.format(toc - tic))
+        self.ui.text_console.insertPlainText('{} sec\n'.format(toc - tic))
+
+    return ResponseFactors(np.concatenate(curves), index.astype(np.int32), scale)
+
+
+def equivalent_response_factors(
+        boreholes, labels, representatives, nSegments, time, alpha, self,
+        disTol=0.01, processes=None, disp=True, segment_ratios=None):
+    """
+    Evaluate segment-to-segment thermal response factors of equivalent boreholes.
+
+    The boreholes of a cluster (see 'gfunction.equivalent_boreholes') are
+    assumed to have equal segment heat extraction rates. The response factor
+    between segment a of cluster m and segment b of cluster n is the sum of
+    the response factors at segment a of the representative of cluster m
+    due to segment b of all boreholes of cluster n:
+
+        h[(m, a), (n, b)] = sum_{j in n} h(segment b of j -> segment a of rep. m)
+
+    The distances from the representatives to the boreholes of a cluster are
+    grouped (relative tolerance disTol) and each group is evaluated once,
+    weighted with the number of boreholes. The FLS solution is evaluated
+    once for equal real (D2-D1) or image (D2+D1) source configurations,
+    vectorized over all configurations (see finite_line_source_vectorized).
+
+    Parameters
+    ----------
+    boreholes : Borefield or list of Borehole objects
+        Boreholes in the bore field.
+    labels : array
+        Cluster index of each borehole.
+    representatives : array
+        Index of the representative borehole of each cluster.
+    nSegments : int
+        Number of line segments per borehole.
+    time : float or array
+        Values of time (in seconds) for which the g-function is evaluated.
+    alpha : float
+        Soil thermal diffusivity (in m2/s).
+    disTol : float, optional
+        Relative tolerance on radial distance.
+        Default is 0.01.
+    processes : int, optional
+        Number of processors to use in calculations. If the value is set to
+        None, a number of processors equal to cpu_count() is used.
+        Default is None.
+    disp : bool, optional
+        Set to true to print progression messages.
+        Default is False.
+    segment_ratios : array, optional
+        Relative segment lengths (see 'boreholes.Borefield.segments').
+        Default is None (segments of equal length).
+
+    Returns
+    -------
+    h_ij : ResponseFactors
+        Response factors of the (nClusters * nSegments) segments of the
+        equivalent boreholes.
+
+    """
+    from .boreholes import Borefield
+
+    boreholes = Borefield.from_boreholes(boreholes)
+    nClusters = len(representatives)
+    nt = len(np.atleast_1d(time))
+    # Prepare pool of workers for parallel computation
+    pool = Pool(processes=processes)
+    # Initialize chrono
+    tic = tim.time()
+    if disp:
+        print('Calculating equivalent borehole response factors ...')
+        self.ui.text_console.insertPlainText('Calculating equivalent borehole response factors ...\n')
+
+    # Segment lengths and buried depths of the clusters (equal for all boreholes of a cluster)
+    segments = boreholes[np.asarray(representatives)].segments(nSegments, segment_ratios)
+    H = segments.H.reshape(nClusters, nSegments)
+    D = segments.D.reshape(nClusters, nSegments)
+
+    # 1.) Groups of distances from the representatives to the boreholes of all clusters
+    distances = _DistanceGroups()
+    terms = []      # (m, n, distance group, number of boreholes)
+    for (m, i) in enumerate(representatives):
+        dis = boreholes.distances(i)
+        for n in range(nClusters):
+            values, counts = np.unique(dis[labels == n], return_counts=True)
+            groups = [distances.index(d, 1.0e-6 * boreholes.r_b[i] if d <= boreholes.r_b[i] else disTol * d)
+                      for d in values]
+            for (k, count) in zip(groups, counts):
+                terms.append((m, n, k, count))
+
+    # 2.) Distinct FLS configurations (real and image sources) of all terms
+    keys = {}       # configuration -> index of the FLS curve
+    configurations = []
+    indices = {}    # (m, n, distance group) -> (real, image) indices of the segment pairs
+    for (m, n, k, count) in terms:
+        if (m, n, k) in indices:
+            continue
+        # receiver: segments a of cluster m (rows), source: segments b of cluster n (columns)
+        H1, D1 = H[n][np.newaxis, :], D[n][np.newaxis, :]
+        H2, D2 = H[m][:, np.newaxis], D[m][:, np.newaxis]
+        pair_indices = []
+        for (kind, offsets) in (('real', D2 - D1), ('image', D2 + D1)):
+            index = np.empty((nSegments, nSegments), dtype=int)
+            for a in range(nSegments):
+                for b in range(nSegments):
+                    key = (kind, k, H1[0, b], H2[a, 0], round(offsets[a, b], 9))
+                    if key not in keys:
+                        keys[key] = len(configurations)
+                        configurations.append((kind, distances.distances[k],
+                                               H1[0, b], D1[0, b], H2[a, 0], D2[a, 0]))
+                    index[a, b] = keys[key]
+            pair_indices.append(index)
+        indices[(m, n, k)] = pair_indices
+
+    # 3.) FLS solutions of the distinct configurations (vectorized over all
+    #     configurations, times in parallel)
+    (kind, dis, H1, D1, H2, D2) = [np.array(values) for values in zip(*configurations)]
+    curves = np.zeros((len(configurations), nt))
+    for (sources, is_real) in (('real', True), ('image', False)):
+        c = np.flatnonzero(kind == sources)
+        func = partial(finite_line_source_vectorized, alpha=alpha,
+                       dis=dis[c], H1=H1[c], D1=D1[c], H2=H2[c], D2=D2[c],
+                       reaSource=is_real, imgSource=not is_real)
+        curves[c] = np.array(pool.map(func, np.atleast_1d(time))).T
+
+    # 4.) Assembly of the response factors of the equivalent boreholes
+    nEq = nClusters * nSegments
+    h_ij = np.zeros((nEq, nEq, nt))
+    for (m, n, k, count) in terms:
+        (real, image) = indices[(m, n, k)]
+        h_ij[m*nSegments:(m+1)*nSegments, n*nSegments:(n+1)*nSegments, :] += \
+            count * (curves[real] + curves[image])
+
+    toc = tim.time()
+    if disp:
+        print('{} sec'.format(toc - tic))
+        self.ui.text_console.insertPlainText('{} sec\n'.format(toc - tic))
+
+    # Close pool of workers
+    pool.close()
+    pool.join()
+
+    return ResponseFactors(h_ij.reshape(nEq * nEq, nt),
+                           np.arange(nEq * nEq, dtype=np.int32).reshape(nEq, nEq),
+                           np.ones((nEq, nEq)))
+
+
 def similarities(boreholes, splitRealAndImage=True, disTol=0.01, tol=1.0e-6,
                  processes=None):
     """
@@ -441,14 +980,43 @@ def similarities(boreholes, splitRealAndImage=True, disTol=0.01, tol=1.0e-6,
             nSimNeg, simNeg, disSimNeg, HSimNeg, DSimNeg
 
 
+class _DistanceGroups(object):
+    # Distances grouped with a relative tolerance: a distance is assigned to
+    # the first previously added distance within the tolerance (or added as
+    # new distance). The distances are kept sorted by value (with their index)
+    # for the search of matching distances.
+
+    def __init__(self, distances=()):
+        self.distances = []
+        self._sorted = []
+        self._index = []
+        for dis in distances:
+            self.index(dis, 0.)
+
+    def index(self, dis, rTol):
+        from bisect import bisect_left, bisect_right
+
+        n0 = bisect_left(self._sorted, dis - 2*rTol)
+        n1 = bisect_right(self._sorted, dis + 2*rTol)
+        matches = [k for k in self._index[n0:n1] if abs(self.distances[k] - dis) < rTol]
+        if matches:
+            return min(matches)
+        # Add distance to list if no match was found
+        n = bisect_right(self._sorted, dis)
+        self._sorted.insert(n, dis)
+        self._index.insert(n, len(self.distances))
+        self.distances.append(dis)
+        return len(self.distances) - 1
+
+
 def _similarities_group_by_distance(boreholes, disTol=0.01):
     """
     Groups pairs of boreholes by radial distance between borehole.
 
     Parameters
     ----------
-    boreholes : list of Borehole objects
-        List of boreholes in the bore field.
+    boreholes : Borefield or list of Borehole objects
+        Boreholes in the bore field.
     disTol : float, defaults to 0.01
         Relative tolerance on radial distance. Two distances
         (d1, d2) between two pairs of boreholes are considered equal if the
@@ -478,43 +1046,54 @@ def _similarities_group_by_distance(boreholes, disTol=0.01):
     --------
 
     """
-    # Initialize lists
-    nPairs = [1]
-    pairs = [[(0, 0)]]
-    disPairs = [boreholes[0].r_b]
-    nDis = 1
+    from .boreholes import Borefield
 
+    boreholes = Borefield.from_boreholes(boreholes)
     nb = len(boreholes)
-    for i in range(nb):
-        b1 = boreholes[i]
-        if i == 0:
-            i2 = i + 1
-        else:
-            i2 = i
-        for j in range(i2, nb):
-            b2 = boreholes[j]
-            # Distance between current pair of boreholes
-            dis = b1.distance(b2)
-            if i == j:
-                # The relative tolerance is used for same-borehole
-                # distances
-                rTol = 1.0e-6 * b1.r_b
-            else:
-                rTol = disTol*dis
-            # Verify if the current pair should be included in the
-            # previously identified symmetries
-            for k in range(nDis):
-                if abs(disPairs[k] - dis) < rTol:
-                    pairs[k].append((i, j))
-                    nPairs[k] += 1
-                    break
 
-            else:
-                # Add symmetry to list if no match was found
-                nDis += 1
-                disPairs.append(dis)
-                pairs.append([(i, j)])
-                nPairs.append(1)
+    # Initialize lists
+    distances = _DistanceGroups([boreholes.r_b[0]])
+    disPairs = distances.distances
+
+    # Group the pairs (i, j >= i) row by row (in the order of a loop over
+    # all pairs), each unique distance of a row is compared only once
+    groups = {}     # (distance, same borehole) -> index in disPairs
+    labels = [np.zeros(1, dtype=int)]
+    rows = [np.zeros(1, dtype=int)]
+    cols = [np.zeros(1, dtype=int)]
+    for i in range(nb):
+        i2 = i + 1 if i == 0 else i
+        dis = boreholes.distances(i)[i2:]
+        label = np.empty(len(dis), dtype=int)
+        if i2 == i:
+            # The relative tolerance is used for same-borehole distances
+            key = (dis[0], True)
+            if key not in groups:
+                groups[key] = distances.index(dis[0], 1.0e-6 * boreholes.r_b[i])
+            label[0] = groups[key]
+        n_0 = 1 if i2 == i else 0
+        values, first, inverse = np.unique(dis[n_0:], return_index=True, return_inverse=True)
+        value_labels = np.empty(len(values), dtype=int)
+        for n in np.argsort(first, kind='stable'):
+            key = (values[n], False)
+            if key not in groups:
+                groups[key] = distances.index(values[n], disTol * values[n])
+            value_labels[n] = groups[key]
+        label[n_0:] = value_labels[inverse]
+        labels.append(label)
+        rows.append(np.full(len(dis), i))
+        cols.append(np.arange(i2, nb))
+
+    # Pairs of each distance (in the order of the loop over all pairs)
+    labels = np.concatenate(labels)
+    order = np.argsort(labels, kind='stable')
+    nDis = len(disPairs)
+    nPairs = np.bincount(labels, minlength=nDis).tolist()
+    rows = np.concatenate(rows)[order].tolist()
+    cols = np.concatenate(cols)[order].tolist()
+    bounds = np.cumsum([0] + nPairs).tolist()
+    pairs = [list(zip(rows[bounds[k]:bounds[k + 1]], cols[bounds[k]:bounds[k + 1]]))
+             for k in range(nDis)]
     return nDis, disPairs, nPairs, pairs
 
 
@@ -81,6 +81,7 @@ class Heatpipes(object):
             Figure object (matplotlib).
         """
         import matplotlib.pyplot as plt
+        from matplotlib.collections import PatchCollection
         from matplotlib.ticker import AutoMinorLocator
 
         # Initialization
@@ -96,26 +97,16 @@ class Heatpipes(object):
                               fill=False, linestyle='--', linewidth=LW)
         ax.add_patch(borewall)
 
-        # Heatpipes
-        for i in range(self.N):
-            # Coordinates
-            xy = self.xy_mat()
-            (x, y) = (xy[i, 0], xy[i, 1])
-
-            # Plot heatpipes + insulation layer
-            hp_iso = plt.Circle((x, y), radius=self.r_iso_b,
-                                fill=False, linestyle='-', linewidth=LW)
-            hp_itself_outer = plt.Circle((x, y), radius=self.r_pa,
-                                fill=False, linestyle='-', linewidth=LW)
-            hp_itself_inner = plt.Circle((x, y), radius=self.r_pi,
-                                fill=False, linestyle='-', linewidth=LW)
+        # Heatpipes + insulation layer (one collection for all heatpipes)
+        xy = self.xy_mat()
+        circles = [plt.Circle((x, y), radius=r)
+                   for (x, y) in xy for r in (self.r_iso_b, self.r_pa, self.r_pi)]
+        ax.add_collection(PatchCollection(circles, facecolor='none', edgecolor='k',
+                                          linestyle='-', linewidth=LW))
+        for i, (x, y) in enumerate(xy):
             ax.text(x, y, i + 1,
                     ha="center", va="center", size=FS)
 
-            ax.add_patch(hp_iso)
-            ax.add_patch(hp_itself_outer)
-            ax.add_patch(hp_itself_inner)
-
         # Achsen
         ax.set_xlabel('x (m)')
         ax.set_ylabel('y (m)')
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+""" GERDPySim - 'kpis.py'
+
+    Energy performance indicators, updated time step by time step during the
+    iteration loop (constant effort and memory per time step)
+
+    Legend:
+        - E     - total extracted thermal energy [MWh]
+        - E_N   - net used energy (latent & sensible energy for melting of snow and ice) [MWh]
+        - E_lat - latent part of E_N (melting of snow and ice) [MWh]
+        - E_sen - sensible part of E_N (heating of snow and ice to the melting point) [MWh]
+        - E_V   - thermal losses via connection & heating element underside [MWh]
+        - E_S   - surface losses (convection, radiation and evaporation): E - E_N - E_V [MWh]
+        - f_N   - net energy usage factor: E_N / E [%]
+
+    Authors: Yannick Apfel, Meike Martin
+"""
+import numpy as np
+
+
+class RunningKPIs(object):
+    """
+    Energy performance indicators of a simulation run, updated per time step.
+
+    Attributes
+    ----------
+    dt :        float
+                time step [s]
+    window :    int
+                width of the moving average of the extraction power [time steps]
+    n :         int
+                number of time steps evaluated
+    E, E_N, E_lat, E_sen, E_V : float
+                energies (see module legend) [MWh]
+    Q_max :     float
+                peak extraction power [W]
+    Q_ma_max :  float
+                peak of the moving average of the extraction power [W]
+    h_snow_free : float
+                hours with snow-free heating element surface [h]
+    Theta_b_min : dict
+                minimum borehole wall temperature per heating season [°C]
+                (key: year in which the heating season starts on the 1st of September)
+
+    """
+
+    def __init__(self, dt, window=24):
+        self.dt = dt
+        self.window = window
+        self.n = 0
+        self.E = 0.
+        self.E_N = 0.
+        self.E_lat = 0.
+        self.E_sen = 0.
+        self.E_V = 0.
+        self.Q_max = 0.
+        self.Q_ma = 0.
+        self.Q_ma_max = 0.
+        self.h_snow_free = 0.
+        self.Theta_b_min = {}
+
+        # ring buffer and running sum of the moving average
+        self._Q_window = np.zeros(window)
+        self._Q_sum = 0.
+
+    def update(self, Q, Q_N, Q_V, Theta_b, m_s, date, Q_lat=0., Q_sen=0.):
+        """
+        Adds a (completed) time step.
+
+        Parameters
+        ----------
+        Q : float
+            Total extracted thermal power (including losses) [W].
+        Q_N : float
+            Net used power [W].
+        Q_V : float
+            Thermal power losses via connection & heating element underside [W].
+        Theta_b : float
+            Borehole wall temperature [°C].
+        m_s : float
+            Residual snow on the heating element surface [kg].
+        date : datetime64
+            Date of the time step.
+        Q_lat : float, optional
+            Latent part of the net used power [W]. Default is 0.
+        Q_sen : float, optional
+            Sensible part of the net used power [W]. Default is 0.
+
+        """
+        to_MWh = self.dt / 3600 * 1e-6
+        self.E += Q * to_MWh
+        self.E_N += Q_N * to_MWh
+        self.E_lat += Q_lat * to_MWh
+        self.E_sen += Q_sen * to_MWh
+        self.E_V += Q_V * to_MWh
+        self.Q_max = max(self.Q_max, Q)
+
+        # trailing moving average (mean over the last window time steps)
+        j = self.n % self.window
+        self._Q_sum += Q - self._Q_window[j]
+        self._Q_window[j] = Q
+        self.n += 1
+        self.Q_ma = self._Q_sum / min(self.n, self.window)
+        if self.n >= self.window:
+            self.Q_ma_max = max(self.Q_ma_max, self.Q_ma)
+
+        if m_s == 0:
+            self.h_snow_free += self.dt / 3600
+
+        # heating season: 1st of September - 31st of August
+        season = heating_season(date)
+        self.Theta_b_min[season] = min(self.Theta_b_min.get(season, np.inf), Theta_b)
+
+    @property
+    def E_S(self):
+        return self.E - self.E_N - self.E_V
+
+    @property
+    def f_N(self):
+        return self.E_N / self.E * 100 if self.E > 0 else 0.
+
+    def summary(self):
+        """
+        Returns the performance indicators as dict.
+        """
+        return {'E': self.E, 'E_N': self.E_N, 'E_lat': self.E_lat, 'E_sen': self.E_sen, 'E_V': self.E_V,
+                'E_S': self.E_S, 'f_N': self.f_N,
+                'Q_max': self.Q_max, 'Q_ma_max': self.Q_ma_max, 'h_snow_free': self.h_snow_free,
+                'Theta_b_min': dict(self.Theta_b_min)}
+
+
+def heating_season(date):
+    """
+    Heating season of a date (year in which the heating season starts on the 1st of September).
+    """
+    date = np.datetime64(date, 'M')
+    year = date.astype('M8[Y]').astype(int) + 1970
+    month = (date - date.astype('M8[Y]')).astype(int) + 1
+    return int(year if month >= 9 else year - 1)
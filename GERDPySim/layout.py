@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+""" GERDPySim - 'layout.py'
+
+    Automatic borefield layout optimization
+
+    For a plot boundary (polygon) and a number of boreholes, the boreholes are
+    placed on a grid of candidate positions inside the plot, so that the
+    g-function at the end of the design horizon (i.e. the drawdown of the
+    borehole wall temperature) is minimal.
+
+    The objective of a layout is the g-function with uniform borehole wall
+    temperature at the end of the horizon for a constant load (one time step
+    of 'gfunction.uniform_temperature', one segment per borehole). The FLS
+    solution between two boreholes only depends on their distance: it is
+    evaluated once on a table of distances (PairResponse) and interpolated,
+    so that batches of candidate layouts are evaluated by one vectorized
+    solve. The batches are distributed over a pool of worker processes.
+
+    Usage:
+        python -m GERDPySim.layout --boundary X1 Y1 X2 Y2 X3 Y3 ... --n N --output FILE
+                                   [--H H] [--D D] [--r_b R_B] [--spacing S] [--years N]
+
+    Authors: Yannick Apfel, Meike Martin
+"""
+import argparse
+import time as tim
+from functools import partial
+from multiprocessing import Pool, cpu_count
+
+import numpy as np
+
+from .boreholes import Borefield
+
+
+class PairResponse(object):
+    """
+    FLS solution between two boreholes of equal dimensions as function of
+    their distance (at one time value), interpolated from a table.
+
+    Attributes
+    ----------
+    distances : array
+                log-spaced distances of the table (from r_b) [m]
+    h :         array
+                FLS solution (real and image sources) at the distances
+
+    """
+
+    def __init__(self, H, D, r_b, alpha, time, dis_max, nDistances=400):
+        from .heat_transfer import finite_line_source_vectorized
+
+        self.distances = np.geomspace(r_b, max(dis_max, 2. * r_b), num=nDistances)
+        ones = np.ones(nDistances)
+        self.h = finite_line_source_vectorized(time, alpha, self.distances, H * ones, D * ones, H * ones, D * ones)
+
+    def __call__(self, dis):
+        return np.interp(np.log(dis), np.log(self.distances), self.h)
+
+
+def layout_gfunction(xy, response, r_b):
+    """
+    g-function of layouts at the time value of the pair response.
+
+    Parameters
+    ----------
+    xy : array
+        (nLayouts, nBoreholes, 2) positions of the boreholes of the layouts.
+    response : PairResponse
+        FLS solution as function of the distance.
+    r_b : float
+        Borehole radius [m].
+
+    Returns
+    -------
+    gFunction : array
+        Values of the g-function of the layouts (uniform borehole wall
+        temperature, equal borehole lengths).
+
+    """
+    xy = np.asarray(xy, dtype=float)
+    nBoreholes = xy.shape[1]
+    dis = np.sqrt(np.sum((xy[:, :, np.newaxis, :] - xy[:, np.newaxis, :, :])**2, axis=-1))
+    h = response(np.maximum(dis, r_b))
+    # [h]*[Qb] = Tb, sum([Qb]) = nBoreholes  =>  Tb = nBoreholes / sum([h]^-1 * [1])
+    q = np.linalg.solve(h, np.ones(xy.shape[:2] + (1,)))[:, :, 0]
+    return nBoreholes / np.sum(q, axis=1)
+
+
+def optimize_layout(boundary, nBoreholes, H, D, r_b, alpha, time, self, spacing=5., resolution=None,
+                    batch_size=64, patience=20, max_batches=2000, processes=None, seed=0, disp=True):
+    """
+    Place boreholes inside a plot, so that the g-function at the end of the
+    design horizon is minimal.
+
+    The boreholes are first spread over the candidate positions (farthest
+    point sampling), then moved one at a time: each batch contains
+    batch_size layouts with one borehole moved to another candidate position
+    (nearby or anywhere in the plot); the best layout of the batch is kept
+    if it improves the g-function. The optimization stops after patience
+    batches without improvement.
+
+    Parameters
+    ----------
+    boundary : array
+        (nVertices, 2) vertices of the plot boundary (polygon) [m].
+    nBoreholes : int
+        Number of boreholes.
+    H : float
+        Borehole length [m].
+    D : float
+        Borehole buried depth [m].
+    r_b : float
+        Borehole radius [m].
+    alpha : float
+        Soil thermal diffusivity (in m2/s).
+    time : float
+        End of the design horizon (in seconds).
+    spacing : float, optional
+        Minimum distance between two boreholes [m].
+        Default is 5.
+    resolution : float, optional
+        Distance of the candidate positions (grid) [m].
+        Default is None (spacing / 5).
+    batch_size : int, optional
+        Number of layouts per batch.
+        Default is 64.
+    patience : int, optional
+        Number of batches without improvement, after which the optimization stops.
+        Default is 20.
+    max_batches : int, optional
+        Maximum number of batches.
+        Default is 2000.
+    processes : int, optional
+        Number of processors to use in calculations. If the value is set to
+        None, a number of processors equal to cpu_count() is used.
+        Default is None.
+    seed : int, optional
+        Seed of the random moves.
+        Default is 0.
+    disp : bool, optional
+        Set to true to print progression messages.
+        Default is True.
+
+    Returns
+    -------
+    borefield : Borefield
+        Optimized bore field (see 'boreholes.field_to_file').
+    history : array
+        g-function of the kept layout after each batch.
+
+    """
+    from matplotlib.path import Path
+
+    tic = tim.time()
+    rng = np.random.default_rng(seed)
+    boundary = np.asarray(boundary, dtype=float)
+    resolution = resolution or spacing / 5.
+
+    # 1.) Candidate positions (grid inside the plot)
+    (x_min, y_min), (x_max, y_max) = boundary.min(axis=0), boundary.max(axis=0)
+    x, y = np.meshgrid(np.arange(x_min, x_max + 0.5 * resolution, resolution),
+                       np.arange(y_min, y_max + 0.5 * resolution, resolution))
+    candidates = np.column_stack((x.ravel(), y.ravel()))
+    candidates = candidates[Path(boundary).contains_points(candidates, radius=1.0e-9 * resolution)]
+    if len(candidates) < nBoreholes:
+        raise ValueError('The plot has fewer candidate positions ({}) than boreholes ({}).'.format(
+            len(candidates), nBoreholes))
+
+    # 2.) Initial layout: farthest point sampling, starting at the candidate farthest from the centre
+    chosen = [int(np.argmax(np.sum((candidates - candidates.mean(axis=0))**2, axis=1)))]
+    dis_min = np.hypot(*(candidates - candidates[chosen[0]]).T)
+    for _ in range(nBoreholes - 1):
+        chosen.append(int(np.argmax(dis_min)))
+        dis_min = np.minimum(dis_min, np.hypot(*(candidates - candidates[chosen[-1]]).T))
+    layout = candidates[chosen]
+    dis = np.hypot(*np.moveaxis(layout[:, np.newaxis] - layout[np.newaxis], -1, 0))
+    np.fill_diagonal(dis, np.inf)
+    if np.min(dis) < spacing:
+        raise ValueError('{} boreholes do not fit into the plot with a spacing of {} m.'.format(
+            nBoreholes, spacing))
+
+    # 3.) FLS solution as function of the distance (at the end of the horizon)
+    response = PairResponse(H, D, r_b, alpha, time, dis_max=np.hypot(x_max - x_min, y_max - y_min))
+    evaluate = partial(layout_gfunction, response=response, r_b=r_b)
+    g = evaluate(layout[np.newaxis])[0]
+    g_initial = g
+
+    # 4.) Local search: batches of layouts with one borehole moved
+    pool = Pool(processes=processes)
+    nWorkers = processes or cpu_count()
+    history = []
+    unchanged = 0
+    nLayouts = 0
+    for _ in range(max_batches):
+        moved = rng.integers(nBoreholes, size=batch_size)
+        # half of the moves to nearby positions, half anywhere in the plot
+        targets = rng.integers(len(candidates), size=batch_size)
+        nearby = rng.random(batch_size) < 0.5
+        steps = rng.normal(scale=spacing, size=(batch_size, 2))
+        positions = np.where(nearby[:, np.newaxis], layout[moved] + steps, candidates[targets])
+        # snap to the nearest candidate positions
+        positions = candidates[np.argmin(np.sum((positions[:, np.newaxis] - candidates[np.newaxis])**2, axis=-1),
+                                         axis=1)]
+        layouts = np.repeat(layout[np.newaxis], batch_size, axis=0)
+        layouts[np.arange(batch_size), moved] = positions
+        # minimum spacing to the other boreholes
+        dis = np.hypot(*np.moveaxis(layouts - positions[:, np.newaxis], -1, 0))
+        dis[np.arange(batch_size), moved] = np.inf
+        layouts = layouts[np.min(dis, axis=1) >= spacing]
+        if len(layouts) == 0:
+            unchanged += 1
+            history.append(g)
+            continue
+
+        # evaluate the layouts of the batch in parallel
+        gBatch = np.concatenate(pool.map(evaluate, np.array_split(layouts, min(nWorkers, len(layouts)))))
+        nLayouts += len(layouts)
+        best = np.argmin(gBatch)
+        if gBatch[best] < g * (1. - 1.0e-9):
+            (layout, g) = (layouts[best], gBatch[best])
+            unchanged = 0
+        else:
+            unchanged += 1
+        history.append(g)
+        if unchanged >= patience:
+            break
+
+    pool.close()
+    pool.join()
+
+    toc = tim.time()
+    if disp:
+        message = ('Layout optimization: g-function {:.4f} -> {:.4f} ({} layouts in {:.1f} sec, '
+                   '{:.0f} layouts/sec)').format(g_initial, g, nLayouts, toc - tic, nLayouts / (toc - tic))
+        print(message)
+        self.ui.text_console.insertPlainText(message + '\n')
+
+    return Borefield(H, D, r_b, layout[:, 0], layout[:, 1]), np.array(history)
+
+
+if __name__ == '__main__':
+    from .boreholes import field_to_file
+    from .headless import DEFAULTS, HeadlessSession
+
+    parser = argparse.ArgumentParser(description='GERDPy borefield layout optimization')
+    parser.add_argument('--boundary', type=float, nargs='+', required=True,
+                        help='vertices of the plot boundary: x1 y1 x2 y2 ... [m]')
+    parser.add_argument('--n', type=int, required=True, help='number of boreholes')
+    parser.add_argument('--output', required=True, help='field file (see boreholes.field_from_file)')
+    parser.add_argument('--H', type=float, default=DEFAULTS['sb_depth_boreholes'], help='borehole length [m]')
+    parser.add_argument('--D', type=float, default=4., help='borehole buried depth [m]')
+    parser.add_argument('--r_b', type=float, default=DEFAULTS['sb_r_borehole'], help='borehole radius [m]')
+    parser.add_argument('--alpha', type=float, default=DEFAULTS['sb_therm_diffu'] * 1.0e-6,
+                        help='thermal diffusivity of the ground [m2/s]')
+    parser.add_argument('--spacing', type=float, default=5., help='minimum borehole spacing [m]')
+    parser.add_argument('--years', type=float, default=30., help='design horizon [years]')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    borefield, _ = optimize_layout(np.reshape(args.boundary, (-1, 2)), args.n, args.H, args.D, args.r_b,
+                                   args.alpha, args.years * 365 * 24 * 3600., HeadlessSession(),
+                                   spacing=args.spacing, processes=args.processes, seed=args.seed)
+    field_to_file(borefield, args.output)
+    print(args.output)
@@ -300,6 +300,7 @@ def load(z_asl, v, Theta_inf, S_r, he, Theta_b_0, R_th, R_th_ghp, Theta_surf_0,
             - *_0: parameter containing value from preceding timestep is used for calculation, as the current value is yet tbd
             - Q_N: net used power (power used for melting snow & ice)
             - Q_V: thermal power losses via connection & heating element underside
+            - Q_lat, Q_sen: latent & sensible part of Q_N (melting, heating of the snow to the melting point)
     '''
 
     # 0.) Preprocessing
@@ -515,4 +516,4 @@ def load(z_asl, v, Theta_inf, S_r, he, Theta_b_0, R_th, R_th_ghp, Theta_surf_0,
     # 4.3) Q_V [W]
     Q_V_sol = Q_V(Theta_b_0 - Q_sol * R_th_ghp, Theta_inf, lambda_p, lambda_iso, l_R_An, r_iso, r_pa, r_pi, he)
 
-    return Q_sol, Q_N, Q_V_sol, calc_T, Theta_surf_sol, m_w_1, m_s_1, sb_active, sim_mod
+    return Q_sol, Q_N, Q_V_sol, calc_T, Theta_surf_sol, m_w_1, m_s_1, sb_active, sim_mod, Q_lat, Q_sen
@@ -10,7 +10,6 @@
 """
 import math
 import sys
-import CoolProp.CoolProp as CP
 
 
 # physical params (mainly from [VDI2013])
@@ -177,6 +176,8 @@ def X_inf(Theta_inf, Phi, z_asl):
     ''' saturation vapour pressure of the environment at dew point temperature:
         p_v = p_s_ASHRAE(T_tau(Theta_inf, Phi))
     '''
+    import CoolProp.CoolProp as CP  # imported on first use only
+
     T_tau = CP.HAPropsSI('DewPoint', 'T', (Theta_inf + 273.15),
                          'P', 101325, 'R', Phi)  # Input in [K]
     p_v = p_s_ASHRAE(T_tau)  # Input in [K]
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+""" GERDPySim - 'plotting.py'
+
+    Decimated line plots for long result vectors
+
+    Only the minimum and maximum of each pixel column of the axes are drawn
+    (min/max decimation), so peaks are preserved while the number of points
+    drawn does not depend on the simulation period. The visible range is
+    decimated again on zooming and panning.
+
+    During the simulation, ResultMonitor sends decimated blocks of the new
+    time steps at a throttled rate to a live plot (LivePlot).
+
+    Authors: Yannick Apfel, Meike Martin
+"""
+import time as tim
+
+import numpy as np
+
+
+def minmax_decimate(x, y, n_bins):
+    """
+    Reduces a line to the minimum and maximum of n_bins consecutive bins.
+
+    Parameters
+    ----------
+    x : array
+        x-values (ascending).
+    y : array
+        y-values.
+    n_bins : int
+        Number of bins (e.g. width of the axes in pixels).
+
+    Returns
+    -------
+    x_dec, y_dec : arrays
+        Decimated line (at most 2 * n_bins points, in the original order).
+
+    """
+    n = len(y)
+    if n <= 2 * n_bins:
+        return x, y
+
+    size = int(np.ceil(n / n_bins))  # points per bin
+    n_full = n // size
+    body = np.asarray(y[:n_full * size]).reshape(n_full, size)
+    offsets = np.arange(n_full) * size
+    indices = [offsets + np.argmin(body, axis=1), offsets + np.argmax(body, axis=1)]
+    if n_full * size < n:  # incomplete last bin
+        tail = np.asarray(y[n_full * size:])
+        indices.append(n_full * size + np.array([np.argmin(tail), np.argmax(tail)]))
+    indices = np.unique(np.concatenate(indices + [[0, n - 1]]))
+
+    return x[indices], y[indices]
+
+
+class DecimatedLine(object):
+    """
+    Line plot, which is min/max-decimated to the pixel columns of the visible range.
+
+    Attributes
+    ----------
+    line :  Line2D
+            plotted line
+
+    """
+
+    def __init__(self, ax, x, y, *args, **kwargs):
+        from matplotlib.dates import date2num
+
+        self.ax = ax
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        # numerical x-values (as the axis limits)
+        self._x_num = date2num(self.x) if self.x.dtype.kind == 'M' else self.x
+
+        self.line, = ax.plot(*minmax_decimate(self.x, self.y, self._n_bins()), *args, **kwargs)
+        ax.callbacks.connect('xlim_changed', self.update)
+
+    def update(self, ax=None):
+        """
+        Decimates the visible range of the line (called on changes of the x-limits).
+        """
+        x_min, x_max = sorted(self.ax.get_xlim())
+        # visible range, including one point on each side
+        i_0 = max(np.searchsorted(self._x_num, x_min, side='left') - 1, 0)
+        i_1 = min(np.searchsorted(self._x_num, x_max, side='right') + 1, len(self.x))
+        self.line.set_data(*minmax_decimate(self.x[i_0:i_1], self.y[i_0:i_1], self._n_bins()))
+
+    def _n_bins(self):
+        return max(int(self.ax.bbox.width), 100)
+
+
+def plot_decimated(ax, x, y, *args, **kwargs):
+    """
+    Plots a long line min/max-decimated (same arguments as ax.plot).
+
+    Returns
+    -------
+    line : Line2D
+        Plotted line.
+
+    """
+    decimated = DecimatedLine(ax, x, y, *args, **kwargs)
+    # keep the decimation callback alive as long as the line
+    decimated.line._decimated = decimated
+
+    return decimated.line
+
+
+class ResultMonitor(object):
+    """
+    Sends decimated blocks of the completed time steps to a callback at a throttled rate.
+
+    The callback receives a dict {name: (dates, values)} of the result vectors
+    Theta_b, Theta_surf and Q, min/max-decimated to n_bins bins per block.
+
+    Attributes
+    ----------
+    callback :  callable
+                receiver of the blocks (e.g. LivePlot.update)
+    interval :  float
+                minimum time between two blocks [s]
+    n_bins :    int
+                number of bins per block
+
+    """
+
+    names = ('Theta_b', 'Theta_surf', 'Q')
+
+    def __init__(self, callback, interval=1.0, n_bins=200):
+        self.callback = callback
+        self.interval = interval
+        self.n_bins = n_bins
+        self._k = 0  # first window entry not sent yet
+        self._time = tim.time()
+
+    def step(self, vectors, k):
+        """
+        Time step k (window entry of the result vectors) is completed.
+        """
+        if tim.time() - self._time >= self.interval:
+            self.send(vectors, k + 1)
+
+    def send(self, vectors, k_end):
+        """
+        Sends the entries up to k_end (exclusive), which have not been sent yet.
+        """
+        if self._k < k_end:
+            # copies, as the window of the result vectors is overwritten later on
+            dates = np.array(vectors['dates'][self._k:k_end])
+            self.callback({name: minmax_decimate(dates, np.array(vectors[name][self._k:k_end]), self.n_bins)
+                           for name in self.names})
+        self._k = k_end
+        self._time = tim.time()
+
+    def shift(self, n):
+        """
+        The window of the result vectors has been shifted by n entries (see '_main.simulate').
+        """
+        self._k -= n
+
+
+class LivePlot(object):
+    """
+    Live plot of the temperatures and the extraction power during the simulation.
+
+    The received blocks are appended to the curves; once a curve exceeds
+    max_points, it is min/max-decimated, so that redrawing stays fast for
+    any simulation period.
+
+    Attributes
+    ----------
+    figure :    Figure
+                matplotlib figure (e.g. embedded in the GUI)
+
+    """
+
+    def __init__(self, figure, max_points=2000):
+        self.figure = figure
+        self.max_points = max_points
+
+        ax_T = figure.add_subplot(211)
+        ax_T.set_ylabel(r'$T$ [degC]')
+        ax_Q = figure.add_subplot(212, sharex=ax_T)
+        ax_Q.set_ylabel(r'$Q$ [W]')
+        self.axes = (ax_T, ax_Q)
+        self.lines = {'Theta_b': ax_T.plot([], [], 'r-', lw=1.2, label='T_borehole-wall')[0],
+                      'Theta_surf': ax_T.plot([], [], 'c-', lw=0.6, label='T_surface')[0],
+                      'Q': ax_Q.plot([], [], 'k-', lw=1.2, label='Extracted thermal power')[0]}
+        for ax in self.axes:
+            ax.xaxis_date()
+            ax.grid('major')
+            ax.legend(loc='upper left')
+        self.clear()
+
+    def clear(self):
+        self._data = {name: (np.empty(0), np.empty(0)) for name in self.lines}
+        for line in self.lines.values():
+            line.set_data([], [])
+        self.figure.canvas.draw_idle()
+
+    def update(self, block):
+        """
+        Appends a block {name: (dates, values)} (see ResultMonitor) and redraws.
+        """
+        from matplotlib.dates import date2num
+
+        for name, (dates, values) in block.items():
+            x, y = self._data[name]
+            x = np.concatenate((x, date2num(dates)))
+            y = np.concatenate((y, values))
+            if len(x) > self.max_points:
+                x, y = minmax_decimate(x, y, self.max_points // 4)
+            self._data[name] = (x, y)
+            self.lines[name].set_data(x, y)
+        for ax in self.axes:
+            ax.relim()
+            ax.autoscale_view()
+        self.figure.canvas.draw_idle()
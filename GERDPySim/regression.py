@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+""" GERDPySim - 'regression.py'
+
+    Golden-result regression harness
+
+    Runs the reference (pure-Python) simulation headlessly on the example
+    borefields and weather files, stores the result vectors as golden arrays
+    and compares any selected backend against them with per-quantity
+    tolerances. The runtime of the backend is reported as speedup over the
+    reference.
+
+    A backend is a set of options for '_main.simulate' (e.g. g-function
+    options), registered by name in BACKENDS.
+
+    The golden arrays of the short case field5_riem are part of the example
+    data (GOLDEN_DIR); the golden arrays of the other cases are generated
+    locally (several minutes per case).
+
+    Usage:
+        python -m GERDPySim.regression generate [--golden-dir DIR] [--case NAME ...]
+        python -m GERDPySim.regression compare --backend NAME [--golden-dir DIR] [--case NAME ...]
+
+    Authors: Yannick Apfel, Meike Martin
+"""
+import argparse
+import os
+import tempfile
+import time as tim
+
+import numpy as np
+
+from .headless import HeadlessSession
+
+# Directory of the example data
+EXAMPLE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'example_data')
+
+# Default directory of the golden arrays
+GOLDEN_DIR = os.path.join(EXAMPLE_DIR, 'golden')
+
+# Regression cases: simulation parameters of the headless session (see 'headless.DEFAULTS')
+CASES = {
+    'field5_riem': {
+        'line_borefield_file': 'custom_field_5.txt',
+        'line_weather_file': 'Wetterdaten_München-Riem_h.xlsx',
+        'rb_depth': True, 'sb_simtime': 730, 'sb_day': 1, 'cb_month': 1},
+    'field5_hohenpeissenberg': {
+        'line_borefield_file': 'custom_field_5.txt',
+        'line_weather_file': 'Wetterdaten_Hohenpeissenberg_h.xlsx',
+        'rb_depth': True, 'sb_simtime': 730, 'sb_day': 1, 'cb_month': 12},
+    'field5_hamburg_2a': {
+        'line_borefield_file': 'custom_field_5.txt',
+        'line_weather_file': 'Wetterdaten_Hamburg_h.xlsx',
+        'rb_depth': True, 'rb_multiyearsim': True, 'sb_simtime': 2, 'sb_day': 15, 'cb_month': 10},
+    'field32_airport': {
+        'line_borefield_file': 'custom_field_32.txt',
+        'line_weather_file': 'Wetterdaten_München-Airport_h.xlsx',
+        'rb_depth': True, 'sb_A_he': 250, 'sb_l_R': 7000, 'sb_simtime': 240, 'sb_day': 1, 'cb_month': 2},
+}
+
+# Quantities stored in the golden files
+QUANTITIES = ('Q', 'Q_V', 'Theta_b', 'Theta_surf', 'm_s', 'm_w', 'sim_mod')
+
+# Per-quantity tolerances
+''' A time step passes if |x - x_ref| <= atol + rtol * |x_ref|. A quantity passes if
+    the share of failing time steps does not exceed frac (discrete switches of the
+    simulation mode, e.g. the start of snow balancing, may be shifted by one time step).
+'''
+TOLERANCES = {
+    'Q': {'atol': 1.0, 'rtol': 1.0e-3, 'frac': 0.005},  # [W]
+    'Q_V': {'atol': 0.1, 'rtol': 1.0e-3, 'frac': 0.005},  # [W]
+    'Theta_b': {'atol': 1.0e-2, 'rtol': 0., 'frac': 0.},  # [°C]
+    'Theta_surf': {'atol': 5.0e-2, 'rtol': 0., 'frac': 0.005},  # [°C]
+    'm_s': {'atol': 0.1, 'rtol': 1.0e-3, 'frac': 0.005},  # [kg]
+    'm_w': {'atol': 0.1, 'rtol': 1.0e-3, 'frac': 0.005},  # [kg]
+    'sim_mod': {'atol': 0., 'rtol': 0., 'frac': 0.005},  # [-]
+}
+
+# Backends: keyword arguments for '_main.simulate'
+BACKENDS = {
+    'reference': {},
+    # dense response factor matrices in memory-mapped scratch files
+    'memmap': {'gfunction_options': {'scratch_dir': tempfile.gettempdir()}},
+    # g-function of equivalent boreholes (clusters of boreholes)
+    'equivalent': {'gfunction_options': {'use_equivalent_boreholes': True}},
+    # g-function solved per symmetry class of the bore field
+    'symmetries': {'gfunction_options': {'use_symmetries': True}},
+    # uniform heat flux g-function (screening; deviates from the reference for long simulation periods)
+    'uhf': {'boundary_condition': 'UHF'},
+    # g-function on a sparse logarithmic time grid (interpolated to the load aggregation times)
+    'sparse_time': {'gfunction_times': 40},
+    # number of segments per borehole selected adaptively
+    'adaptive_segments': {'gfunction_options': {'nSegments': 'adaptive'}},
+}
+
+
+def make_session(case, **params):
+    """
+    Returns the headless session of a regression case.
+
+    Parameters
+    ----------
+    case : str
+        Name of the regression case (key of CASES).
+    **params
+        Simulation parameters overriding the case (e.g. a shorter sb_simtime,
+        see 'headless.DEFAULTS').
+
+    Returns
+    -------
+    session : HeadlessSession
+        Headless session with the parameters of the case.
+
+    """
+    params = dict(CASES[case], **params)
+    for key in ('line_borefield_file', 'line_weather_file'):
+        params[key] = os.path.join(EXAMPLE_DIR, params[key])
+    return HeadlessSession(**params)
+
+
+def run_case(case, backend='reference', **params):
+    """
+    Runs a regression case headlessly.
+
+    Parameters
+    ----------
+    case : str
+        Name of the regression case (key of CASES).
+    backend : str, optional
+        Name of the backend (key of BACKENDS).
+        Default is 'reference'.
+    **params
+        Simulation parameters overriding the case (see make_session).
+
+    Returns
+    -------
+    arrays : dict
+        Result vectors of QUANTITIES.
+    elapsed : float
+        Runtime of the simulation [s].
+
+    """
+    from ._main import simulate
+
+    session = make_session(case, **params)
+    tic = tim.time()
+    sim = simulate(session, visualize=False, **BACKENDS[backend])
+    elapsed = tim.time() - tic
+    arrays = {name: np.asarray(sim[name], dtype=float) for name in QUANTITIES}
+
+    return arrays, elapsed
+
+
+def generate_golden(golden_dir=GOLDEN_DIR, cases=None):
+    """
+    Runs the reference implementation and stores the golden arrays
+    ('<case>.npz' in golden_dir, including the reference runtime).
+
+    Parameters
+    ----------
+    golden_dir : str, optional
+        Directory of the golden files.
+    cases : list of str, optional
+        Regression cases. Default is all cases.
+
+    """
+    os.makedirs(golden_dir, exist_ok=True)
+    for case in (cases or list(CASES)):
+        arrays, elapsed = run_case(case, backend='reference')
+        np.savez_compressed(os.path.join(golden_dir, case + '.npz'), elapsed=elapsed, **arrays)
+        print('Golden arrays of case {} stored ({:.1f} sec).'.format(case, elapsed))
+
+
+def compare_arrays(arrays, golden, tolerances=None):
+    """
+    Compares result vectors against golden arrays.
+
+    Parameters
+    ----------
+    arrays : dict
+        Result vectors of the backend.
+    golden : dict (or NpzFile)
+        Golden arrays.
+    tolerances : dict, optional
+        Per-quantity tolerances. Default is TOLERANCES.
+
+    Returns
+    -------
+    report : dict
+        For each quantity: maximum absolute error, share of failing time steps
+        and pass/fail.
+
+    """
+    tolerances = tolerances or TOLERANCES
+    report = {}
+    for name in QUANTITIES:
+        x = arrays[name]
+        x_ref = golden[name]
+        tol = tolerances[name]
+        if x.shape != x_ref.shape:
+            report[name] = {'max_abs': np.inf, 'frac_failed': 1., 'passed': False}
+            continue
+        err = np.abs(x - x_ref)
+        failed = err > tol['atol'] + tol['rtol'] * np.abs(x_ref)
+        frac_failed = np.count_nonzero(failed) / max(len(x_ref), 1)
+        report[name] = {'max_abs': float(np.max(err, initial=0.)), 'frac_failed': frac_failed,
+                        'passed': bool(frac_failed <= tol['frac'])}
+    return report
+
+
+def compare(backend, golden_dir=GOLDEN_DIR, cases=None, tolerances=None):
+    """
+    Runs a backend and compares it against the golden arrays.
+
+    Parameters
+    ----------
+    backend : str
+        Name of the backend (key of BACKENDS).
+    golden_dir : str, optional
+        Directory of the golden files.
+    cases : list of str, optional
+        Regression cases. Default is all cases.
+    tolerances : dict, optional
+        Per-quantity tolerances. Default is TOLERANCES.
+
+    Returns
+    -------
+    passed : bool
+        True if all quantities of all cases are within tolerance.
+
+    """
+    passed = True
+    for case in (cases or list(CASES)):
+        path = os.path.join(golden_dir, case + '.npz')
+        if not os.path.exists(path):
+            raise FileNotFoundError('No golden arrays for case {} in {}. '
+                                    'Run "python -m GERDPySim.regression generate" first.'.format(case, golden_dir))
+        golden = np.load(path)
+        arrays, elapsed = run_case(case, backend=backend)
+        report = compare_arrays(arrays, golden, tolerances=tolerances)
+
+        print(80 * '-')
+        print('Case {} - backend {}: {:.1f} sec (reference: {:.1f} sec, speedup: {:.2f}x)'.format(
+            case, backend, elapsed, float(golden['elapsed']), float(golden['elapsed']) / elapsed))
+        for name, r in report.items():
+            print('    {:<12} max. abs. error {:<12.4g} failed time steps {:>7.3%}   {}'.format(
+                name, r['max_abs'], r['frac_failed'], 'OK' if r['passed'] else 'FAILED'))
+            passed = passed and r['passed']
+    print(80 * '-')
+    print('All quantities within tolerance.' if passed else 'Regression FAILED.')
+
+    return passed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='GERDPy golden-result regression harness')
+    parser.add_argument('command', choices=['generate', 'compare'])
+    parser.add_argument('--backend', default='reference', choices=sorted(BACKENDS))
+    parser.add_argument('--golden-dir', default=GOLDEN_DIR)
+    parser.add_argument('--case', action='append', choices=sorted(CASES))
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        generate_golden(args.golden_dir, cases=args.case)
+    else:
+        raise SystemExit(0 if compare(args.backend, args.golden_dir, cases=args.case) else 1)
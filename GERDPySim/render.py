@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+""" GERDPySim - 'render.py'
+
+    Rendering of the result figures to files (batch mode)
+
+    The figures of a simulation run are rendered from a result file (see
+    'results.save_results') with the Agg backend, without any GUI. RenderPool
+    renders in a separate worker process, so that the figures of one run are
+    written while the next simulation of a parameter sweep is already running.
+
+    Usage:
+        python -m GERDPySim.render RESULT_FILE [--output-dir DIR] [--format png pdf] [--years N]
+
+    Example (parameter sweep):
+    >>> with RenderPool() as pool:
+    ...     for params in sweep:
+    ...         session = HeadlessSession(**params)
+    ...         save_results(f'{name}.npz', simulate(session, visualize=False))
+    ...         pool.submit(f'{name}.npz', 'figures', params)
+
+    Authors: Yannick Apfel, Meike Martin
+"""
+import argparse
+import os
+
+# size of the result figures [inch]
+RESULT_FIGSIZE = (16., 12.)
+
+
+def render(results_file, output_dir=None, params=None, formats=('png',), layouts=True):
+    """
+    Renders the figures of a simulation run to files.
+
+    Parameters
+    ----------
+    results_file : str
+        Path to the result file (.npz or .parquet, see 'results.save_results').
+    output_dir : str, optional
+        Directory of the figure files. Default is the directory of the result file.
+    params : dict, optional
+        Simulation parameters of the run (see 'headless.DEFAULTS'), e.g.
+        rb_multiyearsim and sb_simtime for the annual plots or the borefield
+        file for the layout plots.
+    formats : tuple of str, optional
+        File formats (matplotlib, e.g. 'png', 'pdf', 'svg').
+        Default is ('png',).
+    layouts : bool, optional
+        Set to True to render the borefield and heatpipe layouts as well
+        (requires line_borefield_file in params).
+        Default is True.
+
+    Returns
+    -------
+    files : list of str
+        Paths to the figure files.
+
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    from GERDPySim import boreholes
+    from GERDPySim import heatpipes
+    from GERDPySim._main import evaluate
+    from GERDPySim.headless import HeadlessSession
+    from GERDPySim.results import load_results, sim_from_results
+
+    session = HeadlessSession(**(params or {}))
+    output_dir = output_dir or os.path.dirname(os.path.abspath(results_file))
+    stem = os.path.splitext(os.path.basename(results_file))[0]
+    os.makedirs(output_dir, exist_ok=True)
+
+    figures = {}
+    if layouts and session.ui.line_borefield_file.text():
+        boreField = boreholes.field_from_file(session, session.ui.line_borefield_file.text())
+        figures['borefield'] = boreholes.visualize_field(boreField)
+        ui = session.ui
+        hp = heatpipes.Heatpipes(ui.sb_number_heatpipes.value(), ui.sb_r_borehole.value(), ui.sb_radius_w.value(),
+                                 ui.sb_radius_iso.value(), ui.sb_radius_pa.value(), ui.sb_radius_pi.value(),
+                                 ui.sb_lambda_b.value(), ui.sb_lambda_iso.value(), ui.sb_lambda_p.value())
+        figures['heatpipes'] = hp.visualize_hp_config()
+
+    open_figures = set(plt.get_fignums())
+    evaluate(session, sim_from_results(load_results(results_file)), show=False)
+    for n, num in enumerate(sorted(set(plt.get_fignums()) - open_figures)):
+        fig = plt.figure(num)
+        fig.set_size_inches(*RESULT_FIGSIZE)
+        for ax in fig.axes:  # decimate the curves again for the new figure size (see 'plotting.py')
+            ax.set_xlim(ax.get_xlim())
+        figures['results_{}'.format(n + 1)] = fig
+
+    files = []
+    for name, fig in figures.items():
+        for fmt in formats:
+            path = os.path.join(output_dir, '{}_{}.{}'.format(stem, name, fmt))
+            fig.savefig(path, dpi=150, bbox_inches='tight')
+            files.append(path)
+        plt.close(fig)
+
+    return files
+
+
+class RenderPool(object):
+    """
+    Renders result figures in worker processes (see render).
+
+    The worker processes are started with 'spawn', so that they do not inherit
+    the GUI (Qt) of the parent process.
+
+    Attributes
+    ----------
+    futures :   list of Future
+                submitted rendering jobs (result: list of figure files)
+
+    """
+
+    def __init__(self, max_workers=1):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        self._executor = ProcessPoolExecutor(max_workers=max_workers,
+                                             mp_context=multiprocessing.get_context('spawn'))
+        self.futures = []
+
+    def submit(self, results_file, output_dir=None, params=None, formats=('png',), layouts=True):
+        """
+        Submits the rendering of a result file (arguments see render).
+
+        Returns
+        -------
+        future : Future
+            Rendering job (result: list of figure files).
+
+        """
+        future = self._executor.submit(render, results_file, output_dir, params, tuple(formats), layouts)
+        self.futures.append(future)
+        return future
+
+    def close(self, wait=True):
+        """
+        Waits for the submitted jobs (wait=True) and stops the worker processes.
+        """
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='GERDPy result figure rendering')
+    parser.add_argument('results_file')
+    parser.add_argument('--output-dir', default=None)
+    parser.add_argument('--format', nargs='+', default=['png'])
+    parser.add_argument('--years', type=int, default=None,
+                        help='number of years of a multi-year simulation (annual plots)')
+    args = parser.parse_args()
+
+    params = {'rb_multiyearsim': True, 'sb_simtime': args.years} if args.years else {}
+    for path in render(args.results_file, args.output_dir, params, formats=args.format, layouts=False):
+        print(path)
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+""" GERDPySim - 'results.py'
+
+    Chunked result files of the simulation
+
+    During the iteration loop the result vectors are held in a window of fixed
+    length only; full windows are flushed to the result file as chunks. The
+    result file is read back lazily (column- and chunk-wise).
+
+    Formats (selected by file extension):
+        .parquet        Apache Parquet (one row group per chunk, zstd-compressed), requires pyarrow
+        .zip            zip-archive of compressed .npy-files ('<column>/<chunk no.>.npy'; no .npz-file,
+                        which np.load could read)
+
+    Complete results of a simulation run (all result vectors with a datetime64
+    index) are exported by save_results and reloaded memory-mapped by load_results
+    (.parquet or uncompressed .npz).
+
+    Authors: Yannick Apfel, Meike Martin
+"""
+import io
+import json
+import os
+import struct
+import zipfile
+
+# number of time steps per chunk (one year of hours)
+CHUNK_SIZE = 8760
+
+# result vectors of a simulation run (see '_main.simulate')
+RESULT_VECTORS = ('Q', 'Q_N', 'Q_V', 'Theta_b', 'Theta_surf', 'm_w', 'm_s', 'start_sb_vector', 'sb_active',
+                  'sim_mod', 'u_inf', 'Theta_inf', 'S_r')
+
+# discrete result vectors (stored as integers)
+FLAG_VECTORS = ('start_sb_vector', 'sb_active', 'sim_mod')
+
+# scalar results of a simulation run
+RESULT_SCALARS = ('fos', 'A_he', 'Theta_g', 'Nt')
+
+
+class ResultWriter(object):
+    """
+    Appends chunks of result vectors to a result file.
+
+    Attributes
+    ----------
+    path :      str
+                path to the result file
+    n_rows :    int
+                number of time steps written
+
+    Examples
+    --------
+    >>> with ResultWriter('results.zip') as writer:
+    ...     writer.write({'Q': Q[:8760], 'dates': dates[:8760]})
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.n_rows = 0
+        self._n_chunks = 0
+        self._parquet = _chunked_format(path) == 'parquet'
+        self._file = None
+
+        if os.path.exists(path):
+            os.remove(path)
+
+    def write(self, columns):
+        """
+        Appends a chunk (dict of equally long arrays).
+        """
+        import numpy as np
+
+        if self._parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            columns = {name: np.asarray(values) for name, values in columns.items()}
+            for name, values in columns.items():
+                if values.dtype.kind == 'M':  # datetime64[h] is not supported by Parquet
+                    columns[name] = values.astype('M8[s]')
+            table = pa.table(columns)
+            if self._file is None:
+                self._file = pq.ParquetWriter(self.path, table.schema, compression='zstd')
+            self._file.write_table(table)
+        else:
+            if self._file is None:
+                self._file = zipfile.ZipFile(self.path, 'w', compression=zipfile.ZIP_DEFLATED)
+            for name, values in columns.items():
+                buffer = io.BytesIO()
+                np.save(buffer, np.asarray(values))
+                self._file.writestr('{}/{:06d}.npy'.format(name, self._n_chunks), buffer.getvalue())
+
+        self.n_rows += len(next(iter(columns.values())))
+        self._n_chunks += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ResultFile(object):
+    """
+    Lazy access to a result file written by ResultWriter.
+
+    The columns are only read on access (ResultFile[name]); ResultFile.chunks(name)
+    yields the chunks of a column one by one.
+
+    Attributes
+    ----------
+    path :      str
+                path to the result file
+    columns :   list of str
+                names of the result vectors
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if _chunked_format(path) == 'parquet':
+            import pyarrow.parquet as pq
+
+            self._file = pq.ParquetFile(path)
+            self.columns = list(self._file.schema_arrow.names)
+            self.n_chunks = self._file.num_row_groups
+        else:
+            self._file = zipfile.ZipFile(path, 'r')
+            members = self._file.namelist()  # in the order written
+            self.columns = list(dict.fromkeys(member.split('/')[0] for member in members))
+            self.n_chunks = sum(member.startswith(self.columns[0] + '/') for member in members) \
+                if self.columns else 0
+
+    def chunks(self, name):
+        """
+        Generator of the chunks of a result vector.
+        """
+        import numpy as np
+
+        if name not in self.columns:
+            raise KeyError(name)
+        for n in range(self.n_chunks):
+            if isinstance(self._file, zipfile.ZipFile):
+                with self._file.open('{}/{:06d}.npy'.format(name, n)) as f:
+                    yield np.load(io.BytesIO(f.read()))
+            else:
+                yield self._file.read_row_group(n, columns=[name]).column(0).to_numpy()
+
+    def __getitem__(self, name):
+        import numpy as np
+
+        chunks = list(self.chunks(name))
+        return np.concatenate(chunks) if chunks else np.empty(0)
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __len__(self):
+        if not isinstance(self._file, zipfile.ZipFile):
+            return self._file.metadata.num_rows
+        return sum(len(chunk) for chunk in self.chunks(self.columns[0])) if self.columns else 0
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def save_results(path, sim, float32=False):
+    """
+    Exports the results of a simulation run to a binary file (.parquet or .npz).
+
+    Parameters
+    ----------
+    path : str
+        Path to the result file.
+    sim : dict
+        Return value of '_main.simulate'.
+    float32 : bool, optional
+        Set to True to store the result vectors in single precision.
+        Default is False.
+
+    """
+    import numpy as np
+
+    if 'results_file' in sim:
+        raise ValueError('The results of the simulation run are stored in the result file "{}" '
+                         '(see ResultFile).'.format(sim['results_file']))
+    float_type = np.float32 if float32 else np.float64
+    columns = {}
+    for name in RESULT_VECTORS:
+        columns[name] = np.asarray(sim[name], dtype=np.int8 if name in FLAG_VECTORS else float_type)
+    timestamp = np.asarray(sim['dates'], dtype='M8[h]')
+    scalars = {name: sim[name] for name in RESULT_SCALARS}
+    kpis = json.dumps(sim.get('kpis', {}))
+
+    ext = os.path.splitext(path)[1].lower()
+    if _is_parquet(path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        columns = dict({'timestamp': timestamp.astype('M8[s]')}, **columns)
+        table = pa.table(columns).replace_schema_metadata({'GERDPy': json.dumps(
+            {name: float(value) for name, value in scalars.items()}), 'kpis': kpis})
+        pq.write_table(table, path, compression='zstd')
+    elif ext == '.npz':
+        np.savez(path, timestamp=timestamp, kpis=kpis, **columns, **scalars)  # uncompressed: memory-mapped on load
+    else:
+        raise ValueError('Unknown result file format "{}" (supported: .npz, .parquet).'.format(ext))
+
+
+def load_results(path):
+    """
+    Loads the results of a simulation run exported by save_results (memory-mapped).
+
+    Parameters
+    ----------
+    path : str
+        Path to the result file (.parquet or .npz).
+
+    Returns
+    -------
+    results : DataFrame
+        Result vectors (datetime64 index 'timestamp'); the scalar results
+        (fos, A_he, Theta_g, Nt) and the energy performance indicators (kpis)
+        are stored in results.attrs.
+
+    """
+    import pandas as pd
+
+    if _is_parquet(path):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path, memory_map=True)
+        results = table.to_pandas().set_index('timestamp')
+        attrs = json.loads(table.schema.metadata[b'GERDPy'])
+        attrs = {name: int(value) if name in ('fos', 'Nt') else value for name, value in attrs.items()}
+        attrs['kpis'] = json.loads(table.schema.metadata.get(b'kpis', b'{}'))
+    else:
+        arrays = _mmap_npz(path)
+        results = pd.DataFrame({name: arrays[name] for name in RESULT_VECTORS},
+                               index=pd.DatetimeIndex(arrays['timestamp'], name='timestamp'), copy=False)
+        attrs = {name: arrays[name].item() for name in RESULT_SCALARS}
+        attrs['kpis'] = json.loads(arrays['kpis'].item()) if 'kpis' in arrays else {}
+    results.attrs.update(attrs)
+
+    return results
+
+
+def sim_from_results(results):
+    """
+    Converts results loaded by load_results to the result dict of '_main.simulate'.
+    """
+    import numpy as np
+
+    sim = {name: results[name].to_numpy() for name in RESULT_VECTORS}
+    sim['dates'] = results.index.to_numpy().astype('M8[h]')
+    sim.update(results.attrs)
+
+    return sim
+
+
+def _mmap_npz(path):
+    # memory-maps the result vectors (1-d members) of an uncompressed .npz-file; the scalars
+    # (0-d members) and the energy performance indicators (JSON string) are read
+    import numpy as np
+
+    arrays = {}
+    with np.load(path) as npz, zipfile.ZipFile(path, 'r') as archive, open(path, 'rb') as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError('Compressed .npz-files cannot be memory-mapped: {}'.format(path))
+            # local file header: 30 bytes, file name and extra field
+            f.seek(info.header_offset)
+            name_length, extra_length = struct.unpack('<HH', f.read(30)[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            name = info.filename[:-4]
+            if len(shape) != 1 or dtype.hasobject or dtype.kind in 'SU':
+                arrays[name] = npz[name]
+                continue
+            arrays[name] = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                                     order='F' if fortran_order else 'C')
+
+    return arrays
+
+
+def _chunked_format(path):
+    # format of a chunked result file (see ResultWriter)
+    ext = os.path.splitext(path)[1].lower()
+    if _is_parquet(path):
+        return 'parquet'
+    if ext == '.zip':
+        return 'zip'
+    raise ValueError('Unknown chunked result file format "{}" (supported: .zip, .parquet; .npz-files are '
+                     'written by save_results).'.format(ext))
+
+
+def _is_parquet(path):
+    return os.path.splitext(path)[1].lower() in ('.parquet', '.pq')
@@ -60,16 +60,122 @@ def time_ClaessonJaved(dt, tmax, cells_per_level=5):
     return time
 
 
+def segment_ratios(nSegments, end_refinement=False):
+    """
+    Relative lengths of the segments of a borehole.
+
+    Parameters
+    ----------
+    nSegments : int
+        Number of line segments per borehole.
+    end_refinement : bool, optional
+        Set to True for shorter segments near the top and the bottom of the
+        borehole, where the heat extraction rate varies most (segment edges
+        at (1 - cos(pi*k/nSegments))/2, k = 0, ..., nSegments).
+        Default is False (segments of equal length).
+
+    Returns
+    -------
+    ratios : array
+        Segment lengths relative to the borehole length (sum is 1), from
+        the top to the bottom of the borehole.
+
+    """
+    if not end_refinement:
+        return np.full(nSegments, 1. / nSegments)
+    edges = 0.5 * (1. - np.cos(np.pi * np.arange(nSegments + 1) / nSegments))
+    return np.diff(edges)
+
+
 def Q_moving_average(Q):
+    """
+    Centred 25-hour moving average of the extraction power (shortened
+    symmetric windows at the beginning and the end).
+
+    Parameters
+    ----------
+    Q : array
+        Extraction power [W].
+
+    Returns
+    -------
+    Q_ma : array
+        Moving average of the extraction power [W].
+
+    """
     h_interv = 25
-    Q_ma = np.zeros(len(Q))
-    for i in range(0, len(Q)):
-        if i < (h_interv / 2):
-            Q_ma[i] = np.mean(Q[0 : (2 * i + 1)])
-        elif (i >= (h_interv / 2)) and (i <= ((len(Q) - 1) - (h_interv / 2))):
-            Q_ma[i] = np.mean(Q[(i - int(np.floor(h_interv / 2))) : (i + int(np.ceil(h_interv / 2)))])
-        elif i > ((len(Q) - 1) - (h_interv / 2)):
-            Q_ma[i] = np.mean(Q[(i - (len(Q) - 1 - i)) : len(Q)])
+    n = len(Q)
+    i = np.arange(n)
+    # half window width (symmetric around i)
+    half = np.where(i < (h_interv / 2), i, np.minimum(n - 1 - i, h_interv // 2))
+    lo = i - half
+    hi = np.minimum(i + half + 1, n)
+    Q_cum = np.concatenate(([0.], np.cumsum(Q)))
+    Q_ma = (Q_cum[hi] - Q_cum[lo]) / (hi - lo)
+    if n > 0:
         Q_ma[-1] = Q[-1]
-        
+
     return Q_ma
+
+
+class RunningMovingAverage(object):
+    """
+    Centred 25-hour moving average of an extraction power given chunk-wise
+    (same values as Q_moving_average of the whole vector).
+
+    The moving average of a value is only available once the 12 following
+    values are known, so the values of a chunk are partly returned with the
+    following chunks (or by finish).
+
+    Examples
+    --------
+    >>> ma = RunningMovingAverage()
+    >>> Q_ma = np.concatenate([ma.push(chunk) for chunk in chunks] + [ma.finish()])
+
+    """
+
+    h_interv = 25
+
+    def __init__(self):
+        self._buffer = np.empty(0)  # context (up to 12 values) and pending values
+        self._n_context = 0         # number of context values in the buffer
+        self._i_0 = 0               # index of the first pending value
+        self._n = 0                 # number of values pushed
+
+    def push(self, Q):
+        """
+        Appends a chunk of extraction power [W] and returns the moving average
+        of the values, which have become available.
+        """
+        self._buffer = np.concatenate((self._buffer, Q))
+        self._n += len(Q)
+        return self._moving_average(max(self._n - self.h_interv // 2 - self._i_0, 0), n=None)
+
+    def finish(self):
+        """
+        Returns the moving average of the remaining values (end of the vector).
+        """
+        Q_ma = self._moving_average(self._n - self._i_0, n=self._n)
+        if len(Q_ma) > 0:
+            Q_ma[-1] = self._buffer[-1]
+        return Q_ma
+
+    def _moving_average(self, count, n):
+        # moving average of the next count pending values (n: total number of values, if known)
+        i = self._i_0 + np.arange(count)
+        # half window width (symmetric around i, see Q_moving_average)
+        half = np.where(i < (self.h_interv / 2), i,
+                        self.h_interv // 2 if n is None else np.minimum(n - 1 - i, self.h_interv // 2))
+        # window [lo, hi) (buffer indices)
+        offset = self._i_0 - self._n_context
+        lo = i - half - offset
+        hi = np.minimum(i + half + 1, self._n) - offset
+        Q_cum = np.concatenate(([0.], np.cumsum(self._buffer)))
+        Q_ma = (Q_cum[hi] - Q_cum[lo]) / (hi - lo)
+
+        # drop the values, which are no longer needed
+        self._i_0 += count
+        n_context = min(self._i_0, self.h_interv // 2)
+        self._buffer = self._buffer[self._n_context + count - n_context:]
+        self._n_context = n_context
+        return Q_ma
@@ -1,80 +1,619 @@
 # -*- coding: utf-8 -*-
 """ GERDPySim - 'weather_data.py'
     
-    Import of weather data from Excel-File
+    Import of weather data
+
+    Supported formats (selected by file extension, see READERS):
+        .xlsx / .xls    GERDPy Excel-template (reference year, see 'example_data')
+        .csv            columns 'timestamp' (start of the hour) and u, Theta, RR, Phi, B
+                        in the units of SCHEMA (decimal separator '.', delimiter ',' or ';')
+        .epw            EnergyPlus weather file
+        .dat            DWD test reference year (TRY 2011 / 2017)
+
+    All readers return the same columnar table (structured array, see SCHEMA), so
+    further formats can be added by registering a reader function in READERS.
+
+    The time loop reads the weather data of the simulation period block-wise
+    (WeatherStream, one month of hours per block) with read-ahead on a background
+    thread, so that the memory needed is independent of the simulation period.
+
+    The imported tables are cached as binary files (.npy, memory-mapped on load) in
+    CACHE_DIR, next to a cache index ('index.json') keyed by the content hash (SHA-1)
+    and the modification time of the weather data file. A changed file is re-imported
+    automatically.
 
     Authors: Yannick Apfel, Meike Martin
 """
-def get_weather_data(Nt, self):
+import hashlib
+import json
+import os
+import queue
+import threading
+
+# year of the first time step (for weather data files containing a reference year without year numbers)
+REF_YEAR = 2001
+
+# columnar schema of the weather data table
+SCHEMA = [
+    ('timestamp', 'M8[h]'),  # start of the hour
+    ('u', 'f8'),  # ambient wind speed [m/s]
+    ('Theta', 'f8'),  # ambient temperature [°C]
+    ('S_r', 'f8'),  # snowfall rate [mm/h]
+    ('B', 'f8'),  # cloudiness [-] (0 - cloudless, 1 - fully overcast)
+    ('Phi', 'f8'),  # relative humidity [-]
+    ('RR', 'f8'),  # total precipitation [mm/h]
+]
+
+# directory of the weather data cache (environment variable GERDPY_CACHE_DIR)
+CACHE_DIR = os.environ.get('GERDPY_CACHE_DIR',
+                           os.path.join(os.path.expanduser('~'), '.cache', 'GERDPy', 'weather'))
+
+# version of the cached tables (table layout and readers, part of the cache file name)
+CACHE_VERSION = 3
 
-    import sys
+# number of time steps per block of the weather data stream (one month of hours)
+BLOCK_SIZE = 744
+
+
+def read_weather_file(path, cache_dir=None):
+    """
+    Import a weather data file (cached).
+
+    Parameters
+    ----------
+    path : str
+        Path to the weather data file (format selected by the file extension,
+        see READERS).
+    cache_dir : str, optional
+        Directory of the weather data cache. Set to False to disable caching.
+        Default is CACHE_DIR.
+
+    Returns
+    -------
+    table : structured array
+        Weather data table (fields see SCHEMA).
+
+    """
     import numpy as np
-    import pandas as pd
 
-    # path to excel-file
-    path = self.ui.line_weather_file.text()  # './data/Wetterdaten_München-Riem_h.xlsx'
+    reader = weather_reader(path)
+    if cache_dir is None:
+        cache_dir = CACHE_DIR
+    if cache_dir is False:
+        return reader(path)
+
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    index_path = os.path.join(cache_dir, 'index.json')
+    index = _read_cache_index(index_path)
+    entry = index.get(path)
+
+    # file unchanged since the last import (size and modification time): no hashing needed
+    if entry is not None and (entry['size'], entry['mtime']) != (stat.st_size, stat.st_mtime_ns):
+        entry = None
+    if entry is None:
+        entry = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha1': _file_hash(path)}
+
+    cache_file = os.path.join(cache_dir, '{}-v{}.npy'.format(entry['sha1'], CACHE_VERSION))
+    if os.path.exists(cache_file):
+        table = np.load(cache_file, mmap_mode='r')
+    else:
+        table = reader(path)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            _atomic_write(cache_file, lambda f: np.save(f, table))
+        except OSError as e:
+            print(f'Weather data cache not writable ({e}).')
+            return table
+
+    if index.get(path) != entry:
+        index[path] = entry
+        try:
+            _atomic_write(index_path, lambda f: f.write(json.dumps(index, indent=1).encode('utf-8')))
+        except OSError as e:
+            print(f'Weather data cache not writable ({e}).')
+
+    return table
+
+
+def weather_reader(path):
+    """
+    Returns the reader function for the format of a weather data file.
+
+    Parameters
+    ----------
+    path : str
+        Path to the weather data file.
+
+    Returns
+    -------
+    reader : callable
+        Reader function (reader(path) returns the weather data table).
+
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in READERS:
+        raise ValueError('Unknown weather data format "{}" (supported: {}).'.format(
+            ext, ', '.join(sorted(READERS))))
+    return READERS[ext]
+
+
+def weather_table(timestamp, u, Theta, RR, Phi, B):
+    """
+    Builds the weather data table (see SCHEMA) from the columns of a weather data file.
+
+    The snowfall rate is the total precipitation at ambient temperatures below 1 °C
+    (precipitation comes down as rain otherwise).
+
+    Returns
+    -------
+    table : structured array
+        Weather data table.
+
+    """
+    import numpy as np
+
+    table = np.empty(len(timestamp), dtype=SCHEMA)
+    table['timestamp'] = timestamp
+    table['u'] = u
+    table['Theta'] = Theta
+    table['RR'] = RR
+    table['Phi'] = Phi
+    table['B'] = B
+    table['S_r'] = np.where(table['Theta'] >= 1, 0., table['RR'])
+
+    for name, _ in SCHEMA[1:]:
+        if np.isnan(table[name]).any():
+            raise ValueError('Weather data contain missing values in column "{}" (e.g. time step {}).'.format(
+                name, table['timestamp'][np.isnan(table[name])][0]))
+
+    return table
+
+
+def read_excel_weather(path):
+    """
+    Reads the GERDPy Excel-template (columns: month, day, hour (1 - 24), precipitation
+    [mm/h], temperature [°C], relative humidity [%], wind speed [m/s], cloudiness [octal units]).
+    """
+    import pandas as pd
 
-    # import data
     data = pd.read_excel(path, skiprows=3, header=1)
+    columns = [data.iloc[:, k].to_numpy() for k in range(8)]
 
-    # get startdate
-    day = self.ui.sb_day.value()
-    month = int(self.ui.cb_month.currentData())
+    return weather_table(weather_dates(columns[0], columns[1], columns[2]), u=columns[6], Theta=columns[4],
+                         RR=columns[3], Phi=columns[5] / 100, B=columns[7] / 8)
 
-    # create a list of row indices based on startdate
-    start_index = data.index[(data.iloc[:, 0] == month) & (data.iloc[:, 1] == day)].tolist()[0]
 
-    if start_index+Nt > len(data):
-        if 0 != start_index:
-            rows = list(range(start_index, len(data), 1)) + list(range(0, start_index, 1))
-        else:
-            rows = list(range(len(data)))
-    else:
-        rows = list(range(start_index, start_index+Nt, 1))
+def read_csv_weather(path):
+    """
+    Reads a CSV-file with the columns 'timestamp' (start of the hour, e.g. '2001-01-01 00:00')
+    and u, Theta, RR, Phi, B (units see SCHEMA). Further columns are ignored.
+    """
+    import numpy as np
+    import pandas as pd
+
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        header = f.readline()
+    sep = ';' if header.count(';') > header.count(',') else ','
+    names = ['timestamp', 'u', 'Theta', 'RR', 'Phi', 'B']
+    try:
+        import pyarrow  # noqa: F401  (multi-threaded parser, if installed)
+        engine = 'pyarrow'
+    except ImportError:
+        engine = 'c'
+    data = pd.read_csv(path, sep=sep, usecols=names, engine=engine, encoding='utf-8-sig')
+
+    timestamp = pd.to_datetime(data['timestamp']).to_numpy().astype('M8[h]')
+    return weather_table(timestamp, **{name: data[name].to_numpy(dtype=np.float64) for name in names[1:]})
+
+
+def read_epw_weather(path):
+    """
+    Reads an EnergyPlus weather file (.epw). The years of the file are used if they are
+    in chronological order (actual meteorological year), otherwise (typical meteorological
+    year) the dates start in REF_YEAR. Missing values are interpolated linearly in time;
+    files without any precipitation data are read without precipitation.
+    """
+    import numpy as np
+    import pandas as pd
+
+    # fields: year, month, day, hour (1 - 24), dry bulb temperature [°C], relative humidity [%],
+    # wind speed [m/s], total sky cover [tenths], liquid precipitation depth [mm] and quantity [h]
+    fields = [0, 1, 2, 3, 6, 8, 21, 22, 33, 34]
+    data = pd.read_csv(path, skiprows=8, header=None, usecols=fields, engine='c', encoding='latin-1')
+    year, month, day, hour, Theta, RH, u, N, depth, quantity = [data[k].to_numpy() for k in fields]
+
+    # missing values (see EnergyPlus Auxiliary Programs, weather file format)
+    Theta = _interpolate_missing(Theta, 99.9)
+    RH = _interpolate_missing(RH, 999)
+    u = _interpolate_missing(u, 999)
+    N = _interpolate_missing(N, 99)
+    depth = _interpolate_missing(depth, 999)
+    if np.isnan(depth).all():
+        print('The EPW file contains no precipitation: snowfall is not considered.')
+        depth = np.zeros(len(depth))
+    quantity = np.where((quantity >= 99) | (quantity < 1), 1., quantity)
+
+    if not np.all(np.diff(year) >= 0):
+        year = None
+    return weather_table(weather_dates(month, day, hour, year=year), u=u, Theta=Theta, RR=depth / quantity,
+                         Phi=RH / 100, B=N / 10)
 
-    # create looped list for multi-year simulation
-    i = 1
-    while i <= Nt/len(data)-1:
-        if 0 != start_index:
-            rows = rows + list(range(start_index, len(data), 1)) + list(range(0, start_index, 1))
+
+def _interpolate_missing(values, missing):
+    # values >= missing (missing value code) are interpolated linearly between the neighbouring
+    # time steps (NaN if all values are missing, see weather_table)
+    import numpy as np
+
+    values = np.asarray(values, dtype=np.float64)
+    valid = values < missing
+    if valid.all() or not valid.any():
+        return np.where(valid, values, np.nan)
+    steps = np.arange(len(values))
+    return np.interp(steps, steps[valid], values[valid])
+
+
+def read_try_weather(path):
+    """
+    Reads a DWD test reference year (TRY 2011 / 2017, .dat). The columns are identified by
+    the header line above the '***' separator (MM, DD, HH, t, WG, N, RF). The TRY datasets
+    contain no precipitation, thus the snowfall rate is zero.
+    """
+    import numpy as np
+    import pandas as pd
+
+    names = None
+    with open(path, 'r', encoding='latin-1') as f:
+        for skiprows, line in enumerate(f, start=1):
+            if line.startswith('***'):
+                break
+            tokens = line.split()
+            if {'MM', 'DD', 'HH', 't', 'WG', 'N', 'RF'} <= set(tokens):
+                names = tokens
         else:
-            rows = rows + list(range(len(data)))
-        i += 1
+            raise ValueError('No DWD test reference year: separator "***" not found in {}.'.format(path))
+    if names is None:
+        raise ValueError('No DWD test reference year: column header not found in {}.'.format(path))
+
+    data = pd.read_csv(path, skiprows=skiprows, header=None, names=names, sep=r'\s+', engine='c',
+                       encoding='latin-1')
+    print('DWD test reference years contain no precipitation: snowfall is not considered.')
+
+    return weather_table(weather_dates(data['MM'], data['DD'], data['HH']), u=data['WG'].to_numpy(),
+                         Theta=data['t'].to_numpy(), RR=np.zeros(len(data)), Phi=data['RF'].to_numpy() / 100,
+                         B=data['N'].to_numpy() / 8)
+
+
+# reader functions by file extension
+READERS = {
+    '.xlsx': read_excel_weather,
+    '.xls': read_excel_weather,
+    '.csv': read_csv_weather,
+    '.epw': read_epw_weather,
+    '.dat': read_try_weather,
+}
+
+
+def _read_cache_index(index_path):
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _file_hash(path):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def _atomic_write(path, write):
+    # write to a temporary file first, so that concurrent runs never read a partial file
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def get_weather_data(Nt, self):
+
+    import numpy as np
+
+    # path to weather data file
+    path = self.ui.line_weather_file.text()  # './data/Wetterdaten_München-Riem_h.xlsx'
+
+    # import data (cached)
+    table = read_weather_file(path)
+    month, day, hour = date_fields(table['timestamp'])
+
+    # row index of the startdate
+    start_index = _start_index(month, day, self)
+
+    # row indices of all time steps (the weather data are repeated for multi-year simulations)
+    wrap = start_index + Nt > len(table)
+
+    def select(column):
+        if not wrap:  # view, no copy
+            return column[start_index:start_index + Nt]
+        return np.take(column, (start_index + np.arange(Nt)) % len(column))
 
     # 1.) ambient wind speed [m/s]
-    u_inf = np.array(data.iloc[rows, 6])
+    u_inf = select(table['u'])
 
     # 2.) ambient temperature [°C]
-    Theta_inf = np.array(data.iloc[rows, 4])
+    Theta_inf = select(table['Theta'])
 
     # 3.) snowfall rate [mm/h]
-    S_r = np.array(data.iloc[rows, 3])
-    # sets entries to 0, in case Theta_inf >= 1 °C (precipitation comes down as rain)
-    for i, j in enumerate(Theta_inf):
-        if j >= 1:
-            S_r[i] = 0
+    S_r = select(table['S_r'])
 
     # 4.) cloudiness [octal units/8]
     ''' between 0/8 - cloudless and 
                 8/8 - fully overcast
     '''
-    B = np.array(data.iloc[rows, 7]) / 8
+    B = select(table['B'])
 
     # 5.) relative humidity [-]
-    Phi = np.array(data.iloc[rows, 5]) / 100
+    Phi = select(table['Phi'])
 
     # 6.) total precipitation [mm/h]
-    RR = np.array(data.iloc[rows, 3])
-
-    # 7.) dates array of strings
-    dates = np.empty(len(rows), dtype=object)
-    if len(rows) > 8760:  # if multi-year simulation, add the year to the date with format ['y-mm-dd-hh']
-        for i in range(0, len(rows)):
-            dates[i] = str(int(i/8760)+1) + '-' + str(data.iloc[rows[i], 0]) + '-' + str(data.iloc[rows[i], 1]) + '-' + str(data.iloc[rows[i], 2])
-        fos = np.where(dates == '1-9-1-1')[0][0] # get index of first 1st of September
-    else:  # else just use format ['mm-dd-hh']
-        for i in range(0, len(rows)):
-            dates[i] = str(data.iloc[rows[i], 0]) + '-' + str(data.iloc[rows[i], 1]) + '-' + str(data.iloc[rows[i], 2])
-        fos = 0
+    RR = select(table['RR'])
+
+    # 7.) dates array [datetime64]
+    dates = continued_dates(table['timestamp'], start_index + np.arange(Nt))
+    fos = _first_of_september(month, day, hour, start_index, Nt)
 
     return u_inf, Theta_inf, S_r, B, Phi, RR, dates, fos
+
+
+def weather_stream(Nt, self, block_size=BLOCK_SIZE):
+    """
+    Opens the block-wise stream of the weather data of the simulation period.
+
+    Parameters
+    ----------
+    Nt : int
+        Number of time steps.
+    self : object
+        GUI main window (weather data file and startdate).
+    block_size : int, optional
+        Number of time steps per block.
+        Default is BLOCK_SIZE.
+
+    Returns
+    -------
+    stream : WeatherStream
+        Weather data stream (see WeatherStream.step).
+
+    """
+    # path to weather data file
+    path = self.ui.line_weather_file.text()
+
+    # import data (cached, memory-mapped)
+    table = read_weather_file(path)
+    month, day, hour = date_fields(table['timestamp'])
+
+    start_index = _start_index(month, day, self)
+    fos = _first_of_september(month, day, hour, start_index, Nt)
+
+    return WeatherStream(table, start_index, Nt, fos, block_size=block_size)
+
+
+class WeatherStream(object):
+    """
+    Block-wise stream of the weather data of a simulation period.
+
+    The blocks are read ahead on a background thread. The weather data are
+    repeated if the simulation period exceeds the table; the dates continue
+    after the end of the table (see continued_dates).
+
+    Attributes
+    ----------
+    Nt :    int
+            number of time steps
+    fos :   int
+            index of the first 1st of September (multi-year simulations), else 0
+
+    """
+
+    def __init__(self, table, start_index, Nt, fos, block_size=BLOCK_SIZE, read_ahead=2):
+        self.table = table
+        self.start_index = start_index
+        self.Nt = Nt
+        self.fos = fos
+        self.block_size = block_size
+        self.wrap = start_index + Nt > len(table)
+
+        self._queue = queue.Queue(maxsize=read_ahead)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._read_blocks, daemon=True)
+        self._thread.start()
+
+        self._blocks = self.blocks()
+        self._block_start = 0
+        self._block_end = 0
+        self._block = None
+
+    def blocks(self):
+        """
+        Generator of the blocks of the simulation period: (first time step, block)
+        with the block as tuple of arrays (u_inf, Theta_inf, S_r, B, Phi, RR, dates).
+        """
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def step(self, i):
+        """
+        Weather data of time step i (time steps in ascending order).
+
+        Returns
+        -------
+        u_inf, Theta_inf, S_r, B, Phi, RR, date
+            ambient wind speed [m/s], ambient temperature [°C], snowfall rate [mm/h],
+            cloudiness [-], relative humidity [-], total precipitation [mm/h], date
+
+        """
+        while i >= self._block_end:
+            try:
+                self._block_start, self._block = next(self._blocks)
+            except StopIteration:
+                raise IndexError('Time step {} exceeds the simulation period ({} time steps).'.format(i, self.Nt))
+            self._block_end = self._block_start + len(self._block[0])
+        j = i - self._block_start
+        return tuple(column[j] for column in self._block)
+
+    def close(self):
+        """
+        Stops the read-ahead thread.
+        """
+        self._stop.set()
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    def _read_blocks(self):
+        import numpy as np
+
+        try:
+            for start in range(0, self.Nt, self.block_size):
+                if self._stop.is_set():
+                    return
+                n = min(self.block_size, self.Nt - start)
+                rows = self.start_index + start + np.arange(n)
+                block = self.table[rows % len(self.table)]  # copy from the memory-mapped table
+                dates = continued_dates(self.table['timestamp'], rows)
+
+                self._put((start, (block['u'], block['Theta'], block['S_r'], block['B'], block['Phi'],
+                                   block['RR'], dates)))
+            self._put(None)
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+
+def _start_index(month, day, self):
+    import numpy as np
+
+    # get startdate
+    start_day = self.ui.sb_day.value()
+    start_month = int(self.ui.cb_month.currentData())
+
+    # row index of the startdate
+    return int(np.flatnonzero((month == start_month) & (day == start_day))[0])
+
+
+def _first_of_september(month, day, hour, start_index, Nt):
+    import numpy as np
+
+    # if multi-year simulation, get index of first 1st of September (relative to the startdate)
+    if Nt <= 8760:
+        return 0
+    rows = np.flatnonzero((month == 9) & (day == 1) & (hour == 1))
+    return int(np.min((rows - start_index) % len(month)))
+
+
+def date_fields(dates):
+    """
+    Month (1 - 12), day (1 - 31) and hour (1 - 24) of dates (inverse of weather_dates).
+    """
+    import numpy as np
+
+    dates = np.asarray(dates, dtype='M8[h]')
+    months = dates.astype('M8[M]')
+    days = dates.astype('M8[D]')
+    month = (months - months.astype('M8[Y]')).astype(np.int64) + 1
+    day = (days - months).astype(np.int64) + 1
+    hour = (dates - days).astype(np.int64) + 1
+
+    return month, day, hour
+
+
+def continued_dates(timestamp, rows):
+    """
+    Dates of rows of the weather data table, which are repeated after its end
+    (multi-year simulations). The dates of the repeated rows continue from the
+    last timestamp of the table (one hour per row), so that the dates are
+    consecutive and the real years of the table are kept.
+
+    Parameters
+    ----------
+    timestamp : array of datetime64[h]
+        Timestamps of the weather data table.
+    rows : array of int
+        Row indices (ascending, >= len(timestamp) for repeated rows).
+
+    Returns
+    -------
+    dates : array of datetime64[h]
+        Dates of the rows.
+
+    """
+    import numpy as np
+
+    rows = np.asarray(rows, dtype=np.int64)
+    n = len(timestamp)
+    dates = np.asarray(timestamp[np.minimum(rows, n - 1)], dtype='M8[h]')
+    return np.where(rows < n, dates, dates + (rows - (n - 1)).astype('m8[h]'))
+
+
+def weather_dates(month, day, hour, year=None):
+    """
+    Dates of the weather data time steps.
+
+    The weather data files contain a reference year without year numbers. The dates
+    start in REF_YEAR and the year is incremented at every turn of the year (1st of
+    January, hour 1). The hours 1 - 24 of the weather data (hourly values ending at
+    the given hour) are mapped to the start of the hour (00:00 - 23:00).
+
+    Parameters
+    ----------
+    month : array
+        Months (1 - 12).
+    day : array
+        Days of the month (1 - 31).
+    hour : array
+        Hours of the day (1 - 24).
+    year : array, optional
+        Years. Default is None (counted from REF_YEAR).
+
+    Returns
+    -------
+    dates : array of datetime64[h]
+        Dates of the time steps.
+
+    """
+    import numpy as np
+
+    month = np.asarray(month, dtype=np.int64)
+    day = np.asarray(day, dtype=np.int64)
+    hour = np.asarray(hour, dtype=np.int64)
+    if year is None:
+        turn_of_year = (month == 1) & (day == 1) & (hour == 1)
+        turn_of_year[:1] = False
+        year = REF_YEAR + np.cumsum(turn_of_year)
+
+    dates = (np.asarray(year, dtype=np.int64) - 1970).astype('M8[Y]').astype('M8[M]') + (month - 1)
+    dates = dates.astype('M8[D]') + (day - 1)
+    dates = dates.astype('M8[h]') + (hour - 1)
+
+    return dates
@@ -22,3 +22,7 @@ subprocess.check_call([sys.executable, '-m', 'pip', 'install',
 # Set 'use_cython' to True in GERDPySim/__init__.py to enable
 #subprocess.check_call([sys.executable, '-m', 'pip', 'install',
 #'cython'])
+
+#Optional (Parquet result files, faster CSV weather data import):
+#subprocess.check_call([sys.executable, '-m', 'pip', 'install',
+#'pyarrow'])
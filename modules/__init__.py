@@ -1,47 +1,95 @@
+import ast
+import os
+import re
+import struct
 import subprocess
 import sys
-import os
 from PySide2.QtCore import *
 from PySide2.QtGui import *
 from PySide2.QtWidgets import *
-from PySide2.QtCore import __version__ as PySide2_Version
 
-# check if resources file fits current Qt/PySide version, recompile if not
+# compile the Qt resources (icons, images) into a binary resource bundle and register it at runtime
 def compile_qrc(qrc_path, output_path):
     """
-    Compiles a .qrc file into a Python module using pyside2-rcc.
-    Recompiles only if the output file is missing or compiled with a different PySide2 version.
+    Compiles a .qrc file into a binary Qt resource bundle (.rcc).
+    Recompiles only if the bundle is missing or older than the .qrc file.
+
+    pyside2-rcc only generates Python modules with the resources embedded as byte literals,
+    which would have to be parsed on every start. The resource data is therefore extracted
+    from the generated module and written in the binary rcc-format, which is registered
+    with QResource.registerResource (see 'register_rcc').
 
     Args:
         qrc_path (str): Path to the .qrc file.
-        output_path (str): Path for the output Python file.
+        output_path (str): Path for the binary resource bundle (.rcc).
     """
-    qt_version_comment = f"# Compiled with PySide2 version {PySide2_Version}\n"
-
-    # Check if the output file already exists and matches the current PySide2 version via comment
-    if os.path.exists(output_path):
-        with open(output_path, 'r') as file:
-            first_line = file.readline()
-            if first_line == qt_version_comment:
-                print(f"Resource file {output_path} already exists and is up-to-date. Skipping recompilation.")
-                return
+    if os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(qrc_path):
+        print(f"Resource file {output_path} already exists and is up-to-date. Skipping recompilation.")
+        return
 
     # Compile the .qrc file
+    py_path = output_path + '.py'
     try:
-        command = ['pyside2-rcc', qrc_path, '-o', output_path]
+        command = ['pyside2-rcc', qrc_path, '-o', py_path]
         subprocess.run(command, check=True)
+        rcc_from_module(py_path, output_path)
+        print(f"Compiled {qrc_path} to {output_path}")
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"Error compiling resource file: {e}")
+        if os.path.exists(output_path):
+            print(f"Using existing resource file {output_path}.")
+    finally:
+        if os.path.exists(py_path):
+            os.remove(py_path)
 
-        # Add a comment to the top of the file with the PySide2 version
-        with open(output_path, 'r+') as file:
-            content = file.read()
-            file.seek(0, 0)
-            file.write(qt_version_comment + content)
 
-        print(f"Compiled {qrc_path} to {output_path} with PySide2 version {PySide2_Version}")
-    except subprocess.CalledProcessError as e:
-        print(f"Error compiling resource file: {e}")
+def rcc_from_module(py_path, output_path):
+    """
+    Writes the resource data of a Python resource module (generated by pyside2-rcc)
+    as binary Qt resource bundle (same layout as 'rcc -binary').
+
+    Args:
+        py_path (str): Path to the generated Python module.
+        output_path (str): Path for the binary resource bundle (.rcc).
+    """
+    # Resource data, names and tree (struct) of the generated module
+    with open(py_path, 'r', encoding='utf-8') as file:
+        source = file.read()
+    blobs = {}
+    for node in ast.parse(source).body:
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Constant):
+            blobs[node.targets[0].id] = node.value.value
+    data, names, tree = blobs['qt_resource_data'], blobs['qt_resource_name'], blobs['qt_resource_struct']
+
+    # Format version of the resource tree: qRegisterResourceData(0x03, ...)
+    version = int(re.search(r'qRegisterResourceData\((\w+)', source).group(1), 0)
+
+    # Header: magic, format version, offsets of tree, data and names (+ flags from format version 3)
+    header = [version, 0, 0, 0] + ([0] if version >= 3 else [])
+    data_offset = 4 + 4 * len(header)
+    names_offset = data_offset + len(data)
+    tree_offset = names_offset + len(names)
+    header[1:4] = [tree_offset, data_offset, names_offset]
+    with open(output_path, 'wb') as file:
+        file.write(b'qres' + struct.pack('>{}I'.format(len(header)), *header))
+        file.write(data)
+        file.write(names)
+        file.write(tree)
+
+
+def register_rcc(rcc_path):
+    """
+    Registers a binary Qt resource bundle (the file is memory-mapped by Qt).
+
+    Args:
+        rcc_path (str): Path to the binary resource bundle (.rcc).
+    """
+    if not QResource.registerResource(os.path.abspath(rcc_path)):
+        print(f"Error registering resource file {rcc_path}.")
+
 
-compile_qrc("resources.qrc", "modules/resources_rc.py")
+compile_qrc("resources.qrc", "resources.rcc")
+register_rcc("resources.rcc")
 
 # GUI FILE
 from .ui_main import Ui_MainWindow
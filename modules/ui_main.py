@@ -12,7 +12,7 @@ from PySide2.QtCore import *  # type: ignore
 from PySide2.QtGui import *  # type: ignore
 from PySide2.QtWidgets import *  # type: ignore
 
-from .resources_rc import *
+# resources (icons, images) are registered as binary bundle 'resources.rcc' in 'modules/__init__.py'
 
 class Ui_MainWindow(object):
     def setupUi(self, MainWindow):
@@ -3,6 +3,7 @@
 from guimain import *
 import GERDPySim.boreholes as boreholes
 import GERDPySim.heatpipes as heatpipes
+import GERDPySim.results as result_files
 import numpy as np
 # SET AS GLOBAL WIDGETS
 # ///////////////////////////////////////////////////////////////
@@ -47,33 +48,20 @@ class USEFunctions(MainWindow):
       # ------------------------------
 
       borefield = boreholes.field_from_file(self, self.ui.line_borefield_file.text())
-      # check for negative borehole length and radii
-      for i in range(len(borefield)):
-        if borefield[i].r_b <= 0:
+      # check for negative borehole length and radii (first invalid borehole)
+      invalid = np.flatnonzero((borefield.r_b <= 0) | (borefield.H <= 0) | (borefield.D <= 0))
+      if invalid.size:
+        i = invalid[0]
+        if borefield.r_b[i] <= 0:
           self.ui.text_console.insertPlainText("Borehole radius is zero or negative at borehole No. " + str(i + 1) + ".\n")
-          check = False
-          break
-        elif borefield[i].H <= 0:
+        elif borefield.H[i] <= 0:
           self.ui.text_console.insertPlainText("Borehole depth is zero or negative at borehole No. " + str(i + 1) + ".\n")
-          check = False
-          break
-        elif borefield[i].D <= 0:
+        else:
           self.ui.text_console.insertPlainText("Borehole buried depth is zero or negative at borehole No. " + str(i + 1) + ".\n")
-          check = False
-          break
-
-      # check for borehole duplicates
-      duplicate_pairs = []
-      for i in range(len(borefield)):
-        borehole_1 = borefield[i]
-        for j in range(i, len(borefield)):  # loop
-          borehole_2 = borefield[j]
-          if i == j:  # comparison of borehole with itself omitted
-            continue
-          else:
-            dist = borehole_1.distance(borehole_2)
-          if abs(dist - borehole_1.r_b) < borehole_1.r_b:
-            duplicate_pairs.append((i + 1, j + 1))
+        check = False
+
+      # check for borehole duplicates (spatial index, see 'Borefield.overlapping_pairs')
+      duplicate_pairs = [(i + 1, j + 1) for i, j in borefield.overlapping_pairs().tolist()]
       if duplicate_pairs:
         print(f'Geometric conflict between the following borehole pairs:')
         print(*duplicate_pairs, sep=", ")
@@ -98,22 +86,25 @@ class USEFunctions(MainWindow):
       lambda_iso = self.ui.sb_lambda_iso.value()  # ~ of insulation layer [W/mK] (default: 0.03)
       lambda_p = self.ui.sb_lambda_p.value()  # ~ of heatpipe material [W/mK] (default: 14.0)
 
-      for i in range(len(borefield)):
-        hp = heatpipes.Heatpipes(N, borefield[i].r_b, r_w, r_iso_b, r_pa, r_pi, lambda_b,
+      # the heatpipe layout is equal for all boreholes, only the borehole radii differ
+      hp = heatpipes.Heatpipes(N, borefield.r_b[0], r_w, r_iso_b, r_pa, r_pi, lambda_b,
                                lambda_iso, lambda_p)
-        xy = hp.xy_mat()
-        heatpipe_distance = np.sqrt((xy[1, 0] - xy[2, 0]) ** 2 + (xy[1, 1] - xy[2, 1]) ** 2)
-        if ((hp.r_pa + hp.r_w) >= hp.r_b):
-          print("Heat pipe circle too big!")
-          self.ui.text_console.insertPlainText("Heat pipes overlap borehole wall at borehole No. " + str(i+1) + ".\n" 
-                                               "Please adjust.\n")
-          check = False
-          break
-        elif heatpipe_distance <= (2 * hp.r_pa):
-          print("Too many heat pipes!")
-          self.ui.text_console.insertPlainText("Too many heat pipes per borehole!\n"
-                                               "Please adjust.\n")
-          check = False
+      xy = hp.xy_mat()
+      heatpipe_distance = np.sqrt((xy[1, 0] - xy[2, 0]) ** 2 + (xy[1, 1] - xy[2, 1]) ** 2)
+      overlap = np.flatnonzero((hp.r_pa + hp.r_w) >= borefield.r_b)
+      if overlap.size:
+        print("Heat pipe circle too big!")
+        self.ui.text_console.insertPlainText("Heat pipes overlap borehole wall at borehole No. " + str(overlap[0] + 1) + ".\n"
+                                             "Please adjust.\n")
+        check = False
+      elif heatpipe_distance <= (2 * hp.r_pa):
+        print("Too many heat pipes!")
+        self.ui.text_console.insertPlainText("Too many heat pipes per borehole!\n"
+                                             "Please adjust.\n")
+        check = False
+
+      # the validated bore field is handed to the simulation (see '_main.main')
+      self.boreField = borefield if check else None
 
       return check
 
@@ -128,8 +119,13 @@ class USEFunctions(MainWindow):
       if results.empty:
         self.ui.text_console.insertPlainText('No results to save. Please start simulation first.\n')
       else:
-        path = QFileDialog.getSaveFileName(self, "Save file", "", "Csv files (*.csv)")
-        results.to_csv(path[0], sep='\t')
+        path = QFileDialog.getSaveFileName(self, "Save file", "",
+                                           "Csv files (*.csv);;NumPy files (*.npz);;Parquet files (*.parquet)")
+        if path[0].lower().endswith(('.npz', '.parquet')):
+          # all result vectors, datetime64 index (reload with GERDPySim.results.load_results)
+          result_files.save_results(path[0], self.sim)
+        else:
+          results.to_csv(path[0], sep='\t')
         self.ui.text_console.insertPlainText('Results saved.\n')
 
 
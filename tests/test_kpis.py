@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+""" Tests of 'GERDPySim/kpis.py' """
+import numpy as np
+import pytest
+
+from GERDPySim.kpis import RunningKPIs
+
+
+def test_latent_and_sensible_energy():
+    kpis = RunningKPIs(dt=3600)
+    dates = np.arange('2001-01-01T00', '2001-01-01T03', dtype='M8[h]')
+    for (Q_lat, Q_sen), date in zip([(1000., 100.), (0., 0.), (3000., 300.)], dates):
+        kpis.update(5000., Q_lat + Q_sen, 200., 5., 0., date, Q_lat=Q_lat, Q_sen=Q_sen)
+    summary = kpis.summary()
+
+    assert summary['E_lat'] == pytest.approx(4000. * 1e-6)
+    assert summary['E_sen'] == pytest.approx(400. * 1e-6)
+    assert summary['E_lat'] + summary['E_sen'] == pytest.approx(summary['E_N'])
+    assert summary['E'] == pytest.approx(15000. * 1e-6)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+""" Tests of 'GERDPySim/regression.py' """
+import os
+
+import numpy as np
+import pytest
+
+from GERDPySim import regression
+
+# tolerances of all quantities for the tests of compare_arrays
+TOLERANCES = {name: {'atol': 0.1, 'rtol': 0.01, 'frac': 0.25} for name in regression.QUANTITIES}
+
+
+def arrays_with(name, values):
+    arrays = {quantity: np.zeros(len(values)) for quantity in regression.QUANTITIES}
+    arrays[name] = np.asarray(values, dtype=float)
+    return arrays
+
+
+def test_compare_arrays_identical():
+    golden = arrays_with('Q', [1., 2., 3., 4.])
+    report = regression.compare_arrays(golden, golden, tolerances=TOLERANCES)
+
+    assert all(r['passed'] and r['max_abs'] == 0. and r['frac_failed'] == 0. for r in report.values())
+
+
+def test_compare_arrays_shape_mismatch():
+    report = regression.compare_arrays(arrays_with('Q', [1., 2., 3.]), arrays_with('Q', [1., 2., 3., 4.]),
+                                       tolerances=TOLERANCES)
+
+    assert report['Q'] == {'max_abs': np.inf, 'frac_failed': 1., 'passed': False}
+
+
+def test_compare_arrays_atol_and_rtol():
+    golden = arrays_with('Q', [0., 0., 100., 100.])
+    # |x - x_ref| <= atol + rtol * |x_ref|: 0.1 at 0, 1.1 at 100
+    within = regression.compare_arrays(arrays_with('Q', [0.09, -0.09, 101.09, 98.91]), golden, TOLERANCES)
+    outside = regression.compare_arrays(arrays_with('Q', [0.2, 0., 101.2, 100.]), golden, TOLERANCES)
+
+    assert within['Q']['passed'] and within['Q']['frac_failed'] == 0.
+    assert within['Q']['max_abs'] == pytest.approx(1.09)
+    assert outside['Q']['frac_failed'] == 0.5 and not outside['Q']['passed']
+
+
+def test_compare_arrays_frac():
+    golden = arrays_with('sim_mod', [4., 4., 4., 4.])
+    # one of four time steps failing: within frac = 0.25
+    one = regression.compare_arrays(arrays_with('sim_mod', [4., 3., 4., 4.]), golden, TOLERANCES)
+    two = regression.compare_arrays(arrays_with('sim_mod', [4., 3., 3., 4.]), golden, TOLERANCES)
+
+    assert one['sim_mod']['passed'] and one['sim_mod']['frac_failed'] == 0.25
+    assert not two['sim_mod']['passed'] and two['sim_mod']['frac_failed'] == 0.5
+
+
+def test_truncated_case_against_golden_arrays():
+    # the first 48 hours of the golden case field5_riem (730 h)
+    Nt = 48
+    golden = np.load(os.path.join(regression.GOLDEN_DIR, 'field5_riem.npz'))
+    arrays, _ = regression.run_case('field5_riem', sb_simtime=Nt)
+    report = regression.compare_arrays(arrays, {name: golden[name][:Nt] for name in regression.QUANTITIES})
+
+    assert all(r['passed'] for r in report.values()), report
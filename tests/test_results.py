@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+""" Tests of 'GERDPySim/results.py' """
+import numpy as np
+import pytest
+
+from GERDPySim.results import ResultFile, ResultWriter
+
+
+@pytest.mark.parametrize('ext', ['.zip', '.parquet'])
+def test_chunked_result_file_round_trip(tmp_path, ext):
+    if ext == '.parquet':
+        pytest.importorskip('pyarrow')
+    path = str(tmp_path / ('results' + ext))
+    dates = np.arange('2001-01-01T00', '2001-01-02T01', dtype='M8[h]')
+    Q = np.linspace(0., 1000., len(dates))
+    sim_mod = np.arange(len(dates)) % 5 + 1
+
+    with ResultWriter(path) as writer:
+        for start in range(0, len(dates), 10):
+            writer.write({'Q': Q[start:start + 10], 'sim_mod': sim_mod[start:start + 10],
+                          'dates': dates[start:start + 10]})
+    assert writer.n_rows == len(dates)
+
+    with ResultFile(path) as result_file:
+        assert result_file.columns == ['Q', 'sim_mod', 'dates']
+        assert result_file.n_chunks == 3
+        assert len(result_file) == len(dates)
+        assert [len(chunk) for chunk in result_file.chunks('Q')] == [10, 10, 5]
+        np.testing.assert_array_equal(result_file['Q'], Q)
+        np.testing.assert_array_equal(result_file['sim_mod'], sim_mod)
+        np.testing.assert_array_equal(result_file['dates'].astype('M8[h]'), dates)
+
+
+def test_chunked_result_file_rejects_npz(tmp_path):
+    with pytest.raises(ValueError, match='.npz'):
+        ResultWriter(str(tmp_path / 'results.npz'))
+
+
+def make_sim(n=30):
+    from GERDPySim.results import RESULT_VECTORS
+
+    rng = np.random.default_rng(0)
+    sim = {name: rng.random(n) for name in RESULT_VECTORS}
+    for name in ('start_sb_vector', 'sb_active'):
+        sim[name] = (sim[name] > 0.5).astype(float)
+    sim['sim_mod'] = rng.integers(1, 6, size=n).astype(float)
+    sim['dates'] = np.arange('2020-02-28T12', n, dtype='M8[h]')
+    sim.update({'fos': 7, 'A_he': 35., 'Theta_g': 10.5, 'Nt': n,
+                'kpis': {'E': 1.5, 'f_N': 3.2, 'Theta_b_min': {'2019': 4.5}}})
+    return sim
+
+
+@pytest.mark.parametrize('ext', ['.npz', '.parquet'])
+def test_save_and_load_results(tmp_path, ext):
+    from GERDPySim.results import FLAG_VECTORS, RESULT_VECTORS, load_results, save_results, sim_from_results
+
+    if ext == '.parquet':
+        pytest.importorskip('pyarrow')
+    path = str(tmp_path / ('results' + ext))
+    sim = make_sim()
+    save_results(path, sim)
+    results = load_results(path)
+
+    assert results.index.name == 'timestamp'
+    np.testing.assert_array_equal(results.index.to_numpy().astype('M8[h]'), sim['dates'])
+    for name in RESULT_VECTORS:
+        if name in FLAG_VECTORS:
+            assert results[name].dtype == np.int8
+        np.testing.assert_array_equal(results[name].to_numpy(), sim[name])
+    assert results.attrs['fos'] == 7 and results.attrs['Nt'] == 30
+    assert results.attrs['A_he'] == 35. and results.attrs['Theta_g'] == 10.5
+    assert results.attrs['kpis'] == sim['kpis']
+
+    loaded = sim_from_results(results)
+    np.testing.assert_array_equal(loaded['dates'], sim['dates'])
+    assert isinstance(loaded['fos'], int) and isinstance(loaded['Nt'], int)
+
+
+def test_npz_vectors_are_memory_mapped(tmp_path):
+    from GERDPySim.results import RESULT_SCALARS, RESULT_VECTORS, _mmap_npz, save_results
+
+    path = str(tmp_path / 'results.npz')
+    save_results(path, make_sim())
+    arrays = _mmap_npz(path)
+
+    for name in RESULT_VECTORS + ('timestamp',):
+        assert isinstance(arrays[name], np.memmap)
+    for name in RESULT_SCALARS + ('kpis',):
+        assert not isinstance(arrays[name], np.memmap) and arrays[name].ndim == 0
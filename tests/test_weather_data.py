@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+""" Tests of 'GERDPySim/weather_data.py' """
+import numpy as np
+import pytest
+
+from GERDPySim import weather_data
+
+
+def write_epw(path, Theta, RH, u, N, depth, year=2001):
+    # EnergyPlus weather file: 8 header lines, 35 fields per hour (starting on the 1st of January)
+    lines = ['LOCATION,Test,,,,,0,0,0,0'] + ['HEADER {}'.format(k) for k in range(7)]
+    for i in range(len(Theta)):
+        fields = ['0'] * 35
+        fields[:6] = [str(year), '1', str(1 + i // 24), str(1 + i % 24), '60', 'x']
+        fields[6], fields[8], fields[21], fields[22] = str(Theta[i]), str(RH[i]), str(u[i]), str(N[i])
+        fields[33], fields[34] = str(depth[i]), '1'
+        lines.append(','.join(fields))
+    path.write_text('\n'.join(lines) + '\n', encoding='latin-1')
+
+
+def test_epw_missing_values_are_interpolated(tmp_path):
+    path = tmp_path / 'missing.epw'
+    write_epw(path, Theta=[0., 99.9, 2., 3.], RH=[50, 999, 999, 80], u=[1., 2., 999, 4.],
+              N=[2, 99, 6, 8], depth=[0., 999, 1., 1.])
+    table = weather_data.read_epw_weather(str(path))
+
+    np.testing.assert_allclose(table['Theta'], [0., 1., 2., 3.])
+    np.testing.assert_allclose(table['Phi'], [0.5, 0.6, 0.7, 0.8])
+    np.testing.assert_allclose(table['u'], [1., 2., 3., 4.])
+    np.testing.assert_allclose(table['B'], [0.2, 0.4, 0.6, 0.8])
+    np.testing.assert_allclose(table['RR'], [0., 0.5, 1., 1.])
+    np.testing.assert_array_equal(table['timestamp'], np.arange('2001-01-01T00', '2001-01-01T04', dtype='M8[h]'))
+
+
+def test_epw_without_precipitation(tmp_path):
+    path = tmp_path / 'no_precipitation.epw'
+    write_epw(path, Theta=[-2., -1.], RH=[90, 90], u=[1., 1.], N=[8, 8], depth=[999, 999])
+    table = weather_data.read_epw_weather(str(path))
+
+    np.testing.assert_array_equal(table['RR'], 0.)
+    np.testing.assert_array_equal(table['S_r'], 0.)
+
+
+@pytest.mark.parametrize('field', ['Theta', 'RH', 'u', 'N'])
+def test_epw_column_missing_completely(tmp_path, field):
+    columns = {'Theta': [1., 2.], 'RH': [50, 50], 'u': [1., 1.], 'N': [0, 0], 'depth': [0., 0.]}
+    columns[field] = [{'Theta': 99.9, 'RH': 999, 'u': 999, 'N': 99}[field]] * 2
+    path = tmp_path / 'missing_column.epw'
+    write_epw(path, **columns)
+
+    with pytest.raises(ValueError, match='missing values'):
+        weather_data.read_epw_weather(str(path))
+
+
+def write_leap_year_csv(path):
+    # hourly weather data of the leap year 2020 (8784 h); Theta counts the hours of the year
+    timestamp = np.arange('2020-01-01T00', '2021-01-01T00', dtype='M8[h]')
+    lines = ['timestamp,u,Theta,RR,Phi,B']
+    lines += ['{},1.0,{},0.0,0.8,0.5'.format(str(t).replace('T', ' '), i) for i, t in enumerate(timestamp)]
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return timestamp
+
+
+def stream_dates(path, Nt):
+    from GERDPySim.headless import HeadlessSession
+
+    session = HeadlessSession(line_weather_file=str(path), sb_day=28, cb_month=2)
+    stream = weather_data.weather_stream(Nt, session, block_size=1000)
+    try:
+        steps = [stream.step(i) for i in range(Nt)]
+    finally:
+        stream.close()
+    return stream, np.array([step[6] for step in steps]), np.array([step[1] for step in steps])
+
+
+@pytest.mark.parametrize('Nt', [48, 8784 + 48])
+def test_leap_year_csv_dates(tmp_path, monkeypatch, Nt):
+    monkeypatch.setattr(weather_data, 'CACHE_DIR', str(tmp_path / 'cache'))
+    path = tmp_path / 'leap_year.csv'
+    timestamp = write_leap_year_csv(path)
+    start = int(np.flatnonzero(timestamp == np.datetime64('2020-02-28T00'))[0])
+
+    stream, dates, Theta = stream_dates(path, Nt)
+
+    assert stream.wrap == (Nt > 48)
+    # real timestamps of the table (incl. the 29th of February), continued after the end of the table
+    np.testing.assert_array_equal(dates, np.datetime64('2020-02-28T00') + np.arange(Nt).astype('m8[h]'))
+    np.testing.assert_array_equal(dates[:48], timestamp[start:start + 48])
+    # the weather data of the table are repeated
+    np.testing.assert_array_equal(Theta, (start + np.arange(Nt)) % len(timestamp))